@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import UserProfile, ObraAlocacao
+from .services import invalidar_permissoes_usuarios
 
 
 @admin.register(UserProfile)
@@ -14,3 +15,16 @@ class ObraAlocacaoAdmin(admin.ModelAdmin):
     list_display = ("obra", "usuario", "alocado_por", "criado_em")
     list_filter = ("obra",)
     search_fields = ("obra__nome", "usuario__username")
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidar_permissoes_usuarios([obj.usuario_id], usuario_atual=request.user)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidar_permissoes_usuarios([obj.usuario_id], usuario_atual=request.user)
+
+    def delete_queryset(self, request, queryset):
+        usuario_ids = set(queryset.values_list("usuario_id", flat=True))
+        super().delete_queryset(request, queryset)
+        invalidar_permissoes_usuarios(usuario_ids, usuario_atual=request.user)
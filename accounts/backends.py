@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class PerfilModelBackend(ModelBackend):
+    """ModelBackend que traz o ``profile`` na mesma consulta do usuário da sessão.
+
+    Sem isso, cada requisição autenticada fazia uma segunda ida ao banco no
+    primeiro ``user.profile`` (menu, checagem de nível). Usuário sem perfil fica
+    com o "não existe" em cache, sem nova consulta.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related("profile").get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
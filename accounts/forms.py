@@ -9,7 +9,31 @@ from django.db import transaction
 from obras.models import Obra
 
 from .models import ObraAlocacao, UserProfile
-from .utils import filter_obras_for_user, get_or_create_profile
+from .services import alocar_em_lote
+from .utils import (
+    filter_obras_for_user,
+    get_or_create_profile,
+    get_user_profile,
+    manageable_users_queryset,
+)
+
+
+def _validar_obras_no_escopo(obras, permitidas):
+    if not obras:
+        return obras
+    ids = {obra.id for obra in obras}
+    if permitidas.filter(pk__in=ids).count() != len(ids):
+        raise ValidationError("Você tentou alocar obras fora do seu escopo permitido.")
+    return obras
+
+
+def _obras_selecionadas(form):
+    """Id e nome das obras já escolhidas, para o seletor por busca renderizar as marcadas."""
+    valores = form["obras"].value() or []
+    ids = {int(valor) for valor in valores if str(valor).isdigit()}
+    if not ids:
+        return []
+    return list(form.fields["obras"].queryset.filter(pk__in=ids).values("id", "nome"))
 
 
 class UserCreationWithRoleForm(forms.Form):
@@ -42,8 +66,8 @@ class UserCreationWithRoleForm(forms.Form):
         label="Obras alocadas",
         queryset=Obra.objects.none(),
         required=False,
-        widget=forms.CheckboxSelectMultiple(attrs={"class": "form-check-input"}),
-        help_text="Selecione uma ou mais obras para liberar o acesso.",
+        widget=forms.MultipleHiddenInput,
+        help_text="Busque e adicione uma ou mais obras para liberar o acesso.",
     )
 
     def __init__(self, *args, creator=None, **kwargs):
@@ -54,7 +78,7 @@ class UserCreationWithRoleForm(forms.Form):
         self._setup_obras_field()
 
     def _setup_role_choices(self):
-        profile = get_or_create_profile(self.creator)
+        profile = get_user_profile(self.creator)
         creator_role = getattr(profile, "role", None)
         allowed_roles: Iterable[str] = []
         if creator_role == UserProfile.Level.ADMIN:
@@ -84,20 +108,16 @@ class UserCreationWithRoleForm(forms.Form):
 
     def clean_role(self):
         role = self.cleaned_data["role"]
-        profile = get_or_create_profile(self.creator)
+        profile = get_user_profile(self.creator)
         if not profile or not profile.can_create_level(role):
             raise ValidationError("Você não tem permissão para criar usuários nesse nível.")
         return role
 
     def clean_obras(self):
-        obras = self.cleaned_data.get("obras")
-        if not obras:
-            return obras
-        allowed_ids = set(self.fields["obras"].queryset.values_list("id", flat=True))
-        invalid = [obra for obra in obras if obra.id not in allowed_ids]
-        if invalid:
-            raise ValidationError("Você tentou alocar obras fora do seu escopo permitido.")
-        return obras
+        return _validar_obras_no_escopo(self.cleaned_data.get("obras"), self.fields["obras"].queryset)
+
+    def obras_selecionadas(self):
+        return _obras_selecionadas(self)
 
     def clean(self):
         cleaned = super().clean()
@@ -134,12 +154,7 @@ class UserCreationWithRoleForm(forms.Form):
             profile = get_or_create_profile(user)
             profile.role = role
             profile.save(update_fields=["role"])
-            for obra in obras:
-                ObraAlocacao.objects.get_or_create(
-                    obra=obra,
-                    usuario=user,
-                    defaults={"alocado_por": created_by},
-                )
+            alocar_em_lote([user.pk], [obra.pk for obra in obras], alocado_por=created_by)
         return user, self._final_password
 
 
@@ -172,8 +187,8 @@ class UserUpdateForm(forms.Form):
         label="Obras alocadas",
         queryset=Obra.objects.none(),
         required=False,
-        widget=forms.CheckboxSelectMultiple(attrs={"class": "form-check-input"}),
-        help_text="Selecione uma ou mais obras para liberar o acesso.",
+        widget=forms.MultipleHiddenInput,
+        help_text="Busque e adicione uma ou mais obras para liberar o acesso.",
     )
 
     def __init__(self, *args, editor=None, user_obj=None, **kwargs):
@@ -185,7 +200,7 @@ class UserUpdateForm(forms.Form):
         self._set_initial_values()
 
     def _setup_role_choices(self):
-        profile = get_or_create_profile(self.editor)
+        profile = get_user_profile(self.editor)
         editor_role = getattr(profile, "role", None)
         allowed_roles: Iterable[str] = []
         if editor_role == UserProfile.Level.ADMIN:
@@ -210,15 +225,12 @@ class UserUpdateForm(forms.Form):
         if not self.user_obj:
             return
         self.initial.setdefault("username", self.user_obj.username)
-        profile = get_or_create_profile(self.user_obj)
+        profile = get_user_profile(self.user_obj)
         self.initial.setdefault("role", getattr(profile, "role", None))
 
-        allowed_ids = set(self.fields["obras"].queryset.values_list("id", flat=True))
-        current_ids = set(
-            ObraAlocacao.objects.filter(usuario=self.user_obj, obra_id__in=allowed_ids).values_list(
-                "obra_id", flat=True
-            )
-        )
+        current_ids = ObraAlocacao.objects.filter(
+            usuario=self.user_obj, obra_id__in=self.fields["obras"].queryset.values("id")
+        ).values_list("obra_id", flat=True)
         self.initial.setdefault("obras", list(current_ids))
 
     def clean_username(self):
@@ -233,20 +245,16 @@ class UserUpdateForm(forms.Form):
 
     def clean_role(self):
         role = self.cleaned_data["role"]
-        profile = get_or_create_profile(self.editor)
+        profile = get_user_profile(self.editor)
         if not profile or not profile.can_create_level(role):
             raise ValidationError("Você não tem permissão para definir esse nível.")
         return role
 
     def clean_obras(self):
-        obras = self.cleaned_data.get("obras")
-        if not obras:
-            return obras
-        allowed_ids = set(self.fields["obras"].queryset.values_list("id", flat=True))
-        invalid = [obra for obra in obras if obra.id not in allowed_ids]
-        if invalid:
-            raise ValidationError("Você tentou alocar obras fora do seu escopo permitido.")
-        return obras
+        return _validar_obras_no_escopo(self.cleaned_data.get("obras"), self.fields["obras"].queryset)
+
+    def obras_selecionadas(self):
+        return _obras_selecionadas(self)
 
     def clean(self):
         cleaned = super().clean()
@@ -284,24 +292,68 @@ class UserUpdateForm(forms.Form):
                 self.user_obj.set_password(password1)
                 self.user_obj.save(update_fields=["password"])
 
-            allowed_ids = set(self.fields["obras"].queryset.values_list("id", flat=True))
-            desired_ids = set(obras.values_list("id", flat=True))
-            current_ids = set(
-                ObraAlocacao.objects.filter(usuario=self.user_obj, obra_id__in=allowed_ids).values_list(
-                    "obra_id", flat=True
-                )
+            alocar_em_lote(
+                [self.user_obj.pk],
+                obras.values_list("id", flat=True),
+                alocado_por=self.editor,
+                acao="substituir",
+                escopo=self.fields["obras"].queryset,
             )
 
-            to_remove = current_ids - desired_ids
-            if to_remove:
-                ObraAlocacao.objects.filter(usuario=self.user_obj, obra_id__in=to_remove).delete()
+        return self.user_obj
 
-            to_add = desired_ids - current_ids
-            for obra_id in to_add:
-                ObraAlocacao.objects.get_or_create(
-                    obra_id=obra_id,
-                    usuario=self.user_obj,
-                    defaults={"alocado_por": self.editor},
-                )
 
-        return self.user_obj
+class AlocacaoEmLoteForm(forms.Form):
+    ACAO_CHOICES = [
+        ("adicionar", "Adicionar às obras"),
+        ("remover", "Remover das obras"),
+        ("substituir", "Substituir alocações pelas obras"),
+    ]
+
+    usuarios = forms.ModelMultipleChoiceField(
+        label="Usuários",
+        queryset=get_user_model().objects.none(),
+        widget=forms.MultipleHiddenInput,
+        error_messages={"required": "Selecione ao menos um usuário na lista."},
+    )
+    obras = forms.ModelMultipleChoiceField(
+        label="Obras",
+        queryset=Obra.objects.none(),
+        required=False,
+        widget=forms.MultipleHiddenInput,
+    )
+    acao = forms.ChoiceField(
+        label="Ação",
+        choices=ACAO_CHOICES,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
+    def __init__(self, *args, editor=None, **kwargs):
+        self.editor = editor
+        super().__init__(*args, **kwargs)
+        self.fields["usuarios"].queryset = manageable_users_queryset(editor)
+        self.fields["obras"].queryset = filter_obras_for_user(
+            Obra.objects.filter(deletada=False).order_by("nome"),
+            editor,
+        )
+
+    def clean_obras(self):
+        return _validar_obras_no_escopo(self.cleaned_data.get("obras"), self.fields["obras"].queryset)
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get("acao") in ("adicionar", "remover") and not cleaned.get("obras"):
+            self.add_error("obras", "Selecione ao menos uma obra.")
+        return cleaned
+
+    def obras_selecionadas(self):
+        return _obras_selecionadas(self)
+
+    def save(self):
+        return alocar_em_lote(
+            [usuario.pk for usuario in self.cleaned_data["usuarios"]],
+            [obra.pk for obra in self.cleaned_data["obras"]],
+            alocado_por=self.editor,
+            acao=self.cleaned_data["acao"],
+            escopo=self.fields["obras"].queryset,
+        )
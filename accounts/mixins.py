@@ -5,7 +5,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import JsonResponse
 from django.shortcuts import redirect
 
-from .utils import get_or_create_profile, user_has_obra_access
+from .utils import get_user_profile, user_has_obra_access
 
 DEFAULT_DENIED_MESSAGE = "Você não tem permissão para acessar esta área."
 
@@ -25,7 +25,7 @@ class RoleRequiredMixin(LoginRequiredMixin):
         return super().dispatch(request, *args, **kwargs)
 
     def get_profile(self, request):
-        return get_or_create_profile(request.user)
+        return get_user_profile(request.user)
 
     def handle_no_permission(self, request):
         messages.error(request, self.permission_denied_message)
@@ -45,7 +45,7 @@ def level_required(allowed_roles=None, *, json_response=False, message=DEFAULT_D
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped(request, *args, **kwargs):
-            profile = get_or_create_profile(request.user)
+            profile = get_user_profile(request.user)
             role = getattr(profile, "role", None)
             if allowed_roles and role not in allowed_roles:
                 if json_response:
@@ -0,0 +1,84 @@
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import QuerySet
+
+from obras.services import invalidar_obra_modelo_cache
+
+from .models import ObraAlocacao
+from .utils import esquecer_obra_ids
+
+
+def invalidar_permissoes_usuarios(usuario_ids: Iterable[int], usuario_atual=None) -> None:
+    """Descarta o que foi guardado por usuario a partir das alocacoes: a obra modelo no
+    cache e, em ``usuario_atual`` (quem fez a mudanca), os ids de ``user_obra_ids``.
+
+    Os outros usuarios leem os ids de novo na proxima requisicao.
+    """
+    usuario_ids = list(usuario_ids)
+    if usuario_ids:
+        invalidar_obra_modelo_cache(usuario_ids)
+    if usuario_atual is not None:
+        esquecer_obra_ids(usuario_atual)
+
+
+def alocar_em_lote(
+    usuario_ids: Iterable[int],
+    obra_ids: Iterable[int],
+    *,
+    alocado_por=None,
+    acao: str = "adicionar",
+    escopo: Optional[QuerySet] = None,
+) -> Dict[str, int]:
+    """Aplica N usuarios x M obras com uma leitura, um ``bulk_create`` e um ``delete``.
+
+    ``acao``:
+    - ``adicionar``: cria as alocacoes que faltam;
+    - ``remover``: apaga as alocacoes dos pares informados;
+    - ``substituir``: deixa cada usuario exatamente com ``obra_ids`` dentro do
+      ``escopo`` (queryset de obras de quem edita). Alocacoes fora do escopo
+      nao sao tocadas.
+
+    Quem chama valida usuarios e obras contra o escopo do editor.
+    """
+    if acao not in {"adicionar", "remover", "substituir"}:
+        raise ValueError(f"Acao de alocacao desconhecida: {acao}")
+    usuario_ids = set(usuario_ids)
+    obra_ids = set(obra_ids)
+    if not usuario_ids:
+        return {"criadas": 0, "removidas": 0}
+
+    existentes = ObraAlocacao.objects.filter(usuario_id__in=usuario_ids)
+    if acao == "substituir":
+        if escopo is not None:
+            existentes = existentes.filter(obra_id__in=escopo.values("id"))
+    else:
+        existentes = existentes.filter(obra_id__in=obra_ids)
+    atuais = {
+        (usuario_id, obra_id): pk
+        for pk, usuario_id, obra_id in existentes.values_list("pk", "usuario_id", "obra_id")
+    }
+
+    desejados = {(usuario_id, obra_id) for usuario_id in usuario_ids for obra_id in obra_ids}
+    if acao == "remover":
+        criar, remover = set(), set(atuais) & desejados
+    elif acao == "substituir":
+        criar, remover = desejados - set(atuais), set(atuais) - desejados
+    else:
+        criar, remover = desejados - set(atuais), set()
+
+    with transaction.atomic():
+        if criar:
+            ObraAlocacao.objects.bulk_create(
+                [
+                    ObraAlocacao(usuario_id=usuario_id, obra_id=obra_id, alocado_por=alocado_por)
+                    for usuario_id, obra_id in sorted(criar)
+                ],
+                ignore_conflicts=True,
+            )
+        if remover:
+            ObraAlocacao.objects.filter(pk__in=[atuais[par] for par in remover]).delete()
+        afetados = {usuario_id for usuario_id, _obra_id in criar | remover}
+        transaction.on_commit(lambda: invalidar_permissoes_usuarios(afetados, usuario_atual=alocado_por))
+
+    return {"criadas": len(criar), "removidas": len(remover)}
@@ -1,3 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from obras.models import Obra
+
+from .backends import PerfilModelBackend
+from .models import ObraAlocacao, UserProfile
+from .services import alocar_em_lote
+from .utils import get_user_profile, user_obra_ids
+
+
+class PerfilModelBackendTests(TestCase):
+    def test_usuario_e_perfil_em_uma_consulta(self):
+        usuario = get_user_model().objects.create_user("nivel2", password="x")
+        UserProfile.objects.filter(user=usuario).update(role=UserProfile.Level.NIVEL2)
+
+        with self.assertNumQueries(1):
+            carregado = PerfilModelBackend().get_user(usuario.pk)
+            self.assertEqual(carregado.profile.role, UserProfile.Level.NIVEL2)
+
+    def test_usuario_sem_perfil_nao_volta_ao_banco(self):
+        usuario = get_user_model().objects.create_user("semperfil", password="x")
+        UserProfile.objects.filter(user=usuario).delete()
+
+        with self.assertNumQueries(1):
+            carregado = PerfilModelBackend().get_user(usuario.pk)
+            with self.assertRaises(UserProfile.DoesNotExist):
+                carregado.profile
+
+
+class GetUserProfileTests(TestCase):
+    def test_perfil_ausente_vira_padrao_sem_gravar(self):
+        usuario = get_user_model().objects.create_user("semperfil", password="x")
+        UserProfile.objects.filter(user=usuario).delete()
+        usuario = get_user_model().objects.get(pk=usuario.pk)
+
+        with CaptureQueriesContext(connection) as consultas:
+            perfil = get_user_profile(usuario)
+            self.assertIs(get_user_profile(usuario), perfil)
+
+        self.assertFalse(
+            [q["sql"] for q in consultas if not q["sql"].lstrip().upper().startswith("SELECT")]
+        )
+        self.assertIsNone(perfil.pk)
+        self.assertEqual(perfil.role, UserProfile.Level.NIVEL1)
+        self.assertFalse(UserProfile.objects.filter(user=usuario).exists())
+
+
+class UserObraIdsTests(TestCase):
+    def test_alocacao_feita_pelo_proprio_usuario_descarta_os_ids_guardados(self):
+        usuario = get_user_model().objects.create_user("nivel2", password="x")
+        primeira = Obra.objects.create(nome="Primeira")
+        segunda = Obra.objects.create(nome="Segunda")
+        ObraAlocacao.objects.create(usuario=usuario, obra=primeira)
+
+        self.assertEqual(user_obra_ids(usuario), {primeira.pk})
+        with self.assertNumQueries(0):
+            user_obra_ids(usuario)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            alocar_em_lote([usuario.pk], [segunda.pk], alocado_por=usuario)
+
+        self.assertEqual(user_obra_ids(usuario), {primeira.pk, segunda.pk})
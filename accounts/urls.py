@@ -6,6 +6,8 @@ app_name = "accounts"
 urlpatterns = [
     path("profile/", views.ProfileView.as_view(), name="profile"),
     path("usuarios/", views.UserManagementView.as_view(), name="manage_users"),
+    path("usuarios/alocacoes/", views.AlocacaoEmLoteView.as_view(), name="alocar_em_lote"),
+    path("usuarios/obras/buscar/", views.buscar_obras_alocacao, name="buscar_obras_alocacao"),
     path("usuarios/<int:pk>/editar/", views.UserEditView.as_view(), name="edit_user"),
     path("usuarios/<int:pk>/excluir/", views.UserDeleteView.as_view(), name="delete_user"),
 ]
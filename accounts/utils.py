@@ -1,23 +1,40 @@
-from typing import Iterable, Optional
+from typing import FrozenSet, Optional
 
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth import get_user_model
-from django.db.models import QuerySet
+from django.db.models import Q, QuerySet
 
 from .models import UserProfile, ObraAlocacao
 
 
+def get_user_profile(user) -> Optional[UserProfile]:
+    """Perfil do usuario sem gravar nada (caminhos de leitura).
+
+    Quem ainda nao tem perfil recebe um perfil padrao nao salvo, como o que
+    ``get_or_create_profile`` criaria, preso ao objeto do usuario.
+    """
+    if isinstance(user, AnonymousUser) or user is None:
+        return None
+    try:
+        return user.profile
+    except UserProfile.DoesNotExist:
+        user.profile = UserProfile(user=user)
+        return user.profile
+
+
 def get_or_create_profile(user):
+    """Perfil do usuario, criando-o no banco se faltar; so para caminhos de escrita."""
     if isinstance(user, AnonymousUser) or user is None:
         return None
     profile = getattr(user, "profile", None)
-    if profile is None:
+    if profile is None or profile.pk is None:
         profile, _ = UserProfile.objects.get_or_create(user=user)
+        user.profile = profile
     return profile
 
 
 def get_user_level(user) -> Optional[str]:
-    profile = get_or_create_profile(user)
+    profile = get_user_profile(user)
     return getattr(profile, "role", None)
 
 
@@ -33,10 +50,28 @@ def is_level1(user) -> bool:
     return get_user_level(user) == UserProfile.Level.NIVEL1
 
 
-def _user_obra_ids(user) -> Iterable[int]:
+def user_obra_ids(user) -> FrozenSet[int]:
+    """Ids das obras alocadas ao usuario, lidos no primeiro acesso e guardados no objeto.
+
+    O ``request.user`` vive uma requisicao, entao as checagens seguintes
+    (listas, ``user_has_obra_access``) nao voltam ao banco.
+    """
     if not getattr(user, "is_authenticated", False):
-        return ObraAlocacao.objects.none().values_list("obra_id", flat=True)
-    return ObraAlocacao.objects.filter(usuario=user).values_list("obra_id", flat=True)
+        return frozenset()
+    ids = getattr(user, "_obra_ids_alocadas", None)
+    if ids is None:
+        # ``order_by()`` tira a ordenacao padrao (obra__nome, usuario__username) e seus JOINs.
+        ids = frozenset(
+            ObraAlocacao.objects.filter(usuario=user).order_by().values_list("obra_id", flat=True)
+        )
+        user._obra_ids_alocadas = ids
+    return ids
+
+
+def esquecer_obra_ids(user) -> None:
+    """Descarta os ids guardados por ``user_obra_ids`` depois de mudar as alocacoes do usuario."""
+    if hasattr(user, "_obra_ids_alocadas"):
+        del user._obra_ids_alocadas
 
 
 def filter_obras_for_user(qs: QuerySet, user):
@@ -44,7 +79,7 @@ def filter_obras_for_user(qs: QuerySet, user):
         return qs.none()
     if is_admin(user):
         return qs
-    return qs.filter(pk__in=_user_obra_ids(user))
+    return qs.filter(pk__in=user_obra_ids(user))
 
 
 def filter_queryset_by_user_obras(qs: QuerySet, user, obra_lookup: str = "obra"):
@@ -53,7 +88,7 @@ def filter_queryset_by_user_obras(qs: QuerySet, user, obra_lookup: str = "obra")
     if is_admin(user):
         return qs
     lookup = f"{obra_lookup}__in"
-    return qs.filter(**{lookup: _user_obra_ids(user)})
+    return qs.filter(**{lookup: user_obra_ids(user)})
 
 
 def user_has_obra_access(user, obra) -> bool:
@@ -61,21 +96,22 @@ def user_has_obra_access(user, obra) -> bool:
         return False
     if is_admin(user):
         return True
-    return ObraAlocacao.objects.filter(obra=obra, usuario=user).exists()
+    return obra.pk in user_obra_ids(user)
 
 
-def manageable_users_queryset(user):
-    User = get_user_model()
-    if not getattr(user, "is_authenticated", False):
-        return User.objects.none()
-
-    level = get_user_level(user)
-    qs = User.objects.filter(profile__isnull=False).select_related("profile")
-
+def manageable_users_filter(user) -> Optional[Q]:
+    """Condicao (sobre o model User) dos usuarios que ``user`` pode editar; ``None`` se nenhum."""
+    level = get_user_level(user) if getattr(user, "is_authenticated", False) else None
     if level == UserProfile.Level.ADMIN:
-        return qs.exclude(pk=user.pk).exclude(profile__role=UserProfile.Level.ADMIN)
-
+        return ~Q(pk=user.pk) & ~Q(profile__role=UserProfile.Level.ADMIN)
     if level == UserProfile.Level.NIVEL2:
-        return qs.exclude(pk=user.pk).filter(profile__role=UserProfile.Level.NIVEL1)
+        return ~Q(pk=user.pk) & Q(profile__role=UserProfile.Level.NIVEL1)
+    return None
 
-    return User.objects.none()
+
+def manageable_users_queryset(user):
+    User = get_user_model()
+    condicao = manageable_users_filter(user)
+    if condicao is None:
+        return User.objects.none()
+    return User.objects.filter(profile__isnull=False).select_related("profile").filter(condicao)
@@ -1,13 +1,23 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.paginator import Paginator
+from django.db.models import BooleanField, ExpressionWrapper, Prefetch, Q, Value
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.views.generic import TemplateView
+from django.views.decorators.http import require_GET
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.views.generic import TemplateView, View
 
-from .forms import UserCreationWithRoleForm, UserUpdateForm
-from .mixins import RoleRequiredMixin
-from .models import UserProfile
-from .utils import manageable_users_queryset
+from obras.models import Obra
+
+from .forms import AlocacaoEmLoteForm, UserCreationWithRoleForm, UserUpdateForm
+from .mixins import RoleRequiredMixin, level_required
+from .models import ObraAlocacao, UserProfile
+from .utils import filter_obras_for_user, manageable_users_filter, manageable_users_queryset
 
 
 class ProfileView(LoginRequiredMixin, TemplateView):
@@ -47,10 +57,14 @@ class UserManagementView(RoleRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["form"] = kwargs.get("form") or self.get_form()
-        context["users"] = self.get_user_queryset()
-        context["manageable_user_ids"] = set(
-            manageable_users_queryset(self.request.user).values_list("id", flat=True)
+        busca = (self.request.GET.get("q") or "").strip()
+        page_obj = Paginator(self.get_user_queryset(busca), settings.USUARIOS_POR_PAGINA).get_page(
+            self.request.GET.get("page")
         )
+        context["page_obj"] = page_obj
+        context["users"] = page_obj.object_list
+        context["busca"] = busca
+        context["alocacao_form"] = AlocacaoEmLoteForm(editor=self.request.user)
         return context
 
     def get_form_kwargs(self):
@@ -62,14 +76,65 @@ class UserManagementView(RoleRequiredMixin, TemplateView):
     def get_form(self):
         return UserCreationWithRoleForm(**self.get_form_kwargs())
 
-    def get_user_queryset(self):
+    def get_user_queryset(self, busca=""):
+        """Só as linhas da página pagam o prefetch; ``pode_gerenciar`` vem anotado na mesma consulta."""
         User = get_user_model()
-        return (
+        condicao = manageable_users_filter(self.request.user)
+        qs = (
             User.objects.filter(profile__isnull=False)
             .select_related("profile")
-            .prefetch_related("obras_alocadas__obra")
+            .prefetch_related(
+                Prefetch("obras_alocadas", queryset=ObraAlocacao.objects.select_related("obra"))
+            )
+            .annotate(
+                pode_gerenciar=(
+                    ExpressionWrapper(condicao, output_field=BooleanField())
+                    if condicao is not None
+                    else Value(False)
+                )
+            )
             .order_by("username")
         )
+        if busca:
+            qs = qs.filter(
+                Q(username__icontains=busca) | Q(first_name__icontains=busca) | Q(last_name__icontains=busca)
+            )
+        return qs
+
+
+@login_required
+@require_GET
+@level_required([UserProfile.Level.ADMIN, UserProfile.Level.NIVEL2], json_response=True)
+def buscar_obras_alocacao(request):
+    """Busca das obras que o usuário pode alocar, para o seletor dos formulários de usuário."""
+    termo = (request.GET.get("q") or "").strip()
+    limite = settings.ALOCACAO_BUSCA_LIMITE
+    qs = filter_obras_for_user(Obra.objects.filter(deletada=False), request.user)
+    if termo:
+        qs = qs.filter(Q(nome__icontains=termo) | Q(cliente__icontains=termo))
+    obras = list(qs.order_by("nome", "id").values("id", "nome", "cliente")[: limite + 1])
+    return JsonResponse({"status": "ok", "results": obras[:limite], "mais": len(obras) > limite})
+
+
+class AlocacaoEmLoteView(RoleRequiredMixin, View):
+    allowed_roles = [UserProfile.Level.ADMIN, UserProfile.Level.NIVEL2]
+
+    def post(self, request, *args, **kwargs):
+        form = AlocacaoEmLoteForm(request.POST, editor=request.user)
+        if form.is_valid():
+            resultado = form.save()
+            messages.success(
+                request,
+                f"Alocações atualizadas para {len(form.cleaned_data['usuarios'])} usuário(s): "
+                f"{resultado['criadas']} criada(s), {resultado['removidas']} removida(s).",
+            )
+        else:
+            for erros in form.errors.values():
+                for erro in erros:
+                    messages.error(request, erro)
+        destino = reverse("accounts:manage_users")
+        retorno = {chave: request.POST[chave] for chave in ("q", "page") if request.POST.get(chave)}
+        return redirect(f"{destino}?{urlencode(retorno)}" if retorno else destino)
 
 
 class UserEditView(RoleRequiredMixin, TemplateView):
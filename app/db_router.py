@@ -0,0 +1,97 @@
+"""Roteamento de leituras pesadas para a réplica (``DATABASE_REPLICA_URL``).
+
+Só as views marcadas com ``ReplicaReadMixin``/``usar_replica`` leem da réplica;
+o resto continua no banco principal. Depois de um POST do próprio usuário, as
+leituras ficam presas ao principal por ``DATABASE_REPLICA_STICKY_S`` segundos,
+para que ele veja o que acabou de gravar mesmo com atraso de replicação.
+"""
+
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA_ALIAS = "replica"
+STICKY_COOKIE = "replica_pin"
+
+_usar_replica = contextvars.ContextVar("usar_replica", default=False)
+_preso_ao_principal = contextvars.ContextVar("preso_ao_principal", default=False)
+
+
+def replica_configurada() -> bool:
+    return REPLICA_ALIAS in connections.settings
+
+
+@contextmanager
+def leitura_na_replica():
+    token = _usar_replica.set(True)
+    try:
+        yield
+    finally:
+        _usar_replica.reset(token)
+
+
+def usar_replica(view_func):
+    """Decorator para views de função somente leitura."""
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        # Usuário/sessão resolvidos no principal: um login recente ainda pode não ter replicado.
+        request.user.is_authenticated
+        with leitura_na_replica():
+            return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """Mixin para views baseadas em classe somente leitura."""
+
+    def dispatch(self, request, *args, **kwargs):
+        request.user.is_authenticated
+        with leitura_na_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _usar_replica.get() and not _preso_ao_principal.get() and replica_configurada():
+            return REPLICA_ALIAS
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e principal têm os mesmos dados.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+class ReplicaStickinessMiddleware:
+    """Prende as leituras do usuário ao principal logo após uma escrita dele."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _preso_ao_principal.set(STICKY_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            _preso_ao_principal.reset(token)
+
+        if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_STICKY_S,
+                httponly=True,
+                samesite="Lax",
+                secure=request.is_secure(),
+            )
+        return response
@@ -69,6 +69,7 @@ INSTALLED_APPS = [
     'accounts',
     'obras',
     'inspecoes',
+    'fila',
 
     # 3rd party
     'crispy_forms',
@@ -173,6 +174,27 @@ else:
     }
 
 
+# Réplica de leitura opcional para relatórios, visão geral, exportações e lista
+# de pendências (app/db_router.py). Após um POST do usuário, as leituras dele
+# ficam no principal por DATABASE_REPLICA_STICKY_S segundos.
+DATABASE_REPLICA_URL = (os.getenv("DATABASE_REPLICA_URL") or "").strip()
+DATABASE_REPLICA_STICKY_S = int(os.getenv("DATABASE_REPLICA_STICKY_S", "15"))
+DATABASE_ROUTERS = ["app.db_router.ReplicaRouter"]
+
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = _parse_database_url(DATABASE_REPLICA_URL)
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+    MIDDLEWARE.append("app.db_router.ReplicaStickinessMiddleware")
+
+
+# O backend próprio carrega o perfil junto com o usuário da sessão. O ModelBackend
+# segue na lista só para as sessões abertas antes da troca; novos logins usam o primeiro.
+AUTHENTICATION_BACKENDS = [
+    "accounts.backends.PerfilModelBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -215,6 +237,84 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Otimização das imagens enviadas (Pillow): redimensiona, remove metadados e
+# regrava em WEBP ou JPEG progressivo antes de enviar ao storage.
+IMAGE_UPLOAD_OPTIMIZE = os.getenv("IMAGE_UPLOAD_OPTIMIZE", "True").strip().lower() in {"1", "true", "yes", "on"}
+IMAGE_UPLOAD_FORMAT = (os.getenv("IMAGE_UPLOAD_FORMAT") or "WEBP").strip().upper()
+IMAGE_UPLOAD_QUALITY = int(os.getenv("IMAGE_UPLOAD_QUALITY", "80"))
+IMAGE_UPLOAD_MAX_DIMENSION = int(os.getenv("IMAGE_UPLOAD_MAX_DIMENSION", "2048"))
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv("IMAGE_UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# Miniaturas geradas sob demanda (cache em disco com descarte LRU).
+THUMBNAIL_WIDTHS = (160, 480, 1024)
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR") or str(BASE_DIR / "cache" / "thumbnails")
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Upload retomável das fotos de inspeção (partes de tamanho fixo montadas em disco).
+CHUNKED_UPLOAD_DIR = os.getenv("CHUNKED_UPLOAD_DIR") or str(BASE_DIR / "tmp" / "uploads")
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv("CHUNKED_UPLOAD_CHUNK_SIZE", str(512 * 1024)))
+
+# Sincronização em lote das inspeções registradas offline.
+INSPECAO_SYNC_MAX_ENTRADAS = int(os.getenv("INSPECAO_SYNC_MAX_ENTRADAS", "200"))
+
+# Mapa de inspeções: acima de INSPECAO_MAPA_MAX_PONTOS no bbox os pontos são
+# agrupados em células de ~INSPECAO_MAPA_CELULA_PX pixels até o zoom indicado.
+INSPECAO_MAPA_MAX_PONTOS = int(os.getenv("INSPECAO_MAPA_MAX_PONTOS", "300"))
+INSPECAO_MAPA_CELULA_PX = int(os.getenv("INSPECAO_MAPA_CELULA_PX", "60"))
+INSPECAO_MAPA_CLUSTER_MAX_ZOOM = int(os.getenv("INSPECAO_MAPA_CLUSTER_MAX_ZOOM", "18"))
+
+# Fotos por página na galeria do detalhe da inspeção (carregadas sob demanda).
+INSPECAO_FOTOS_POR_PAGINA = int(os.getenv("INSPECAO_FOTOS_POR_PAGINA", "12"))
+
+# Raio máximo (metros) da busca de inspeções próximas.
+INSPECAO_RAIO_MAX_M = int(os.getenv("INSPECAO_RAIO_MAX_M", "50000"))
+
+# Histórico de progresso das tarefas: janela da velocidade (% por dia) e dias
+# sem avanço para marcar uma tarefa em aberto como parada.
+PROGRESSO_JANELA_DIAS = int(os.getenv("PROGRESSO_JANELA_DIAS", "30"))
+PROGRESSO_TAREFA_PARADA_DIAS = int(os.getenv("PROGRESSO_TAREFA_PARADA_DIAS", "14"))
+
+# Fila de trabalhos em banco (app fila, comando run_worker).
+FILA_MAX_TENTATIVAS = int(os.getenv("FILA_MAX_TENTATIVAS", "5"))
+FILA_BACKOFF_BASE_S = int(os.getenv("FILA_BACKOFF_BASE_S", "10"))
+FILA_BACKOFF_MAX_S = int(os.getenv("FILA_BACKOFF_MAX_S", "3600"))
+FILA_INTERVALO_S = float(os.getenv("FILA_INTERVALO_S", "2"))
+# Trabalhos em execução há mais tempo que isso voltam para a fila (worker caiu).
+FILA_TIMEOUT_S = int(os.getenv("FILA_TIMEOUT_S", "900"))
+# Recalcula os snapshots das obras pela fila em vez de dentro da requisição.
+SNAPSHOT_ASYNC = os.getenv("SNAPSHOT_ASYNC", "False").strip().lower() in {"1", "true", "yes", "on"}
+
+# Detalhe da obra: painéis (estrutura, pendências, progresso, inspeções, anexos)
+# consultados em paralelo, cada um com sua conexão. Funciona em WSGI e ASGI.
+OBRA_DETALHE_ASYNC = os.getenv("OBRA_DETALHE_ASYNC", "false").strip().lower() in {"1", "true", "yes", "on"}
+OBRA_DETALHE_PAINEIS_WORKERS = int(os.getenv("OBRA_DETALHE_PAINEIS_WORKERS", "4"))
+
+# Exportações em streaming: linhas lidas do banco por lote (cursor no servidor no Postgres).
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# Importação de cronograma (categorias/tarefas) por CSV ou XLSX.
+IMPORTACAO_MAX_LINHAS = int(os.getenv("IMPORTACAO_MAX_LINHAS", "5000"))
+IMPORTACAO_MAX_BYTES = int(os.getenv("IMPORTACAO_MAX_BYTES", str(5 * 1024 * 1024)))
+# Tamanho descompactado máximo de cada XML do XLSX (o arquivo compactado pode ser pequeno).
+IMPORTACAO_XLSX_MAX_DESCOMPACTADO = int(os.getenv("IMPORTACAO_XLSX_MAX_DESCOMPACTADO", str(50 * 1024 * 1024)))
+
+# PDF do relatório da obra: por padrão a geração vai para a fila (run_worker);
+# com RELATORIO_PDF_ASYNC=false o primeiro download de cada versão gera na requisição.
+RELATORIO_PDF_ASYNC = os.getenv("RELATORIO_PDF_ASYNC", "True").strip().lower() in {"1", "true", "yes", "on"}
+
+# Obra modelo do formulário de criação (id e nome), guardada no cache por usuário.
+# Criar/alterar/excluir obras ou alocações invalida a entrada; o tempo limita o
+# atraso em caches locais a cada processo (LocMemCache, o padrão).
+OBRA_MODELO_CACHE_S = int(os.getenv("OBRA_MODELO_CACHE_S", "300"))
+
+# Gestão de usuários: tamanho da página e limite de resultados da busca de obras
+# do seletor de alocação.
+USUARIOS_POR_PAGINA = int(os.getenv("USUARIOS_POR_PAGINA", "25"))
+ALOCACAO_BUSCA_LIMITE = int(os.getenv("ALOCACAO_BUSCA_LIMITE", "20"))
+
+# Envio paralelo das fotos de inspeção para o storage de mídia.
+INSPECAO_FOTO_UPLOAD_WORKERS = int(os.getenv("INSPECAO_FOTO_UPLOAD_WORKERS", "4"))
+
 # Cloudinary (uploads/visualização de mídia)
 # Ative definindo CLOUDINARY_ENABLED=true (ou apenas setando as credenciais).
 _cloudinary_cloud_name = (os.getenv("CLOUDINARY_CLOUD_NAME") or "").strip()
@@ -256,6 +356,32 @@ if CLOUDINARY_ENABLED:
     except Exception:
         DEFAULT_FILE_STORAGE = "app.storage_backends.CloudinaryMediaStorage"
 
+# Storage local com latência artificial (só sem Cloudinary), para testar o envio
+# paralelo das fotos como se o storage fosse remoto. 0 desativa.
+MEDIA_LATENCIA_MS = float(os.getenv("MEDIA_LATENCIA_MS", "0") or 0)
+if MEDIA_LATENCIA_MS > 0 and not CLOUDINARY_ENABLED:
+    STORAGES = {
+        "default": {
+            "BACKEND": "app.storage_latencia.LatenciaFileSystemStorage",
+            "OPTIONS": {"latencia_ms": MEDIA_LATENCIA_MS},
+        },
+        "staticfiles": {
+            "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+        },
+    }
+
+# Captura de consultas lentas (opcional)
+# Defina SLOW_QUERY_THRESHOLD_MS > 0 para registrar SQL acima do limite em um
+# arquivo JSON Lines rotativo. Use `python manage.py slow_queries_report`.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "0") or 0)
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1") or 0)
+SLOW_QUERY_LOG_PATH = os.getenv("SLOW_QUERY_LOG_PATH") or str(BASE_DIR / "logs" / "slow_queries.jsonl")
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUP_COUNT = int(os.getenv("SLOW_QUERY_LOG_BACKUP_COUNT", "3"))
+
+if SLOW_QUERY_THRESHOLD_MS > 0:
+    MIDDLEWARE.insert(0, "app.slow_queries.SlowQueryMiddleware")
+
 LOGOUT_REDIRECT_URL = "login"
 LOGIN_URL = "login"
 
@@ -0,0 +1,210 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from hashlib import md5
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%s|\?")
+_IN_LIST_RE = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST_RE = re.compile(r"\bvalues\s*\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_writer_lock = threading.Lock()
+_writer: Optional[RotatingFileHandler] = None
+_local = threading.local()
+
+
+def normalize_sql(sql: str) -> str:
+    """Remove literais e colapsa listas para agrupar consultas equivalentes."""
+    normalized = _STRING_LITERAL_RE.sub("?", sql or "")
+    normalized = _NUMBER_LITERAL_RE.sub("?", normalized)
+    normalized = _PLACEHOLDER_RE.sub("?", normalized)
+    normalized = _IN_LIST_RE.sub("IN (...)", normalized)
+    normalized = _VALUES_LIST_RE.sub("VALUES (...)", normalized)
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+def fingerprint_sql(sql: str) -> str:
+    return md5(normalize_sql(sql).lower().encode("utf-8")).hexdigest()[:16]
+
+
+def _get_writer() -> RotatingFileHandler:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                path = Path(settings.SLOW_QUERY_LOG_PATH)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                handler = RotatingFileHandler(
+                    path,
+                    maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                    backupCount=settings.SLOW_QUERY_LOG_BACKUP_COUNT,
+                    encoding="utf-8",
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                _writer = handler
+    return _writer
+
+
+def write_entry(entry: Dict[str, Any]) -> None:
+    record = logging.makeLogRecord({"msg": json.dumps(entry, ensure_ascii=False, default=str)})
+    _get_writer().handle(record)
+
+
+def _explain(connection, sql: str, params) -> Optional[str]:
+    if not sql.lstrip().lower().startswith(("select", "with")):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    _local.explaining = True
+    try:
+        # Savepoint: no Postgres, um EXPLAIN que falha dentro de atomic() abortaria a transacao da requisicao.
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            rows = cursor.fetchall()
+    except Exception:
+        logger.debug("Falha ao executar EXPLAIN para consulta lenta.", exc_info=True)
+        return None
+    finally:
+        _local.explaining = False
+    return "\n".join(" ".join(str(col) for col in row) for row in rows)
+
+
+class SlowQueryRecorder:
+    """execute_wrapper que registra consultas acima do limite configurado."""
+
+    def __init__(self, request=None, threshold_ms=None, explain_sample_rate=None):
+        self.request = request
+        self.threshold_ms = (
+            settings.SLOW_QUERY_THRESHOLD_MS if threshold_ms is None else threshold_ms
+        )
+        self.explain_sample_rate = (
+            settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+            if explain_sample_rate is None
+            else explain_sample_rate
+        )
+
+    def _view_name(self) -> str:
+        match = getattr(self.request, "resolver_match", None)
+        if match is not None:
+            return match.view_name or match._func_path
+        return getattr(self.request, "path", "") or "-"
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, "explaining", False):
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms < self.threshold_ms:
+            return result
+
+        connection = context["connection"]
+        plan = None
+        if not many and random.random() < self.explain_sample_rate:
+            plan = _explain(connection, sql, params)
+
+        try:
+            write_entry(
+                {
+                    "ts": time.time(),
+                    "fingerprint": fingerprint_sql(sql),
+                    "query": normalize_sql(sql),
+                    "duration_ms": round(duration_ms, 2),
+                    "view": self._view_name(),
+                    "method": getattr(self.request, "method", None),
+                    "database": connection.alias,
+                    "many": bool(many),
+                    "explain": plan,
+                }
+            )
+        except OSError:
+            logger.warning("Nao foi possivel gravar a consulta lenta.", exc_info=True)
+        return result
+
+
+class SlowQueryMiddleware:
+    """Envolve a requisicao com o SlowQueryRecorder em todas as conexoes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder(request)
+        wrappers = []
+        try:
+            for alias in connections:
+                wrapper = connections[alias].execute_wrapper(recorder)
+                wrapper.__enter__()
+                wrappers.append(wrapper)
+            return self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+
+
+def iter_log_entries(path=None) -> Iterator[Dict[str, Any]]:
+    """Le o arquivo atual e os rotacionados (mais antigos primeiro)."""
+    base = Path(path or settings.SLOW_QUERY_LOG_PATH)
+    files: List[Path] = [
+        base.with_name(f"{base.name}.{index}")
+        for index in range(settings.SLOW_QUERY_LOG_BACKUP_COUNT, 0, -1)
+    ]
+    files.append(base)
+    for file_path in files:
+        if not file_path.exists():
+            continue
+        with file_path.open(encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def aggregate_entries(entries, since_ts: Optional[float] = None) -> List[Dict[str, Any]]:
+    grouped: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        if since_ts is not None and (entry.get("ts") or 0) < since_ts:
+            continue
+        key = entry.get("fingerprint") or fingerprint_sql(entry.get("query", ""))
+        duration = float(entry.get("duration_ms") or 0)
+        item = grouped.get(key)
+        if item is None:
+            item = grouped[key] = {
+                "fingerprint": key,
+                "query": entry.get("query", ""),
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "views": {},
+                "explain": None,
+                "last_ts": None,
+            }
+        item["count"] += 1
+        item["total_ms"] += duration
+        item["max_ms"] = max(item["max_ms"], duration)
+        view = entry.get("view") or "-"
+        item["views"][view] = item["views"].get(view, 0) + 1
+        if entry.get("explain"):
+            item["explain"] = entry["explain"]
+        item["last_ts"] = max(item["last_ts"] or 0, entry.get("ts") or 0)
+
+    for item in grouped.values():
+        item["avg_ms"] = item["total_ms"] / item["count"] if item["count"] else 0.0
+    return list(grouped.values())
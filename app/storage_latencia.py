@@ -0,0 +1,21 @@
+import time
+
+from django.core.files.storage import FileSystemStorage
+
+
+class LatenciaFileSystemStorage(FileSystemStorage):
+    """FileSystemStorage com atraso artificial em cada gravação.
+
+    Simula um storage remoto (Cloudinary/S3) em desenvolvimento e nos testes,
+    para medir o efeito do envio paralelo das fotos. Ative com MEDIA_LATENCIA_MS.
+    Fica fora de ``storage_backends`` porque aquele módulo exige as credenciais
+    do Cloudinary já na importação.
+    """
+
+    def __init__(self, *args, latencia_ms: float = 200, **kwargs):
+        self.latencia_ms = float(latencia_ms)
+        super().__init__(*args, **kwargs)
+
+    def _save(self, name, content):
+        time.sleep(self.latencia_ms / 1000)
+        return super()._save(name, content)
@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from .models import Trabalho
+from .services import requeue_dead
+
+
+@admin.register(Trabalho)
+class TrabalhoAdmin(admin.ModelAdmin):
+    list_display = ("id", "funcao", "fila", "status", "tentativas", "duracao_ms", "executar_apos", "concluido_em")
+    list_filter = ("status", "fila")
+    search_fields = ("funcao", "chave")
+    readonly_fields = ("iniciado_em", "concluido_em", "duracao_ms", "worker", "ultimo_erro", "criado_em", "atualizado_em")
+    actions = ["reenfileirar"]
+
+    @admin.action(description="Reenfileirar trabalhos mortos selecionados")
+    def reenfileirar(self, request, queryset):
+        total = requeue_dead(queryset)
+        self.message_user(request, f"{total} trabalho(s) devolvido(s) para a fila.")
@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from fila.models import Trabalho
+from fila.services import claim_next, purge_finished, requeue_dead, requeue_stale, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = "Processes jobs from the database-backed queue (fila.Trabalho)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fila", action="append", dest="filas", default=[], help="Filas atendidas (padrao: todas).")
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=None,
+            help="Segundos entre consultas quando a fila esta vazia (padrao: FILA_INTERVALO_S).",
+        )
+        parser.add_argument("--uma-vez", action="store_true", help="Processa o que houver e encerra.")
+        parser.add_argument("--max-trabalhos", type=int, default=0, help="Encerra apos N trabalhos (0 = sem limite).")
+        parser.add_argument("--mortos", action="store_true", help="Lista os trabalhos mortos e encerra.")
+        parser.add_argument("--reprocessar-mortos", action="store_true", help="Devolve os mortos para a fila e encerra.")
+        parser.add_argument("--limpar-dias", type=int, default=None, help="Remove concluidos com mais de N dias e encerra.")
+
+    def handle(self, *args, **options):
+        if options["mortos"]:
+            return self._listar_mortos()
+        if options["reprocessar_mortos"]:
+            self.stdout.write(f"{requeue_dead()} trabalho(s) devolvido(s) para a fila.")
+            return
+        if options["limpar_dias"] is not None:
+            self.stdout.write(f"{purge_finished(options['limpar_dias'])} trabalho(s) removido(s).")
+            return
+
+        intervalo = options["intervalo"] if options["intervalo"] is not None else settings.FILA_INTERVALO_S
+        worker = worker_name()
+        processados = 0
+        ultimo_resgate = 0.0
+        self.stdout.write(f"Worker {worker} iniciado.")
+
+        try:
+            while True:
+                if time.monotonic() - ultimo_resgate > 60:
+                    resgatados = requeue_stale()
+                    if resgatados:
+                        self.stdout.write(f"{resgatados} trabalho(s) preso(s) devolvido(s) para a fila.")
+                    ultimo_resgate = time.monotonic()
+
+                close_old_connections()
+                trabalho = claim_next(options["filas"], worker)
+                if trabalho is None:
+                    if options["uma_vez"]:
+                        break
+                    time.sleep(intervalo)
+                    continue
+
+                ok = run_job(trabalho)
+                processados += 1
+                trabalho.refresh_from_db(fields=["status", "duracao_ms"])
+                estilo = self.style.SUCCESS if ok else self.style.WARNING
+                self.stdout.write(
+                    estilo(f"#{trabalho.pk} {trabalho.funcao}: {trabalho.status} em {trabalho.duracao_ms}ms")
+                )
+                if options["max_trabalhos"] and processados >= options["max_trabalhos"]:
+                    break
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Worker {worker} encerrado ({processados} trabalho(s)).")
+
+    def _listar_mortos(self):
+        mortos = Trabalho.objects.filter(status=Trabalho.Status.MORTO).order_by("-atualizado_em")
+        for trabalho in mortos[:100]:
+            erro = (trabalho.ultimo_erro.strip().splitlines() or [""])[-1]
+            self.stdout.write(
+                f"#{trabalho.pk} {trabalho.funcao} args={trabalho.args} tentativas={trabalho.tentativas} erro={erro}"
+            )
+        if not mortos.exists():
+            self.stdout.write("Nenhum trabalho morto.")
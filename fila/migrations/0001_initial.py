@@ -0,0 +1,53 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Trabalho",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("fila", models.CharField(default="default", max_length=50)),
+                ("funcao", models.CharField(max_length=255)),
+                ("args", models.JSONField(blank=True, default=list)),
+                ("kwargs", models.JSONField(blank=True, default=dict)),
+                ("chave", models.CharField(blank=True, default="", max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pendente", "Pendente"),
+                            ("executando", "Executando"),
+                            ("concluido", "Concluído"),
+                            ("morto", "Falhou (sem novas tentativas)"),
+                        ],
+                        default="pendente",
+                        max_length=20,
+                    ),
+                ),
+                ("tentativas", models.PositiveIntegerField(default=0)),
+                ("max_tentativas", models.PositiveIntegerField(default=5)),
+                ("executar_apos", models.DateTimeField(default=django.utils.timezone.now)),
+                ("iniciado_em", models.DateTimeField(blank=True, null=True)),
+                ("concluido_em", models.DateTimeField(blank=True, null=True)),
+                ("duracao_ms", models.PositiveIntegerField(blank=True, null=True)),
+                ("worker", models.CharField(blank=True, max_length=100)),
+                ("ultimo_erro", models.TextField(blank=True)),
+                ("criado_em", models.DateTimeField(auto_now_add=True)),
+                ("atualizado_em", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["executar_apos", "id"],
+                "indexes": [
+                    models.Index(fields=["status", "fila", "executar_apos"], name="trabalho_proximo_idx"),
+                    models.Index(fields=["chave", "status"], name="trabalho_chave_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+def remover_pendentes_duplicados(apps, schema_editor):
+    Trabalho = apps.get_model("fila", "Trabalho")
+    vistos = set()
+    duplicados = []
+    pendentes = Trabalho.objects.filter(status="pendente").exclude(chave="").order_by("id")
+    for pk, chave in pendentes.values_list("id", "chave"):
+        if chave in vistos:
+            duplicados.append(pk)
+        vistos.add(chave)
+    Trabalho.objects.filter(pk__in=duplicados).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fila", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(remover_pendentes_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="trabalho",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "pendente"), models.Q(("chave", ""), _negated=True)),
+                fields=("chave",),
+                name="trabalho_chave_pendente_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Trabalho(models.Model):
+    """Job da fila local, executado pelo comando run_worker."""
+
+    class Status(models.TextChoices):
+        PENDENTE = "pendente", "Pendente"
+        EXECUTANDO = "executando", "Executando"
+        CONCLUIDO = "concluido", "Concluído"
+        MORTO = "morto", "Falhou (sem novas tentativas)"
+
+    fila = models.CharField(max_length=50, default="default")
+    funcao = models.CharField(max_length=255)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # evita enfileirar o mesmo trabalho duas vezes enquanto ele ainda esta pendente
+    chave = models.CharField(max_length=255, blank=True, default="")
+
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDENTE)
+    tentativas = models.PositiveIntegerField(default=0)
+    max_tentativas = models.PositiveIntegerField(default=5)
+    executar_apos = models.DateTimeField(default=timezone.now)
+
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    duracao_ms = models.PositiveIntegerField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    ultimo_erro = models.TextField(blank=True)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["executar_apos", "id"]
+        indexes = [
+            models.Index(fields=["status", "fila", "executar_apos"], name="trabalho_proximo_idx"),
+            models.Index(fields=["chave", "status"], name="trabalho_chave_idx"),
+        ]
+        constraints = [
+            # no maximo um pendente por chave (dedup do enqueue entre requisicoes concorrentes)
+            models.UniqueConstraint(
+                fields=["chave"],
+                condition=models.Q(status="pendente") & ~models.Q(chave=""),
+                name="trabalho_chave_pendente_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.funcao} #{self.pk} ({self.status})"
@@ -0,0 +1,219 @@
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+from importlib import import_module
+from typing import Callable, Optional, Sequence, Union
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Trabalho
+
+logger = logging.getLogger(__name__)
+
+
+def _dotted_path(fn: Union[Callable, str]) -> str:
+    if isinstance(fn, str):
+        return fn
+    module = getattr(fn, "__module__", None)
+    qualname = getattr(fn, "__qualname__", "")
+    if not module or "<" in qualname or "." in qualname:
+        raise ValueError("Enfileire apenas funcoes definidas no nivel do modulo.")
+    return f"{module}.{qualname}"
+
+
+def _resolve(path: str) -> Callable:
+    module_path, _, name = path.rpartition(".")
+    return getattr(import_module(module_path), name)
+
+
+def enqueue(
+    fn: Union[Callable, str],
+    args: Sequence = (),
+    kwargs: Optional[dict] = None,
+    *,
+    fila: str = "default",
+    chave: str = "",
+    atraso: Optional[timedelta] = None,
+    max_tentativas: Optional[int] = None,
+) -> Trabalho:
+    """Grava o trabalho na fila. Argumentos precisam ser serializaveis em JSON.
+
+    Com ``chave``, um trabalho pendente com a mesma chave e reaproveitado em vez
+    de duplicado; a restricao unica parcial (chave, pendente) garante isso entre
+    requisicoes concorrentes. Dentro de uma transacao, o trabalho so fica visivel
+    ao worker depois do commit.
+    """
+    funcao = _dotted_path(fn)
+    if chave:
+        existente = Trabalho.objects.filter(chave=chave, status=Trabalho.Status.PENDENTE).first()
+        if existente is not None:
+            return existente
+    try:
+        with transaction.atomic():
+            return Trabalho.objects.create(
+                fila=fila,
+                funcao=funcao,
+                args=list(args),
+                kwargs=dict(kwargs or {}),
+                chave=chave,
+                executar_apos=timezone.now() + (atraso or timedelta(0)),
+                max_tentativas=max_tentativas or settings.FILA_MAX_TENTATIVAS,
+            )
+    except IntegrityError:
+        if not chave:
+            raise
+        # Outra requisicao enfileirou a mesma chave entre a leitura e o insert.
+        return Trabalho.objects.get(chave=chave, status=Trabalho.Status.PENDENTE)
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _proximos(filas: Sequence[str]):
+    qs = Trabalho.objects.filter(status=Trabalho.Status.PENDENTE, executar_apos__lte=timezone.now())
+    if filas:
+        qs = qs.filter(fila__in=filas)
+    return qs.order_by("executar_apos", "id")
+
+
+def claim_next(filas: Sequence[str] = (), worker: str = "") -> Optional[Trabalho]:
+    """Reserva o proximo trabalho pendente para este worker.
+
+    Postgres: SELECT ... FOR UPDATE SKIP LOCKED, sem disputa entre workers.
+    SQLite (sem SKIP LOCKED): UPDATE condicional no status; quem atualizar a
+    linha primeiro fica com o trabalho.
+    """
+    agora = timezone.now()
+    campos = {
+        "status": Trabalho.Status.EXECUTANDO,
+        "iniciado_em": agora,
+        "worker": worker,
+        "atualizado_em": agora,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            trabalho = _proximos(filas).select_for_update(skip_locked=True).first()
+            if trabalho is None:
+                return None
+            Trabalho.objects.filter(pk=trabalho.pk).update(**campos)
+    else:
+        for candidato_id in _proximos(filas).values_list("id", flat=True)[:5]:
+            atualizados = Trabalho.objects.filter(
+                pk=candidato_id, status=Trabalho.Status.PENDENTE
+            ).update(**campos)
+            if atualizados:
+                break
+        else:
+            return None
+        trabalho = Trabalho(pk=candidato_id)
+
+    trabalho.refresh_from_db()
+    return trabalho
+
+
+def backoff(tentativas: int) -> timedelta:
+    segundos = settings.FILA_BACKOFF_BASE_S * (2 ** max(tentativas - 1, 0))
+    return timedelta(seconds=min(segundos, settings.FILA_BACKOFF_MAX_S))
+
+
+def _voltar_para_pendente(trabalho_id: int, **campos) -> bool:
+    """Devolve o trabalho a fila; ``False`` se ja existe outro pendente com a mesma chave."""
+    try:
+        with transaction.atomic():
+            Trabalho.objects.filter(pk=trabalho_id).update(status=Trabalho.Status.PENDENTE, **campos)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _registrar_falha(trabalho: Trabalho, erro: str, **campos) -> str:
+    """Conta a tentativa: agenda a proxima com backoff ou move para mortos. Devolve o novo status."""
+    agora = timezone.now()
+    tentativas = trabalho.tentativas + 1
+    campos.update(tentativas=tentativas, ultimo_erro=erro[-4000:], worker="", atualizado_em=agora)
+    if tentativas < trabalho.max_tentativas:
+        if _voltar_para_pendente(trabalho.pk, executar_apos=agora + backoff(tentativas), **campos):
+            logger.warning("Trabalho %s (%s) falhou; nova tentativa agendada.", trabalho.pk, trabalho.funcao)
+            return Trabalho.Status.PENDENTE
+        # O pendente de mesma chave ja vai refazer o trabalho; este sai da fila.
+        campos["ultimo_erro"] = (erro + "\nSubstituido por trabalho pendente com a mesma chave.")[-4000:]
+    Trabalho.objects.filter(pk=trabalho.pk).update(status=Trabalho.Status.MORTO, concluido_em=agora, **campos)
+    logger.error("Trabalho %s (%s) movido para mortos.", trabalho.pk, trabalho.funcao)
+    return Trabalho.Status.MORTO
+
+
+def run_job(trabalho: Trabalho) -> bool:
+    """Executa um trabalho ja reservado; registra duracao, erro e proxima tentativa."""
+    inicio = time.monotonic()
+    try:
+        _resolve(trabalho.funcao)(*trabalho.args, **trabalho.kwargs)
+    except Exception:
+        _registrar_falha(
+            trabalho, traceback.format_exc(), duracao_ms=int((time.monotonic() - inicio) * 1000)
+        )
+        return False
+
+    agora = timezone.now()
+    Trabalho.objects.filter(pk=trabalho.pk).update(
+        status=Trabalho.Status.CONCLUIDO,
+        tentativas=trabalho.tentativas + 1,
+        duracao_ms=int((time.monotonic() - inicio) * 1000),
+        concluido_em=agora,
+        ultimo_erro="",
+        atualizado_em=agora,
+    )
+    return True
+
+
+def requeue_stale(timeout_s: Optional[int] = None) -> int:
+    """Trata trabalhos presos em 'executando' alem do timeout como tentativa falha.
+
+    Worker encerrado ou travado conta tentativa como qualquer erro: volta com
+    backoff e, esgotado ``max_tentativas``, vai para mortos em vez de reiniciar
+    para sempre.
+    """
+    timeout_s = timeout_s if timeout_s is not None else settings.FILA_TIMEOUT_S
+    limite = timezone.now() - timedelta(seconds=timeout_s)
+    presos = Trabalho.objects.filter(status=Trabalho.Status.EXECUTANDO, iniciado_em__lt=limite)
+    total = 0
+    for trabalho in presos:
+        # Reserva o resgate: se o worker terminou nesse meio tempo, a linha ja mudou.
+        resgatado = Trabalho.objects.filter(
+            pk=trabalho.pk, status=Trabalho.Status.EXECUTANDO, iniciado_em=trabalho.iniciado_em
+        ).update(iniciado_em=None, atualizado_em=timezone.now())
+        if not resgatado:
+            continue
+        _registrar_falha(
+            trabalho, f"Sem conclusao apos {timeout_s}s no worker {trabalho.worker or '?'} (timeout)."
+        )
+        total += 1
+    return total
+
+
+def requeue_dead(queryset=None) -> int:
+    """Devolve mortos a fila, exceto os que ja tem um pendente com a mesma chave."""
+    queryset = queryset if queryset is not None else Trabalho.objects.all()
+    total = 0
+    for trabalho_id in queryset.filter(status=Trabalho.Status.MORTO).values_list("pk", flat=True):
+        total += _voltar_para_pendente(
+            trabalho_id,
+            tentativas=0,
+            executar_apos=timezone.now(),
+            concluido_em=None,
+            atualizado_em=timezone.now(),
+        )
+    return total
+
+
+def purge_finished(dias: int) -> int:
+    limite = timezone.now() - timedelta(days=dias)
+    deleted, _ = Trabalho.objects.filter(
+        status=Trabalho.Status.CONCLUIDO, concluido_em__lt=limite
+    ).delete()
+    return deleted
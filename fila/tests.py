@@ -0,0 +1,75 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Trabalho
+from .services import claim_next, enqueue, requeue_stale, run_job
+
+
+def trabalho_falha():
+    raise RuntimeError("falhou")
+
+
+class RequeueStaleTests(TestCase):
+    def _preso(self, **campos):
+        trabalho = enqueue("fila.tests.trabalho_falha", max_tentativas=2, **campos)
+        claim_next(worker="w1")
+        Trabalho.objects.filter(pk=trabalho.pk).update(iniciado_em=timezone.now() - timedelta(hours=1))
+        return trabalho
+
+    def test_timeout_conta_tentativa_e_aplica_backoff(self):
+        trabalho = self._preso()
+
+        with self.assertLogs("fila.services", "WARNING"):
+            self.assertEqual(requeue_stale(timeout_s=60), 1)
+
+        trabalho.refresh_from_db()
+        self.assertEqual(trabalho.status, Trabalho.Status.PENDENTE)
+        self.assertEqual(trabalho.tentativas, 1)
+        self.assertGreater(trabalho.executar_apos, timezone.now())
+        self.assertIn("timeout", trabalho.ultimo_erro)
+
+    def test_timeout_no_limite_vai_para_mortos(self):
+        trabalho = self._preso()
+        Trabalho.objects.filter(pk=trabalho.pk).update(tentativas=1)
+
+        with self.assertLogs("fila.services", "ERROR"):
+            requeue_stale(timeout_s=60)
+
+        trabalho.refresh_from_db()
+        self.assertEqual(trabalho.status, Trabalho.Status.MORTO)
+        self.assertEqual(requeue_stale(timeout_s=60), 0)
+
+
+class EnqueueChaveTests(TestCase):
+    def test_um_pendente_por_chave_no_banco(self):
+        enqueue("fila.tests.trabalho_falha", chave="x")
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Trabalho.objects.create(funcao="fila.tests.trabalho_falha", chave="x")
+
+    def test_corrida_no_enqueue_devolve_o_existente(self):
+        primeiro = enqueue("fila.tests.trabalho_falha", chave="x")
+
+        # Simula a outra requisicao: a leitura nao viu o pendente, o insert colide.
+        with mock.patch.object(QuerySet, "first", return_value=None):
+            segundo = enqueue("fila.tests.trabalho_falha", chave="x")
+
+        self.assertEqual(segundo.pk, primeiro.pk)
+        self.assertEqual(Trabalho.objects.filter(chave="x").count(), 1)
+
+    def test_falha_com_pendente_de_mesma_chave_sai_da_fila(self):
+        enqueue("fila.tests.trabalho_falha", chave="x")
+        executando = claim_next(worker="w1")
+        novo = enqueue("fila.tests.trabalho_falha", chave="x")
+
+        with self.assertLogs("fila.services", "ERROR"):
+            self.assertFalse(run_job(executando))
+
+        executando.refresh_from_db()
+        self.assertEqual(executando.status, Trabalho.Status.MORTO)
+        self.assertEqual(Trabalho.objects.get(status=Trabalho.Status.PENDENTE).pk, novo.pk)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PontoInspecaoTemplate, Inspecao, ItemInspecao, InspecaoAlteracaoTarefa
+from .models import PontoInspecaoTemplate, Inspecao, ItemInspecao, InspecaoAlteracaoTarefa, UploadParcial
 
 
 @admin.register(PontoInspecaoTemplate)
@@ -64,3 +64,11 @@ class InspecaoAlteracaoTarefaAdmin(admin.ModelAdmin):
     list_filter = ("inspecao__obra", "tarefa__categoria")
     search_fields = ("inspecao__obra__nome", "tarefa__nome", "tarefa__categoria__nome")
     ordering = ("-criado_em", "-id")
+
+
+@admin.register(UploadParcial)
+class UploadParcialAdmin(admin.ModelAdmin):
+    list_display = ("token", "obra", "usuario", "nome_arquivo", "recebido", "tamanho_total", "atualizado_em")
+    list_filter = ("obra",)
+    search_fields = ("nome_arquivo", "usuario__username")
+    ordering = ("-criado_em",)
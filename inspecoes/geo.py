@@ -0,0 +1,121 @@
+import math
+from typing import Iterable, List, Optional, Tuple
+
+from django.db.models import Q
+
+GEOHASH_PRECISION = 9
+RAIO_TERRA_M = 6371008.8
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_min, lat_max = -90.0, 90.0
+    lng_min, lng_max = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_min + lng_max) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lng_min = mid
+            else:
+                value <<= 1
+                lng_max = mid
+        else:
+            mid = (lat_min + lat_max) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_min = mid
+            else:
+                value <<= 1
+                lat_max = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(altura, largura) em graus de uma celula geohash."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAIO_TERRA_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_for_radius(latitude: float, longitude: float, raio_m: float) -> Tuple[float, float, float, float]:
+    """bbox ``oeste,sul,leste,norte`` que contem o circulo (sem cruzar o antimeridiano)."""
+    dlat = math.degrees(raio_m / RAIO_TERRA_M)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    dlng = min(math.degrees(raio_m / (RAIO_TERRA_M * cos_lat)), 180.0)
+    return (
+        max(longitude - dlng, -180.0),
+        max(latitude - dlat, -90.0),
+        min(longitude + dlng, 180.0),
+        min(latitude + dlat, 90.0),
+    )
+
+
+def covering_cells(bbox: Tuple[float, float, float, float], max_cells: int = 16) -> List[str]:
+    """Prefixos geohash que cobrem o bbox, na maior precisao com ate ``max_cells`` celulas."""
+    oeste, sul, leste, norte = bbox
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        altura, largura = cell_size(precision)
+        linhas = math.floor((norte + 90.0) / altura) - math.floor((sul + 90.0) / altura) + 1
+        colunas = math.floor((leste + 180.0) / largura) - math.floor((oeste + 180.0) / largura) + 1
+        if linhas * colunas > max_cells and precision > 1:
+            continue
+
+        cells = set()
+        lat = (math.floor((sul + 90.0) / altura) + 0.5) * altura - 90.0
+        for _ in range(linhas):
+            lng = (math.floor((oeste + 180.0) / largura) + 0.5) * largura - 180.0
+            for _ in range(colunas):
+                cells.add(encode_geohash(min(lat, 89.999999), min(lng, 179.999999), precision))
+                lng += largura
+            lat += altura
+        return sorted(cells)
+    return []
+
+
+def geohash_prefix_q(prefixes: Iterable[str], field: str = "geohash") -> Q:
+    """Filtro por prefixos com ``startswith`` (``LIKE 'p%'``).
+
+    Nao depende da collation do banco, ao contrario de um intervalo ``[p, p + "~")``.
+    No Postgres o ``db_index`` do CharField ja cria o indice ``_like``
+    (``varchar_pattern_ops``), que atende esse ``LIKE``.
+    """
+    query = Q()
+    for prefix in prefixes:
+        query |= Q(**{f"{field}__startswith": prefix})
+    return query
+
+
+def geohash_or_blank(latitude, longitude) -> str:
+    if latitude is None or longitude is None:
+        return ""
+    return encode_geohash(float(latitude), float(longitude))
+
+
+def parse_point(latitude, longitude) -> Optional[Tuple[float, float]]:
+    try:
+        lat, lng = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        return None
+    return lat, lng
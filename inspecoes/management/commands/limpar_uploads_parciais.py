@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inspecoes.models import UploadParcial
+from inspecoes.services import descartar_uploads_parciais
+
+
+class Command(BaseCommand):
+    help = "Deletes resumable photo uploads that were not attached to an inspection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--horas", type=int, default=48, help="Idade minima (em horas) do upload.")
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(hours=options["horas"])
+        removidos = descartar_uploads_parciais(UploadParcial.objects.filter(atualizado_em__lt=limite))
+        self.stdout.write(f"{removidos} upload(s) parcial(is) removido(s).")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from inspecoes.models import Inspecao
+
+
+class Command(BaseCommand):
+    help = "Fills Inspecao.geohash for inspections with coordinates, in primary-key batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Inspecoes por lote.")
+        parser.add_argument(
+            "--todas",
+            action="store_true",
+            help="Recalcula tambem as inspecoes que ja possuem geohash.",
+        )
+
+    def handle(self, *args, **options):
+        qs = Inspecao.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        if not options["todas"]:
+            qs = qs.filter(geohash="")
+        qs = qs.only("id", "latitude", "longitude", "geohash").order_by("pk")
+
+        ultimo_id = 0
+        total = 0
+        while True:
+            lote = list(qs.filter(pk__gt=ultimo_id)[: options["lote"]])
+            if not lote:
+                break
+            for inspecao in lote:
+                inspecao.atualizar_geohash()
+            Inspecao.objects.bulk_update(lote, ["geohash"])
+            ultimo_id = lote[-1].pk
+            total += len(lote)
+            self.stdout.write(f"{total} inspecao(oes) atualizada(s)...")
+        self.stdout.write(self.style.SUCCESS(f"Geohash preenchido em {total} inspecao(oes)."))
@@ -0,0 +1,17 @@
+from django.db import migrations
+import obras.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inspecoes", "0003_inspecaoalteracaotarefa"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="inspecaofoto",
+            name="imagem",
+            field=obras.images.OptimizedImageField(upload_to="inspecoes/fotos/"),
+        ),
+    ]
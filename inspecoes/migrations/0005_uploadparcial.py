@@ -0,0 +1,34 @@
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inspecoes", "0004_alter_inspecaofoto_imagem"),
+        ("obras", "0009_imagemotimizada_optimized_image_fields"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadParcial",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("token", models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ("nome_arquivo", models.CharField(max_length=255)),
+                ("tamanho_total", models.PositiveBigIntegerField()),
+                ("recebido", models.PositiveBigIntegerField(default=0)),
+                ("criado_em", models.DateTimeField(auto_now_add=True)),
+                ("atualizado_em", models.DateTimeField(auto_now=True)),
+                ("obra", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="uploads_parciais", to="obras.obra")),
+                ("usuario", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="uploads_parciais", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "ordering": ["-criado_em"],
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inspecoes", "0005_uploadparcial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inspecao",
+            name="chave_cliente",
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
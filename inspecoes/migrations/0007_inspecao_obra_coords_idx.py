@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inspecoes", "0006_inspecao_chave_cliente"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="inspecao",
+            index=models.Index(fields=["obra", "latitude", "longitude"], name="inspecao_obra_coords_idx"),
+        ),
+    ]
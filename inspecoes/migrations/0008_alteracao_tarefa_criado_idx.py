@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inspecoes", "0007_inspecao_obra_coords_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="inspecaoalteracaotarefa",
+            index=models.Index(fields=["tarefa", "criado_em"], name="alteracao_tarefa_criado_idx"),
+        ),
+    ]
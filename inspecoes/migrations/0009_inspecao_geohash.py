@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inspecoes", "0008_alteracao_tarefa_criado_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inspecao",
+            name="geohash",
+            field=models.CharField(blank=True, db_index=True, default="", editable=False, max_length=12),
+        ),
+    ]
@@ -1,3 +1,6 @@
+import uuid
+from pathlib import Path
+
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
@@ -5,6 +8,9 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from obras.images import OptimizedImageField
+
+from .geo import geohash_or_blank
 from obras.models import Obra, Categoria, Tarefa, Pendencia
 
 
@@ -60,7 +66,12 @@ class Inspecao(models.Model):
         max_digits=9, decimal_places=6, null=True, blank=True
     )
 
+    # celula geohash das coordenadas (prefiltro das consultas por raio/bbox entre obras)
+    geohash = models.CharField(max_length=12, blank=True, default="", db_index=True, editable=False)
+
     observacoes_gerais = models.TextField(blank=True)
+    # chave de idempotencia gerada no aparelho (inspecoes registradas offline)
+    chave_cliente = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
@@ -69,10 +80,21 @@ class Inspecao(models.Model):
         # garante no máximo 1 inspeção por dia por usuario/obra/tarefa (ajuste se quiser outro critério)
         unique_together = ("obra", "tarefa", "usuario", "data_inspecao")
         ordering = ["-data_hora"]
+        indexes = [
+            # consultas do mapa por bbox dentro da obra
+            models.Index(fields=["obra", "latitude", "longitude"], name="inspecao_obra_coords_idx"),
+        ]
+
+    def atualizar_geohash(self):
+        self.geohash = geohash_or_blank(self.latitude, self.longitude)
 
     def save(self, *args, **kwargs):
         if not self.data_inspecao:
             self.data_inspecao = (self.data_hora or timezone.now()).date()
+        self.atualizar_geohash()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {"geohash"}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -81,7 +103,7 @@ class Inspecao(models.Model):
 
 class InspecaoFoto(models.Model):
     inspecao = models.ForeignKey(Inspecao, on_delete=models.CASCADE, related_name="fotos")
-    imagem = models.ImageField(upload_to="inspecoes/fotos/")
+    imagem = OptimizedImageField(upload_to="inspecoes/fotos/")
     legenda = models.CharField(max_length=255, blank=True)
     criado_em = models.DateTimeField(auto_now_add=True)
 
@@ -92,6 +114,38 @@ class InspecaoFoto(models.Model):
         return f"Foto {self.id} - Inspeção {self.inspecao_id}"
 
 
+class UploadParcial(models.Model):
+    """Foto enviada em partes (upload retomavel); referenciada pelo token na inspecao."""
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    obra = models.ForeignKey(Obra, on_delete=models.CASCADE, related_name="uploads_parciais")
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="uploads_parciais",
+    )
+    nome_arquivo = models.CharField(max_length=255)
+    tamanho_total = models.PositiveBigIntegerField()
+    recebido = models.PositiveBigIntegerField(default=0)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-criado_em"]
+
+    def __str__(self):
+        return f"Upload {self.token} ({self.recebido}/{self.tamanho_total})"
+
+    @property
+    def concluido(self):
+        return self.recebido >= self.tamanho_total
+
+    @property
+    def caminho(self) -> Path:
+        return Path(settings.CHUNKED_UPLOAD_DIR) / f"{self.token}.part"
+
+
 class ItemInspecao(models.Model):
     STATUS_CHOICES = [
         ("aprovado", "Aprovado"),
@@ -140,6 +194,9 @@ class InspecaoAlteracaoTarefa(models.Model):
     class Meta:
         unique_together = ("inspecao", "tarefa")
         ordering = ["-criado_em", "-id"]
+        indexes = [
+            models.Index(fields=["tarefa", "criado_em"], name="alteracao_tarefa_criado_idx"),
+        ]
 
     @property
     def delta(self):
@@ -155,5 +212,5 @@ class InspecaoAlteracaoTarefa(models.Model):
 @receiver(post_save, sender=Inspecao)
 def inspecao_create_snapshot_on_finalize(sender, instance, created, **kwargs):
     if created:
-        from obras.services import upsert_obra_snapshot
-        upsert_obra_snapshot(instance.obra, reference_date=instance.data_inspecao)
+        from obras.services import agendar_snapshot_obra
+        agendar_snapshot_obra(instance.obra, reference_date=instance.data_inspecao)
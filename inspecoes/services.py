@@ -0,0 +1,911 @@
+import json
+import math
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Avg, Count, F, FloatField, IntegerField, Max, Min, Q, Sum
+from django.db.models.functions import Cast, Floor
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from accounts.models import UserProfile
+from accounts.utils import filter_obras_for_user, get_user_level
+from obras.constants import NO_OBRA_PERMISSION_MESSAGE, READ_ONLY_MESSAGE
+from obras.images import build_upload_stat, process_image_upload
+from obras.models import ImagemOtimizada, Obra, Pendencia, Tarefa
+from obras.services import agendar_snapshot_obra
+
+from .geo import bbox_for_radius, covering_cells, geohash_prefix_q, haversine_m
+from .models import Inspecao, InspecaoAlteracaoTarefa, InspecaoFoto, UploadParcial
+
+
+@dataclass
+class FotoUploadResult:
+    fotos: List[InspecaoFoto] = field(default_factory=list)
+    falhas: List[Tuple[str, str]] = field(default_factory=list)
+    # arquivos recebidos que foram gravados no storage e no banco
+    enviados: List = field(default_factory=list)
+    # (nome, erro, token) de uploads parciais que falharam e continuam guardados para nova tentativa
+    pendentes: List[Tuple[str, str, str]] = field(default_factory=list)
+
+
+def _store_foto(storage, name_field, inspecao: Inspecao, upload):
+    processed = None
+    if getattr(settings, "IMAGE_UPLOAD_OPTIMIZE", True):
+        processed = process_image_upload(upload)
+    content = processed.content if processed is not None else upload
+    name = name_field.generate_filename(inspecao, content.name)
+    return storage.save(name, content, max_length=name_field.max_length), processed
+
+
+def upload_inspecao_fotos(
+    inspecao: Inspecao,
+    uploads: Iterable,
+    storage=None,
+    max_workers: Optional[int] = None,
+) -> FotoUploadResult:
+    """Otimiza e envia as fotos em paralelo para o storage e grava os registros com um unico bulk_create.
+
+    Deve ser chamada fora de transaction.atomic: os envios ao storage podem
+    demorar e nao precisam manter a transacao aberta.
+    """
+    uploads = list(uploads)
+    result = FotoUploadResult()
+    if not uploads:
+        return result
+
+    image_field = InspecaoFoto._meta.get_field("imagem")
+    if storage is None:
+        storage = image_field.storage
+    if max_workers is None:
+        max_workers = getattr(settings, "INSPECAO_FOTO_UPLOAD_WORKERS", 4)
+    max_workers = max(1, min(max_workers, len(uploads)))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inspecao-foto") as executor:
+        futures = [
+            (upload, executor.submit(_store_foto, storage, image_field, inspecao, upload))
+            for upload in uploads
+        ]
+        stored_names = []
+        stored_uploads = []
+        stats = []
+        for upload, future in futures:
+            try:
+                name, processed = future.result()
+            except Exception as exc:
+                result.falhas.append((upload.name, str(exc) or exc.__class__.__name__))
+                continue
+            stored_names.append(name)
+            stored_uploads.append(upload)
+            if processed is not None:
+                stats.append(build_upload_stat(f"{InspecaoFoto._meta.label}.imagem", name, processed))
+
+    fotos = [InspecaoFoto(inspecao=inspecao, imagem=name) for name in stored_names]
+    try:
+        with transaction.atomic():
+            result.fotos = InspecaoFoto.objects.bulk_create(fotos)
+            if stats:
+                ImagemOtimizada.objects.bulk_create(stats)
+    except Exception:
+        for name in stored_names:
+            storage.delete(name)
+        raise
+    result.enviados = stored_uploads
+    return result
+
+
+class UploadOffsetMismatch(Exception):
+    def __init__(self, offset_atual: int):
+        super().__init__(f"Offset esperado: {offset_atual}")
+        self.offset_atual = offset_atual
+
+
+def iniciar_upload_parcial(obra, usuario, nome_arquivo: str, tamanho_total: int) -> UploadParcial:
+    nome_arquivo = (nome_arquivo or "").strip().rsplit("/", 1)[-1][:255]
+    if not nome_arquivo:
+        raise ValidationError("Informe o nome do arquivo.")
+    if tamanho_total <= 0:
+        raise ValidationError("Tamanho de arquivo invalido.")
+    if tamanho_total > settings.IMAGE_UPLOAD_MAX_BYTES:
+        limite_mb = settings.IMAGE_UPLOAD_MAX_BYTES // (1024 * 1024)
+        raise ValidationError(f"O tamanho da imagem não pode ultrapassar {limite_mb}MB.")
+
+    upload = UploadParcial.objects.create(
+        obra=obra,
+        usuario=usuario,
+        nome_arquivo=nome_arquivo,
+        tamanho_total=tamanho_total,
+    )
+    upload.caminho.parent.mkdir(parents=True, exist_ok=True)
+    upload.caminho.touch()
+    return upload
+
+
+def gravar_parte_upload(upload: UploadParcial, offset: int, stream, tamanho: int) -> UploadParcial:
+    """Grava uma parte no arquivo em disco.
+
+    O corpo da requisicao e lido antes, para um arquivo temporario; a trava da
+    linha so e tomada para conferir o offset, anexar a parte e atualizar
+    ``recebido``, entao um cliente lento nao prende a linha nem a conexao.
+    A parte so e aceita se comecar exatamente no offset ja recebido; caso
+    contrario o cliente recebe o offset atual e retoma a partir dele.
+    """
+    chunk_size = settings.CHUNKED_UPLOAD_CHUNK_SIZE
+    if tamanho <= 0 or tamanho > chunk_size:
+        raise ValidationError(f"Cada parte deve ter entre 1 e {chunk_size} bytes.")
+    # Falha cedo (sem trava) para nao receber uma parte que sera recusada.
+    if offset != upload.recebido:
+        raise UploadOffsetMismatch(upload.recebido)
+
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as parte:
+        restante = tamanho
+        while restante > 0:
+            bloco = stream.read(min(64 * 1024, restante))
+            if not bloco:
+                break
+            parte.write(bloco)
+            restante -= len(bloco)
+        if restante:
+            raise ValidationError("Parte incompleta. Reenvie a partir do ultimo offset.")
+        parte.seek(0)
+
+        with transaction.atomic():
+            upload = UploadParcial.objects.select_for_update().get(pk=upload.pk)
+            if offset != upload.recebido:
+                raise UploadOffsetMismatch(upload.recebido)
+            if offset + tamanho > upload.tamanho_total:
+                raise ValidationError("A parte ultrapassa o tamanho informado do arquivo.")
+
+            with open(upload.caminho, "r+b") as destino:
+                destino.seek(offset)
+                destino.truncate()
+                shutil.copyfileobj(parte, destino, 64 * 1024)
+
+            upload.recebido = offset + tamanho
+            upload.save(update_fields=["recebido", "atualizado_em"])
+    return upload
+
+
+def carregar_uploads_concluidos(tokens: Iterable[str], usuario, obra) -> List[UploadParcial]:
+    tokens = [token for token in {str(t).strip() for t in tokens} if token]
+    if not tokens:
+        return []
+    try:
+        uploads = list(
+            UploadParcial.objects.filter(token__in=tokens, usuario=usuario, obra=obra)
+        )
+    except ValidationError:
+        raise ValidationError("Token de upload invalido.")
+    if len(uploads) != len(tokens):
+        raise ValidationError("Upload de foto nao encontrado. Envie a foto novamente.")
+    pendentes = [upload.nome_arquivo for upload in uploads if not upload.concluido]
+    if pendentes:
+        raise ValidationError(f"Upload incompleto: {', '.join(pendentes)}.")
+    return uploads
+
+
+def anexar_uploads_parciais(inspecao: Inspecao, uploads: List[UploadParcial], storage=None) -> FotoUploadResult:
+    """Envia ao storage as fotos montadas em disco.
+
+    So os uploads gravados (storage e banco) sao descartados. Os que falharam
+    continuam em disco e voltam em ``pendentes`` com o token, para nova tentativa.
+    """
+    result = FotoUploadResult()
+    abertos = []
+    perdidos = []
+    for upload in uploads:
+        try:
+            abertos.append((upload, File(open(upload.caminho, "rb"), name=upload.nome_arquivo)))
+        except OSError:
+            perdidos.append(upload)
+            result.falhas.append((upload.nome_arquivo, "Arquivo do upload não encontrado. Envie a foto novamente."))
+
+    try:
+        enviado = upload_inspecao_fotos(inspecao, [arquivo for _upload, arquivo in abertos], storage=storage)
+    except Exception as exc:
+        # bulk_create falhou: upload_inspecao_fotos ja removeu do storage o que havia gravado.
+        erro = str(exc) or exc.__class__.__name__
+        enviado = FotoUploadResult(falhas=[(arquivo.name, erro) for _upload, arquivo in abertos])
+    finally:
+        for _upload, arquivo in abertos:
+            arquivo.close()
+
+    result.fotos = enviado.fotos
+    gravados = {id(arquivo) for arquivo in enviado.enviados}
+    # As falhas vem na ordem dos arquivos enviados.
+    erros = iter(erro for _nome, erro in enviado.falhas)
+    concluidos = []
+    for upload, arquivo in abertos:
+        if id(arquivo) in gravados:
+            concluidos.append(upload)
+        else:
+            result.pendentes.append((upload.nome_arquivo, next(erros, "Falha no envio."), str(upload.token)))
+    descartar_uploads_parciais(concluidos + perdidos)
+    return result
+
+
+def anexar_uploads_pendentes(inspecao_id: int, tokens: List[str]) -> None:
+    """Trabalho da fila: nova tentativa para as fotos que ficaram em ``pendentes``."""
+    inspecao = Inspecao.objects.filter(pk=inspecao_id).first()
+    if inspecao is None:
+        return
+    uploads = [
+        upload
+        for upload in UploadParcial.objects.filter(
+            token__in=tokens, usuario_id=inspecao.usuario_id, obra_id=inspecao.obra_id
+        )
+        if upload.concluido
+    ]
+    if not uploads:
+        return
+    result = anexar_uploads_parciais(inspecao, uploads)
+    if result.pendentes:
+        # Falha volta para a fila, que agenda a proxima tentativa com backoff.
+        raise RuntimeError(f"{len(result.pendentes)} foto(s) ainda não anexada(s): {result.pendentes[0][1]}")
+
+
+def descartar_uploads_parciais(uploads: Iterable[UploadParcial]) -> int:
+    uploads = list(uploads)
+    for upload in uploads:
+        upload.caminho.unlink(missing_ok=True)
+    UploadParcial.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+    return len(uploads)
+
+
+SYNC_STATUS_CRIADA = "criada"
+SYNC_STATUS_DUPLICADA = "duplicada"
+SYNC_STATUS_ERRO = "erro"
+
+
+def _erro_sync(chave, message: str, retentavel: bool = False) -> Dict:
+    """Resultado de erro do sync. ``retentavel`` diz ao cliente se vale reenviar a mesma
+    entrada mais tarde (falha transitoria) ou se ela precisa de acao do usuario."""
+    return {"chave": chave, "status": SYNC_STATUS_ERRO, "message": message, "retentavel": retentavel}
+
+
+@dataclass
+class _EntradaSync:
+    indice: int
+    chave: str
+    obra_id: int
+    observacoes: str = ""
+    latitude: Optional[Decimal] = None
+    longitude: Optional[Decimal] = None
+    tarefas: Dict[int, int] = field(default_factory=dict)
+    foto_tokens: List[str] = field(default_factory=list)
+    data_inspecao: Optional[date] = None
+    uploads: List[UploadParcial] = field(default_factory=list)
+    inspecao: Optional[Inspecao] = None
+
+
+def _parse_coordenada(valor) -> Optional[Decimal]:
+    if valor in (None, ""):
+        return None
+    try:
+        return Decimal(str(valor)).quantize(Decimal("0.000001"))
+    except (InvalidOperation, ValueError):
+        raise ValidationError("Coordenadas inválidas.")
+
+
+def _parse_entrada_sync(indice: int, raw) -> _EntradaSync:
+    if not isinstance(raw, dict):
+        raise ValidationError("Entrada inválida.")
+    try:
+        chave = str(uuid.UUID(str(raw.get("chave"))))
+    except (TypeError, ValueError):
+        raise ValidationError("Chave de idempotência inválida.")
+    try:
+        obra_id = int(raw.get("obra_id"))
+    except (TypeError, ValueError):
+        raise ValidationError("Obra inválida.")
+
+    tarefas = {}
+    for tarefa_id, percentual in (raw.get("tarefas") or {}).items():
+        try:
+            tarefa_id, percentual = int(tarefa_id), int(percentual)
+        except (TypeError, ValueError):
+            raise ValidationError("Percentual inválido.")
+        if not (0 <= percentual <= 100):
+            raise ValidationError("Percentual inválido. Use 0..100.")
+        tarefas[tarefa_id] = percentual
+
+    hoje = timezone.now().date()
+    data_inspecao = hoje
+    capturada_em = raw.get("capturada_em")
+    if capturada_em:
+        parsed = parse_datetime(str(capturada_em)) or parse_date(str(capturada_em)[:10])
+        if parsed is None:
+            raise ValidationError("Data de captura inválida.")
+        data_inspecao = min(parsed.date() if isinstance(parsed, datetime) else parsed, hoje)
+
+    latitude = _parse_coordenada(raw.get("latitude"))
+    longitude = _parse_coordenada(raw.get("longitude"))
+    if latitude is None or longitude is None:
+        latitude = longitude = None
+
+    return _EntradaSync(
+        indice=indice,
+        chave=chave,
+        obra_id=obra_id,
+        observacoes=str(raw.get("observacoes_gerais") or ""),
+        latitude=latitude,
+        longitude=longitude,
+        tarefas=tarefas,
+        foto_tokens=[str(token) for token in (raw.get("foto_tokens") or [])],
+        data_inspecao=data_inspecao,
+    )
+
+
+def validar_alteracao_tarefa(tarefa, percentual: int, user_level, tarefas_com_pendencia_aberta) -> None:
+    """Mesmas regras do formulario de inspecao e de Tarefa.clean, sem consultas extras."""
+    if (
+        user_level == UserProfile.Level.NIVEL1
+        and tarefa.status == "concluida"
+        and percentual != tarefa.percentual_concluido
+    ):
+        raise ValidationError(
+            f"Tarefa '{tarefa.nome}' concluída: somente Nível 2/ADM pode alterar."
+        )
+    if percentual == 100 and tarefa.pk in tarefas_com_pendencia_aberta:
+        raise ValidationError(
+            f"Erro ao atualizar a tarefa '{tarefa.nome}': "
+            "Não é possível concluir a tarefa com pendências em aberto."
+        )
+
+
+def parse_alteracoes_tarefas(raw: str) -> Dict[int, Tuple[Optional[int], int]]:
+    """Le o payload ``[{"id": 1, "antes": 40, "depois": 60}, ...]`` enviado pelo formulario."""
+    try:
+        itens = json.loads(raw or "[]")
+        if not isinstance(itens, list):
+            raise TypeError
+        alteracoes = {}
+        for item in itens:
+            antes = item.get("antes")
+            alteracoes[int(item["id"])] = (
+                int(antes) if antes is not None else None,
+                int(item["depois"]),
+            )
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError, AttributeError):
+        raise ValidationError("Alterações de tarefas inválidas.")
+    return alteracoes
+
+
+def aplicar_alteracoes_tarefas(
+    inspecao: Inspecao, alteracoes: Dict[int, Tuple[Optional[int], int]], user_level
+) -> List[InspecaoAlteracaoTarefa]:
+    """Grava so as tarefas alteradas na inspecao. Deve rodar dentro de transaction.atomic.
+
+    Bloqueia apenas as tarefas enviadas e recusa a alteracao quando o percentual
+    ``antes`` informado nao confere com o atual (outra inspecao gravou antes).
+    """
+    if not alteracoes:
+        return []
+
+    tarefas = list(
+        Tarefa.objects.select_for_update()
+        .filter(categoria__obra_id=inspecao.obra_id, pk__in=alteracoes.keys())
+        .order_by("pk")
+    )
+    if len(tarefas) != len(alteracoes):
+        raise ValidationError("Tarefa não pertence a esta obra.")
+    com_pendencia_aberta = set(
+        Pendencia.objects.filter(tarefa_id__in=alteracoes.keys(), status="aberta")
+        .values_list("tarefa_id", flat=True)
+    )
+
+    agora = timezone.now()
+    registros = []
+    alteradas = []
+    for tarefa in tarefas:
+        antes, depois = alteracoes[tarefa.pk]
+        if not (0 <= depois <= 100):
+            raise ValidationError(f"Percentual inválido para a tarefa '{tarefa.nome}'. Use 0..100.")
+        if antes is not None and antes != tarefa.percentual_concluido:
+            raise ValidationError(
+                f"A tarefa '{tarefa.nome}' foi atualizada por outra inspeção "
+                f"(agora em {tarefa.percentual_concluido}%). Revise e envie novamente."
+            )
+        validar_alteracao_tarefa(tarefa, depois, user_level, com_pendencia_aberta)
+        if depois == tarefa.percentual_concluido:
+            continue
+        registros.append(
+            InspecaoAlteracaoTarefa(
+                inspecao=inspecao,
+                tarefa=tarefa,
+                percentual_antes=tarefa.percentual_concluido,
+                percentual_depois=depois,
+            )
+        )
+        tarefa.percentual_concluido = depois
+        tarefa.atualizar_status_por_percentual()
+        tarefa.atualizado_em = agora
+        alteradas.append(tarefa)
+
+    if alteradas:
+        Tarefa.objects.bulk_update(
+            alteradas, ["percentual_concluido", "status", "data_fim_real", "atualizado_em"]
+        )
+        InspecaoAlteracaoTarefa.objects.bulk_create(registros)
+        agendar_snapshot_obra(inspecao.obra)
+    return registros
+
+
+def _sincronizar_obra(obra, usuario, user_level, entradas: List[_EntradaSync], resultados) -> None:
+    tarefa_ids = {tarefa_id for entrada in entradas for tarefa_id in entrada.tarefas}
+    agora = timezone.now()
+
+    with transaction.atomic():
+        tarefas = {
+            tarefa.pk: tarefa
+            for tarefa in Tarefa.objects.select_for_update().filter(
+                categoria__obra=obra, pk__in=tarefa_ids
+            )
+        }
+        com_pendencia_aberta = set(
+            Pendencia.objects.filter(tarefa_id__in=tarefas.keys(), status="aberta")
+            .values_list("tarefa_id", flat=True)
+        )
+
+        aplicadas = []
+        alteradas = {}
+        pendentes_alteracoes = []
+        for entrada in entradas:
+            try:
+                mudancas = []
+                for tarefa_id, percentual in entrada.tarefas.items():
+                    tarefa = tarefas.get(tarefa_id)
+                    if tarefa is None:
+                        raise ValidationError("Tarefa não pertence a esta obra.")
+                    validar_alteracao_tarefa(tarefa, percentual, user_level, com_pendencia_aberta)
+                    if percentual != tarefa.percentual_concluido:
+                        mudancas.append((tarefa, tarefa.percentual_concluido, percentual))
+            except ValidationError as exc:
+                resultados[entrada.indice] = _erro_sync(entrada.chave, exc.messages[0])
+                continue
+
+            # Aplica em memoria: entradas seguintes da mesma obra veem o novo valor.
+            for tarefa, _antes, depois in mudancas:
+                tarefa.percentual_concluido = depois
+                tarefa.atualizar_status_por_percentual()
+                tarefa.atualizado_em = agora
+                alteradas[tarefa.pk] = tarefa
+            entrada.inspecao = Inspecao(
+                obra=obra,
+                usuario=usuario,
+                data_inspecao=entrada.data_inspecao,
+                latitude=entrada.latitude,
+                longitude=entrada.longitude,
+                observacoes_gerais=entrada.observacoes,
+                chave_cliente=entrada.chave,
+            )
+            entrada.inspecao.atualizar_geohash()
+            aplicadas.append(entrada)
+            pendentes_alteracoes.append((entrada, mudancas))
+
+        if not aplicadas:
+            return
+
+        Inspecao.objects.bulk_create([entrada.inspecao for entrada in aplicadas])
+        InspecaoAlteracaoTarefa.objects.bulk_create(
+            [
+                InspecaoAlteracaoTarefa(
+                    inspecao=entrada.inspecao,
+                    tarefa=tarefa,
+                    percentual_antes=antes,
+                    percentual_depois=depois,
+                )
+                for entrada, mudancas in pendentes_alteracoes
+                for tarefa, antes, depois in mudancas
+            ]
+        )
+        if alteradas:
+            Tarefa.objects.bulk_update(
+                alteradas.values(),
+                ["percentual_concluido", "status", "data_fim_real", "atualizado_em"],
+            )
+        agendar_snapshot_obra(obra)
+
+    for entrada in aplicadas:
+        resultados[entrada.indice] = {
+            "chave": entrada.chave,
+            "status": SYNC_STATUS_CRIADA,
+            "inspecao_id": entrada.inspecao.pk,
+        }
+
+
+def sincronizar_inspecoes(usuario, entradas_raw) -> List[Dict]:
+    """Aplica um lote de inspecoes registradas offline.
+
+    Cada obra e gravada em uma transacao, com escritas em lote e um unico
+    recalculo de snapshot. O resultado segue a ordem das entradas recebidas.
+    """
+    entradas_raw = list(entradas_raw or [])
+    max_entradas = settings.INSPECAO_SYNC_MAX_ENTRADAS
+    if len(entradas_raw) > max_entradas:
+        raise ValidationError(f"Envie no máximo {max_entradas} inspeções por lote.")
+
+    resultados: List[Optional[Dict]] = [None] * len(entradas_raw)
+    entradas: List[_EntradaSync] = []
+    chaves_lote = set()
+    for indice, raw in enumerate(entradas_raw):
+        try:
+            entrada = _parse_entrada_sync(indice, raw)
+        except ValidationError as exc:
+            chave = raw.get("chave") if isinstance(raw, dict) else None
+            resultados[indice] = _erro_sync(chave, exc.messages[0])
+            continue
+        if entrada.chave in chaves_lote:
+            resultados[indice] = _erro_sync(entrada.chave, "Chave repetida no mesmo lote.")
+            continue
+        chaves_lote.add(entrada.chave)
+        entradas.append(entrada)
+
+    existentes = {
+        str(item["chave_cliente"]): item
+        for item in Inspecao.objects.filter(chave_cliente__in=chaves_lote).values(
+            "id", "chave_cliente", "usuario_id"
+        )
+    }
+    obras = {
+        obra.pk: obra
+        for obra in filter_obras_for_user(
+            Obra.objects.filter(pk__in={entrada.obra_id for entrada in entradas}, deletada=False),
+            usuario,
+        )
+    }
+
+    por_obra: Dict[int, List[_EntradaSync]] = {}
+    reenviadas: Dict[int, _EntradaSync] = {}
+    for entrada in entradas:
+        existente = existentes.get(entrada.chave)
+        if existente is not None:
+            if existente["usuario_id"] == usuario.pk:
+                resultados[entrada.indice] = {
+                    "chave": entrada.chave,
+                    "status": SYNC_STATUS_DUPLICADA,
+                    "inspecao_id": existente["id"],
+                }
+                if entrada.foto_tokens:
+                    reenviadas[existente["id"]] = entrada
+            else:
+                resultados[entrada.indice] = _erro_sync(entrada.chave, "Chave de idempotência já utilizada.")
+            continue
+
+        obra = obras.get(entrada.obra_id)
+        erro = None
+        if obra is None:
+            erro = NO_OBRA_PERMISSION_MESSAGE
+        elif obra.status == "finalizada":
+            erro = READ_ONLY_MESSAGE
+        else:
+            try:
+                entrada.uploads = carregar_uploads_concluidos(entrada.foto_tokens, usuario, obra)
+            except ValidationError as exc:
+                erro = exc.messages[0]
+        if erro:
+            resultados[entrada.indice] = _erro_sync(entrada.chave, erro)
+            continue
+        por_obra.setdefault(obra.pk, []).append(entrada)
+
+    user_level = get_user_level(usuario)
+    for obra_id, entradas_obra in por_obra.items():
+        try:
+            _sincronizar_obra(obras[obra_id], usuario, user_level, entradas_obra, resultados)
+        except (IntegrityError, OperationalError, ValidationError):
+            for entrada in entradas_obra:
+                entrada.inspecao = None
+                resultados[entrada.indice] = _erro_sync(
+                    entrada.chave,
+                    "Não foi possível gravar as inspeções desta obra. Tente novamente.",
+                    retentavel=True,
+                )
+
+    # Reenvio de inspecao ja gravada: anexa as fotos que ficaram pendentes da primeira vez.
+    # Tokens ja consumidos nao existem mais e sao ignorados.
+    if reenviadas:
+        for inspecao in Inspecao.objects.filter(pk__in=reenviadas):
+            entrada = reenviadas[inspecao.pk]
+            entrada.inspecao = inspecao
+            entrada.uploads = [
+                upload
+                for upload in UploadParcial.objects.filter(
+                    token__in=entrada.foto_tokens, usuario=usuario, obra_id=inspecao.obra_id
+                )
+                if upload.concluido
+            ]
+
+    # Fotos fora das transacoes, depois que as inspecoes foram gravadas.
+    for entrada in entradas:
+        if entrada.inspecao is None or entrada.inspecao.pk is None or not entrada.uploads:
+            continue
+        try:
+            resultado_fotos = anexar_uploads_parciais(entrada.inspecao, entrada.uploads)
+        except Exception as exc:
+            # A inspecao ja esta gravada: o lote nao falha; as fotos ficam para o reenvio.
+            erro = str(exc) or exc.__class__.__name__
+            resultado_fotos = FotoUploadResult(
+                pendentes=[(upload.nome_arquivo, erro, str(upload.token)) for upload in entrada.uploads]
+            )
+        falhas_fotos = [
+            {"arquivo": nome, "message": erro, "retentavel": False} for nome, erro in resultado_fotos.falhas
+        ]
+        falhas_fotos += [
+            {"arquivo": nome, "message": erro, "token": token, "retentavel": True}
+            for nome, erro, token in resultado_fotos.pendentes
+        ]
+        if falhas_fotos:
+            resultados[entrada.indice]["falhas_fotos"] = falhas_fotos
+    return resultados
+
+
+def parse_bbox(raw: str) -> Tuple[float, float, float, float]:
+    """Le o bbox no formato do Leaflet ``oeste,sul,leste,norte``."""
+    try:
+        oeste, sul, leste, norte = (float(parte) for parte in (raw or "").split(","))
+    except ValueError:
+        raise ValidationError("Parâmetro bbox inválido. Use oeste,sul,leste,norte.")
+    sul, norte = max(sul, -90.0), min(norte, 90.0)
+    oeste, leste = max(oeste, -180.0), min(leste, 180.0)
+    if not all(math.isfinite(valor) for valor in (oeste, sul, leste, norte)) or sul > norte or oeste > leste:
+        raise ValidationError("Parâmetro bbox inválido. Use oeste,sul,leste,norte.")
+    return oeste, sul, leste, norte
+
+
+def _ponto_feature(lng, lat, properties) -> Dict:
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [float(lng), float(lat)]},
+        "properties": properties,
+    }
+
+
+def _inspecao_features(queryset) -> List[Dict]:
+    inspecoes = queryset.select_related("usuario").only(
+        "id", "latitude", "longitude", "data_inspecao", "usuario__username"
+    )
+    return [
+        _ponto_feature(
+            inspecao.longitude,
+            inspecao.latitude,
+            {
+                "id": inspecao.pk,
+                "data": f"{inspecao.data_inspecao:%d/%m/%Y}",
+                "usuario": inspecao.usuario.username,
+                "url": reverse("inspecoes:detalhe_inspecao", args=[inspecao.pk]),
+            },
+        )
+        for inspecao in inspecoes
+    ]
+
+
+def inspecoes_geojson(queryset, bbox: Tuple[float, float, float, float], zoom: int) -> Dict:
+    """FeatureCollection das inspecoes dentro do bbox.
+
+    Em zoom baixo, com muitos pontos, agrupa por celulas de grade no banco
+    (uma linha por celula) em vez de devolver um ponto por inspecao.
+    """
+    oeste, sul, leste, norte = bbox
+    queryset = queryset.filter(
+        latitude__isnull=False,
+        longitude__isnull=False,
+        latitude__gte=sul,
+        latitude__lte=norte,
+        longitude__gte=oeste,
+        longitude__lte=leste,
+    ).order_by()
+    total = queryset.count()
+    max_pontos = settings.INSPECAO_MAPA_MAX_PONTOS
+
+    if total <= max_pontos or zoom >= settings.INSPECAO_MAPA_CLUSTER_MAX_ZOOM:
+        features = _inspecao_features(queryset.order_by("-data_inspecao", "-id")[:max_pontos])
+        return {
+            "type": "FeatureCollection",
+            "features": features,
+            "properties": {"total": total, "agrupado": False, "truncado": total > len(features)},
+        }
+
+    # Celula com ~CELULA_PX pixels de lado na projecao web (tiles de 256px).
+    celula = 360.0 / (2 ** zoom) * settings.INSPECAO_MAPA_CELULA_PX / 256
+    celulas = list(
+        queryset.annotate(
+            cx=Floor(Cast("longitude", FloatField()) / celula),
+            cy=Floor(Cast("latitude", FloatField()) / celula),
+        )
+        .values("cx", "cy")
+        .annotate(
+            quantidade=Count("id"),
+            lat=Avg(Cast("latitude", FloatField())),
+            lng=Avg(Cast("longitude", FloatField())),
+            inspecao_id=Max("id"),
+        )
+        .order_by()
+    )
+
+    isoladas = [item["inspecao_id"] for item in celulas if item["quantidade"] == 1]
+    features = _inspecao_features(queryset.filter(pk__in=isoladas)) if isoladas else []
+    for item in celulas:
+        if item["quantidade"] == 1:
+            continue
+        features.append(
+            _ponto_feature(
+                item["lng"],
+                item["lat"],
+                {
+                    "cluster": True,
+                    "quantidade": item["quantidade"],
+                    "bbox": [
+                        item["cx"] * celula,
+                        item["cy"] * celula,
+                        (item["cx"] + 1) * celula,
+                        (item["cy"] + 1) * celula,
+                    ],
+                },
+            )
+        )
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "properties": {"total": total, "agrupado": True, "truncado": False},
+    }
+
+
+@dataclass
+class ProgressoTarefa:
+    tarefa_id: int
+    alteracoes: int = 0
+    delta_janela: int = 0
+    primeira_alteracao: Optional[datetime] = None
+    ultima_alteracao: Optional[datetime] = None
+    velocidade: float = 0.0  # pontos percentuais por dia na janela
+
+
+def velocidade_tarefas(tarefa_ids: Iterable[int], janela_dias: int = None, agora=None) -> Dict[int, ProgressoTarefa]:
+    """Agrega o historico de alteracoes por tarefa em uma unica consulta (GROUP BY tarefa)."""
+    if janela_dias is None:
+        janela_dias = settings.PROGRESSO_JANELA_DIAS
+    agora = agora or timezone.now()
+    inicio = agora - timedelta(days=janela_dias)
+
+    linhas = (
+        InspecaoAlteracaoTarefa.objects.filter(tarefa_id__in=tarefa_ids)
+        .values("tarefa_id")
+        .annotate(
+            alteracoes=Count("id"),
+            primeira=Min("criado_em"),
+            ultima=Max("criado_em"),
+            delta_janela=Sum(
+                F("percentual_depois") - F("percentual_antes"),
+                filter=Q(criado_em__gte=inicio),
+                output_field=IntegerField(),
+            ),
+        )
+        .order_by()
+    )
+    resultado = {}
+    for linha in linhas:
+        delta = linha["delta_janela"] or 0
+        resultado[linha["tarefa_id"]] = ProgressoTarefa(
+            tarefa_id=linha["tarefa_id"],
+            alteracoes=linha["alteracoes"],
+            delta_janela=delta,
+            primeira_alteracao=linha["primeira"],
+            ultima_alteracao=linha["ultima"],
+            velocidade=round(delta / janela_dias, 2) if janela_dias else 0.0,
+        )
+    return resultado
+
+
+def tarefa_parada(tarefa, progresso: Optional[ProgressoTarefa], agora=None) -> bool:
+    """Tarefa em aberto sem avanco dentro de PROGRESSO_TAREFA_PARADA_DIAS."""
+    if tarefa.status == "concluida":
+        return False
+    if progresso is None and tarefa.percentual_concluido == 0:
+        return False
+    agora = agora or timezone.now()
+    limite = agora - timedelta(days=settings.PROGRESSO_TAREFA_PARADA_DIAS)
+    referencia = progresso.ultima_alteracao if progresso else tarefa.atualizado_em
+    return referencia is None or referencia < limite
+
+
+def historico_progresso(tarefa_ids: Iterable[int]) -> Dict[int, List[Dict]]:
+    """Historico completo (antes/depois) das tarefas, em ordem cronologica, numa consulta."""
+    historico: Dict[int, List[Dict]] = {}
+    linhas = (
+        InspecaoAlteracaoTarefa.objects.filter(tarefa_id__in=tarefa_ids)
+        .order_by("tarefa_id", "criado_em", "id")
+        .values(
+            "tarefa_id",
+            "criado_em",
+            "percentual_antes",
+            "percentual_depois",
+            "inspecao_id",
+            "inspecao__usuario__username",
+        )
+    )
+    for linha in linhas:
+        historico.setdefault(linha["tarefa_id"], []).append(
+            {
+                "data": linha["criado_em"].isoformat(),
+                "antes": linha["percentual_antes"],
+                "depois": linha["percentual_depois"],
+                "inspecao_id": linha["inspecao_id"],
+                "usuario": linha["inspecao__usuario__username"],
+            }
+        )
+    return historico
+
+
+def progresso_tarefas_payload(tarefas, janela_dias: int = None, incluir_historico: bool = True) -> List[Dict]:
+    if janela_dias is None:
+        janela_dias = settings.PROGRESSO_JANELA_DIAS
+    tarefas = list(tarefas)
+    ids = [tarefa.pk for tarefa in tarefas]
+    agora = timezone.now()
+    progresso = velocidade_tarefas(ids, janela_dias, agora=agora)
+    historico = historico_progresso(ids) if incluir_historico else {}
+
+    itens = []
+    for tarefa in tarefas:
+        info = progresso.get(tarefa.pk)
+        velocidade = info.velocidade if info else 0.0
+        restante = 100 - tarefa.percentual_concluido
+        previsao = None
+        if restante > 0 and velocidade > 0:
+            previsao = (agora + timedelta(days=restante / velocidade)).date().isoformat()
+        item = {
+            "id": tarefa.pk,
+            "nome": tarefa.nome,
+            "categoria_id": tarefa.categoria_id,
+            "percentual_atual": tarefa.percentual_concluido,
+            "status": tarefa.status,
+            "alteracoes": info.alteracoes if info else 0,
+            "velocidade_pct_dia": velocidade,
+            "ultima_alteracao": info.ultima_alteracao.isoformat() if info and info.ultima_alteracao else None,
+            "parada": tarefa_parada(tarefa, info, agora=agora),
+            "previsao_conclusao": previsao,
+        }
+        if incluir_historico:
+            item["historico"] = historico.get(tarefa.pk, [])
+        itens.append(item)
+    return itens
+
+
+def filtrar_bbox(queryset, bbox: Tuple[float, float, float, float], max_cells: int = 16):
+    """Restringe por prefixos geohash (indice) e depois pelas coordenadas exatas."""
+    oeste, sul, leste, norte = bbox
+    return queryset.filter(
+        geohash_prefix_q(covering_cells(bbox, max_cells=max_cells)),
+        latitude__gte=sul,
+        latitude__lte=norte,
+        longitude__gte=oeste,
+        longitude__lte=leste,
+    )
+
+
+def inspecoes_no_raio(queryset, latitude: float, longitude: float, raio_m: float, limite: int = None) -> List[Inspecao]:
+    """Inspecoes a ate ``raio_m`` metros do ponto, da mais proxima para a mais distante.
+
+    As celulas geohash e o bbox do circulo descartam quase tudo no banco; a
+    distancia exata (haversine) e calculada apenas para os candidatos.
+    """
+    candidatos = filtrar_bbox(queryset, bbox_for_radius(latitude, longitude, raio_m)).order_by()
+    resultado = []
+    for inspecao in candidatos:
+        distancia = haversine_m(latitude, longitude, float(inspecao.latitude), float(inspecao.longitude))
+        if distancia <= raio_m:
+            inspecao.distancia_m = round(distancia, 1)
+            resultado.append(inspecao)
+    resultado.sort(key=lambda inspecao: inspecao.distancia_m)
+    return resultado[:limite] if limite else resultado
@@ -1,3 +1,250 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import time
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from app.storage_latencia import LatenciaFileSystemStorage
+from obras.models import ImagemOtimizada, Obra
+from PIL import Image
+
+from .geo import geohash_prefix_q
+from .models import Inspecao, InspecaoFoto, UploadParcial
+from .services import (
+    anexar_uploads_parciais,
+    gravar_parte_upload,
+    iniciar_upload_parcial,
+    sincronizar_inspecoes,
+    upload_inspecao_fotos,
+)
+
+
+@override_settings(IMAGE_UPLOAD_OPTIMIZE=False)
+class UploadInspecaoFotosTests(TestCase):
+    LATENCIA_MS = 150
+    FOTOS = 4
+
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+        self.storage = LatenciaFileSystemStorage(location=self.pasta, latencia_ms=self.LATENCIA_MS)
+        usuario = get_user_model().objects.create_user("inspetor", password="x")
+        obra = Obra.objects.create(nome="Obra")
+        self.inspecao = Inspecao.objects.create(obra=obra, usuario=usuario, data_inspecao=timezone.now().date())
+
+    def _uploads(self):
+        return [
+            SimpleUploadedFile(f"foto{indice}.jpg", b"\xff\xd8\xff" + bytes(64), content_type="image/jpeg")
+            for indice in range(self.FOTOS)
+        ]
+
+    def _enviar(self, max_workers):
+        inicio = time.monotonic()
+        resultado = upload_inspecao_fotos(
+            self.inspecao, self._uploads(), storage=self.storage, max_workers=max_workers
+        )
+        return time.monotonic() - inicio, resultado
+
+    def test_envio_paralelo_supera_o_sequencial(self):
+        sequencial, resultado_seq = self._enviar(max_workers=1)
+        paralelo, resultado_par = self._enviar(max_workers=self.FOTOS)
+
+        self.assertEqual(len(resultado_seq.fotos), self.FOTOS)
+        self.assertEqual(len(resultado_par.fotos), self.FOTOS)
+        self.assertFalse(resultado_seq.falhas or resultado_par.falhas)
+        # Sequencial paga a latência por foto; paralelo, aproximadamente uma vez.
+        self.assertGreaterEqual(sequencial, self.FOTOS * self.LATENCIA_MS / 1000)
+        self.assertLess(paralelo, sequencial / 2)
+
+
+class StoreFotoOtimizacaoTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        self.storage = FileSystemStorage(location=pasta)
+        usuario = get_user_model().objects.create_user("inspetor", password="x")
+        obra = Obra.objects.create(nome="Obra")
+        self.inspecao = Inspecao.objects.create(obra=obra, usuario=usuario, data_inspecao=timezone.now().date())
+
+    @override_settings(IMAGE_UPLOAD_FORMAT="JPEG")
+    def test_foto_otimizada_registra_estatistica_e_original_fica_sem(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 32), (10, 120, 10)).save(buffer, format="PNG")
+        valida = SimpleUploadedFile("valida.png", buffer.getvalue(), content_type="image/png")
+        quebrada = SimpleUploadedFile("quebrada.jpg", b"\xff\xd8\xff" + bytes(64), content_type="image/jpeg")
+
+        with self.assertLogs("obras.images", "WARNING"):
+            resultado = upload_inspecao_fotos(self.inspecao, [valida, quebrada], storage=self.storage, max_workers=1)
+
+        nomes = sorted(foto.imagem.name for foto in resultado.fotos)
+        self.assertTrue(nomes[0].endswith("quebrada.jpg"))
+        self.assertTrue(nomes[1].endswith("valida.jpg"))
+        with self.storage.open(nomes[0]) as arquivo:
+            self.assertEqual(arquivo.read(), b"\xff\xd8\xff" + bytes(64))
+        stat = ImagemOtimizada.objects.get()
+        self.assertEqual(stat.origem, "inspecoes.InspecaoFoto.imagem")
+        self.assertEqual(stat.arquivo, nomes[1])
+        self.assertEqual((stat.largura, stat.altura, stat.formato), (64, 32, "JPEG"))
+        self.assertEqual(stat.tamanho_original, valida.size)
+        self.assertEqual(stat.tamanho_armazenado, self.storage.size(nomes[1]))
+
+
+class GravarParteUploadTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        self.enterContext(override_settings(CHUNKED_UPLOAD_DIR=pasta))
+        usuario = get_user_model().objects.create_user("inspetor", password="x")
+        obra = Obra.objects.create(nome="Obra")
+        self.upload = iniciar_upload_parcial(obra, usuario, "foto.jpg", 10)
+
+    def test_corpo_e_lido_antes_da_trava(self):
+        eventos = []
+
+        class Corpo(io.BytesIO):
+            def read(self, *args):
+                eventos.append("leitura")
+                return super().read(*args)
+
+        original = UploadParcial.objects.select_for_update
+
+        def travar(*args, **kwargs):
+            eventos.append("trava")
+            return original(*args, **kwargs)
+
+        with mock.patch.object(UploadParcial.objects, "select_for_update", side_effect=travar):
+            upload = gravar_parte_upload(self.upload, 0, Corpo(b"abcde"), 5)
+
+        self.assertEqual(upload.recebido, 5)
+        self.assertEqual(eventos[-1], "trava")
+        self.assertNotIn("leitura", eventos[eventos.index("trava"):])
+        self.assertEqual(upload.caminho.read_bytes(), b"abcde")
+
+        upload = gravar_parte_upload(upload, 5, io.BytesIO(b"fghij"), 5)
+        self.assertTrue(upload.concluido)
+        self.assertEqual(upload.caminho.read_bytes(), b"abcdefghij")
+
+
+class StorageFalhaEm(FileSystemStorage):
+    """Falha ao gravar arquivos cujo nome contem ``falhar``."""
+
+    def _save(self, name, content):
+        if "falhar" in name:
+            raise OSError("storage indisponível")
+        return super()._save(name, content)
+
+
+@override_settings(IMAGE_UPLOAD_OPTIMIZE=False)
+class AnexarUploadsParciaisTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        self.enterContext(override_settings(CHUNKED_UPLOAD_DIR=f"{pasta}/partes"))
+        self.storage = StorageFalhaEm(location=f"{pasta}/media")
+        self.usuario = get_user_model().objects.create_user("inspetor", password="x")
+        self.obra = Obra.objects.create(nome="Obra")
+        self.inspecao = Inspecao.objects.create(
+            obra=self.obra, usuario=self.usuario, data_inspecao=timezone.now().date()
+        )
+
+    def _upload(self, nome):
+        upload = iniciar_upload_parcial(self.obra, self.usuario, nome, 5)
+        return gravar_parte_upload(upload, 0, io.BytesIO(b"abcde"), 5)
+
+    def test_so_descarta_os_uploads_gravados(self):
+        ok, falho = self._upload("ok.jpg"), self._upload("falhar.jpg")
+
+        result = anexar_uploads_parciais(self.inspecao, [ok, falho], storage=self.storage)
+
+        self.assertEqual(len(result.fotos), 1)
+        self.assertEqual(result.pendentes, [("falhar.jpg", "storage indisponível", str(falho.token))])
+        self.assertFalse(UploadParcial.objects.filter(pk=ok.pk).exists())
+        self.assertFalse(ok.caminho.exists())
+        self.assertTrue(UploadParcial.objects.filter(pk=falho.pk).exists())
+        self.assertTrue(falho.caminho.exists())
+
+    def test_erro_no_bulk_create_mantem_os_uploads(self):
+        upload = self._upload("ok.jpg")
+
+        with mock.patch.object(InspecaoFoto.objects, "bulk_create", side_effect=IntegrityError("falhou")):
+            result = anexar_uploads_parciais(self.inspecao, [upload], storage=self.storage)
+
+        self.assertEqual(result.pendentes, [("ok.jpg", "falhou", str(upload.token))])
+        self.assertTrue(upload.caminho.exists())
+        self.assertEqual(self.storage.listdir("")[1], [])
+
+
+class SincronizarInspecoesErrosTests(TestCase):
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user("admin", password="x")
+        self.usuario.profile.role = "admin"
+        self.usuario.profile.save()
+        self.obra = Obra.objects.create(nome="Obra")
+
+    def _entrada(self, obra_id):
+        return {"chave": str(uuid.uuid4()), "obra_id": obra_id}
+
+    def test_falha_transitoria_e_retentavel(self):
+        with mock.patch("inspecoes.services._sincronizar_obra", side_effect=IntegrityError):
+            (resultado,) = sincronizar_inspecoes(self.usuario, [self._entrada(self.obra.pk)])
+
+        self.assertEqual(resultado["status"], "erro")
+        self.assertTrue(resultado["retentavel"])
+
+    def test_falha_nas_fotos_nao_derruba_o_lote_e_o_reenvio_anexa(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        self.enterContext(
+            override_settings(
+                IMAGE_UPLOAD_OPTIMIZE=False, CHUNKED_UPLOAD_DIR=f"{pasta}/partes", MEDIA_ROOT=f"{pasta}/media"
+            )
+        )
+        upload = iniciar_upload_parcial(self.obra, self.usuario, "foto.jpg", 5)
+        gravar_parte_upload(upload, 0, io.BytesIO(b"abcde"), 5)
+        entrada = dict(self._entrada(self.obra.pk), foto_tokens=[str(upload.token)])
+
+        with mock.patch("inspecoes.services.anexar_uploads_parciais", side_effect=OSError("storage fora")):
+            (resultado,) = sincronizar_inspecoes(self.usuario, [entrada])
+
+        self.assertEqual(resultado["status"], "criada")
+        (falha,) = resultado["falhas_fotos"]
+        self.assertTrue(falha["retentavel"])
+        self.assertEqual(falha["token"], str(upload.token))
+        self.assertTrue(UploadParcial.objects.filter(pk=upload.pk).exists())
+
+        (reenvio,) = sincronizar_inspecoes(self.usuario, [entrada])
+
+        self.assertEqual(reenvio["status"], "duplicada")
+        self.assertNotIn("falhas_fotos", reenvio)
+        self.assertEqual(Inspecao.objects.get(pk=resultado["inspecao_id"]).fotos.count(), 1)
+        self.assertFalse(UploadParcial.objects.filter(pk=upload.pk).exists())
+
+    def test_erro_de_dados_nao_e_retentavel(self):
+        resultados = sincronizar_inspecoes(
+            self.usuario, [self._entrada(self.obra.pk + 1000), {"chave": "x", "obra_id": self.obra.pk}]
+        )
+
+        self.assertEqual([r["status"] for r in resultados], ["erro", "erro"])
+        self.assertFalse(any(r["retentavel"] for r in resultados))
+
+
+class GeohashPrefixoTests(TestCase):
+    def test_prefixo_inclui_vizinhos_com_digito_e_letra(self):
+        usuario = get_user_model().objects.create_user("inspetor", password="x")
+        obra = Obra.objects.create(nome="Obra")
+        geohashes = ["6gyf0", "6gyfz", "6gyf", "6gyg0", "6gye9", "6gy"]
+        for geohash in geohashes:
+            inspecao = Inspecao.objects.create(obra=obra, usuario=usuario, data_inspecao=timezone.now().date())
+            Inspecao.objects.filter(pk=inspecao.pk).update(geohash=geohash)
+
+        encontrados = Inspecao.objects.filter(geohash_prefix_q(["6gyf"])).values_list("geohash", flat=True)
+
+        self.assertEqual(sorted(encontrados), ["6gyf", "6gyf0", "6gyfz"])
@@ -5,5 +5,13 @@ urlpatterns = [
     # criar inspeção para uma obra específica
     path("nova/<int:obra_id>/", views.InspecaoCreateView.as_view(), name="nova_inspecao"),
     path("obra/<int:obra_id>/", views.InspecaoObraListView.as_view(), name="lista_obra"),
+    path("obra/<int:obra_id>/mapa.geojson", views.inspecoes_obra_geojson, name="mapa_obra_geojson"),
     path("<int:pk>/", views.InspecaoDetailView.as_view(), name="detalhe_inspecao"),
+    path("<int:pk>/fotos/", views.inspecao_fotos_pagina, name="fotos_inspecao"),
+    path("uploads/<int:obra_id>/", views.iniciar_upload_foto, name="iniciar_upload_foto"),
+    path("uploads/parte/<uuid:token>/", views.upload_foto_parte, name="upload_foto_parte"),
+    path("progresso/tarefa/<int:tarefa_id>/", views.progresso_tarefa, name="progresso_tarefa"),
+    path("progresso/categoria/<int:categoria_id>/", views.progresso_categoria, name="progresso_categoria"),
+    path("proximas/", views.inspecoes_proximas, name="inspecoes_proximas"),
+    path("sync/", views.sincronizar_inspecoes_offline, name="sincronizar_inspecoes"),
 ]
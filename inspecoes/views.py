@@ -1,14 +1,20 @@
+import json
 from decimal import Decimal, InvalidOperation
 
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.shortcuts import get_object_or_404, redirect
+from django.db.models import Count, Max, Min
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
 from django.views.generic import CreateView, DetailView, ListView
 
-from accounts.mixins import RoleRequiredMixin
+from accounts.mixins import RoleRequiredMixin, level_required
 from accounts.models import UserProfile
 from accounts.utils import (
     filter_queryset_by_user_obras,
@@ -16,21 +22,40 @@ from accounts.utils import (
     user_has_obra_access,
 )
 from obras.constants import NO_OBRA_PERMISSION_MESSAGE, READ_ONLY_MESSAGE
-from obras.models import Obra, Tarefa
+from obras.models import Categoria, Obra, Tarefa
 
 from .forms import InspecaoForm
-from .models import Inspecao, InspecaoFoto, InspecaoAlteracaoTarefa
+from .geo import parse_point
+from .models import Inspecao, InspecaoFoto, UploadParcial
+from .services import (
+    UploadOffsetMismatch,
+    anexar_uploads_parciais,
+    anexar_uploads_pendentes,
+    aplicar_alteracoes_tarefas,
+    carregar_uploads_concluidos,
+    gravar_parte_upload,
+    iniciar_upload_parcial,
+    inspecoes_geojson,
+    inspecoes_no_raio,
+    parse_alteracoes_tarefas,
+    parse_bbox,
+    progresso_tarefas_payload,
+    sincronizar_inspecoes,
+    upload_inspecao_fotos,
+)
+
+INSPECAO_ROLES = [
+    UserProfile.Level.ADMIN,
+    UserProfile.Level.NIVEL2,
+    UserProfile.Level.NIVEL1,
+]
 
 
 class InspecaoCreateView(RoleRequiredMixin, CreateView):
     model = Inspecao
     form_class = InspecaoForm
     template_name = "inspecoes/inspecao_form.html"
-    allowed_roles = [
-        UserProfile.Level.ADMIN,
-        UserProfile.Level.NIVEL2,
-        UserProfile.Level.NIVEL1,
-    ]
+    allowed_roles = INSPECAO_ROLES
 
     def dispatch(self, request, *args, **kwargs):
         self.obra = get_object_or_404(Obra, pk=kwargs["obra_id"])
@@ -90,6 +115,10 @@ class InspecaoCreateView(RoleRequiredMixin, CreateView):
         user_level = get_user_level(self.request.user)
 
         try:
+            alteracoes = self._alteracoes_submetidas()
+            uploads_parciais = carregar_uploads_concluidos(
+                self.request.POST.getlist("foto_tokens"), self.request.user, self.obra
+            )
             with transaction.atomic():
                 response = super().form_valid(form)
 
@@ -111,76 +140,55 @@ class InspecaoCreateView(RoleRequiredMixin, CreateView):
                             "Localização não autorizada ou indisponível. A inspeção foi salva sem coordenadas.",
                         )
 
-                tarefas = (
-                    Tarefa.objects.filter(categoria__obra=self.obra)
-                    .select_related("categoria")
-                    .order_by("categoria_id", "ordem", "id")
-                )
-
-                alteracoes = []
-                for tarefa in tarefas:
-                    field_name = f"task_percent_{tarefa.id}"
-                    raw_value = self.request.POST.get(field_name)
-                    if raw_value is None:
-                        continue
-
-                    try:
-                        progress = int(raw_value)
-                    except (TypeError, ValueError):
-                        raise ValidationError(
-                            f"Percentual inválido para a tarefa '{tarefa.nome}'."
-                        )
-
-                    if not (0 <= progress <= 100):
-                        raise ValidationError(
-                            f"Percentual inválido para a tarefa '{tarefa.nome}'. Use 0..100."
-                        )
-
-                    if (
-                        user_level == UserProfile.Level.NIVEL1
-                        and tarefa.status == "concluida"
-                        and progress != tarefa.percentual_concluido
-                    ):
-                        raise ValidationError(
-                            f"Tarefa '{tarefa.nome}' concluída: somente Nível 2/ADM pode alterar."
-                        )
-
-                    percentual_antes = tarefa.percentual_concluido
-                    if progress != percentual_antes:
-                        tarefa.percentual_concluido = progress
-                        try:
-                            tarefa.save()
-                        except ValidationError as exc:
-                            message = (
-                                exc.messages[0]
-                                if getattr(exc, "messages", None)
-                                else str(exc)
-                            )
-                            raise ValidationError(
-                                f"Erro ao atualizar a tarefa '{tarefa.nome}': {message}"
-                            )
-                        alteracoes.append(
-                            InspecaoAlteracaoTarefa(
-                                inspecao=self.object,
-                                tarefa=tarefa,
-                                percentual_antes=percentual_antes,
-                                percentual_depois=progress,
-                            )
-                        )
-
-                if alteracoes:
-                    InspecaoAlteracaoTarefa.objects.bulk_create(alteracoes)
-
-                fotos = self.request.FILES.getlist("fotos")
-                for foto in fotos:
-                    InspecaoFoto.objects.create(inspecao=self.object, imagem=foto)
-
-                return response
+                aplicar_alteracoes_tarefas(self.object, alteracoes, user_level)
         except ValidationError as exc:
             message = exc.messages[0] if getattr(exc, "messages", None) else str(exc)
             form.add_error(None, message)
             return self.form_invalid(form)
 
+        # Upload das fotos fora da transacao: os envios ao storage rodam em paralelo.
+        upload_result = upload_inspecao_fotos(self.object, self.request.FILES.getlist("fotos"))
+        if uploads_parciais:
+            parciais_result = anexar_uploads_parciais(self.object, uploads_parciais)
+            upload_result.fotos.extend(parciais_result.fotos)
+            upload_result.falhas.extend(parciais_result.falhas)
+            upload_result.pendentes.extend(parciais_result.pendentes)
+        for nome_arquivo, erro in upload_result.falhas:
+            messages.warning(
+                self.request,
+                f"Não foi possível enviar a foto '{nome_arquivo}': {erro}",
+            )
+        if upload_result.pendentes:
+            from fila.services import enqueue
+
+            enqueue(
+                anexar_uploads_pendentes,
+                [self.object.pk, [token for _nome, _erro, token in upload_result.pendentes]],
+                chave=f"fotos_pendentes:{self.object.pk}",
+            )
+            for nome_arquivo, erro, _token in upload_result.pendentes:
+                messages.warning(
+                    self.request,
+                    f"Não foi possível enviar a foto '{nome_arquivo}' agora ({erro}). "
+                    "Ela ficou guardada e será anexada automaticamente.",
+                )
+        return response
+
+    def _alteracoes_submetidas(self):
+        """Tarefas alteradas: payload enxuto do JS ou, sem JS, os campos task_percent_<id>."""
+        if "tarefas_alteradas" in self.request.POST:
+            return parse_alteracoes_tarefas(self.request.POST["tarefas_alteradas"])
+
+        alteracoes = {}
+        for key, raw_value in self.request.POST.items():
+            if not key.startswith("task_percent_"):
+                continue
+            try:
+                alteracoes[int(key[len("task_percent_"):])] = (None, int(raw_value))
+            except (TypeError, ValueError):
+                raise ValidationError("Percentual inválido. Use 0..100.")
+        return alteracoes
+
     def get_success_url(self):
         return reverse("obras:detalhe_obra", args=[self.obra.id])
 
@@ -197,44 +205,68 @@ class InspecaoObraListView(LoginRequiredMixin, ListView):
             return redirect("obras:listar_obras")
         return super().dispatch(request, *args, **kwargs)
 
+    paginate_by = 25
+
     def get_queryset(self):
         return (
             Inspecao.objects.filter(obra=self.obra)
-            .select_related("usuario", "categoria", "tarefa")
+            .select_related("usuario")
             .order_by("-data_inspecao", "-id")
         )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["obra"] = self.obra
-
-        markers_data = []
-        for inspecao in context["inspecoes"]:
-            if inspecao.latitude and inspecao.longitude:
-                markers_data.append(
-                    {
-                        "lat": float(inspecao.latitude),
-                        "lng": float(inspecao.longitude),
-                        "popup": f"{inspecao.data_inspecao:%d/%m/%Y} - {inspecao.usuario.username}",
-                    }
-                )
-        context["markers_data_json"] = markers_data
+        # Apenas a extensao para o enquadramento inicial; os pontos vem do endpoint GeoJSON.
+        extent = Inspecao.objects.filter(
+            obra=self.obra, latitude__isnull=False, longitude__isnull=False
+        ).aggregate(
+            sul=Min("latitude"),
+            norte=Max("latitude"),
+            oeste=Min("longitude"),
+            leste=Max("longitude"),
+        )
+        context["mapa_extent"] = (
+            [[float(extent["sul"]), float(extent["oeste"])], [float(extent["norte"]), float(extent["leste"])]]
+            if extent["sul"] is not None
+            else None
+        )
         return context
 
 
+@login_required
+@require_GET
+def inspecoes_obra_geojson(request, obra_id):
+    """Pontos (ou agrupamentos) das inspecoes da obra dentro do bbox visivel no mapa."""
+    obra = get_object_or_404(Obra, pk=obra_id)
+    if not user_has_obra_access(request.user, obra):
+        return JsonResponse({"status": "error", "message": NO_OBRA_PERMISSION_MESSAGE}, status=403)
+    try:
+        bbox = parse_bbox(request.GET.get("bbox"))
+        zoom = min(max(int(request.GET.get("zoom", "")), 0), 22)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Zoom inválido."}, status=400)
+    except ValidationError as exc:
+        return JsonResponse({"status": "error", "message": exc.messages[0]}, status=400)
+
+    data = inspecoes_geojson(Inspecao.objects.filter(obra=obra), bbox, zoom)
+    response = JsonResponse(data)
+    response["Content-Type"] = "application/geo+json"
+    return response
+
+
 class InspecaoDetailView(LoginRequiredMixin, DetailView):
     model = Inspecao
     template_name = "inspecoes/inspecao_detail.html"
     context_object_name = "inspecao"
 
     def get_queryset(self):
+        # As fotos sao carregadas por pagina (inspecao_fotos_pagina); aqui so a contagem.
         qs = (
             super()
             .get_queryset()
             .select_related("obra", "categoria", "tarefa", "usuario")
-            .prefetch_related(
-                "itens__ponto", "fotos", "alteracoes_tarefas__tarefa__categoria"
-            )
+            .annotate(fotos_count=Count("fotos"))
         )
         return filter_queryset_by_user_obras(qs, self.request.user)
 
@@ -247,4 +279,196 @@ class InspecaoDetailView(LoginRequiredMixin, DetailView):
         )
         context["alteracoes_tarefas"] = alteracoes
         context["alteracoes_tarefas_count"] = len(alteracoes)
+        if self.object.fotos_count:
+            context.update(_fotos_pagina_context(self.object, 1))
         return context
+
+
+def _fotos_pagina_context(inspecao, pagina):
+    por_pagina = settings.INSPECAO_FOTOS_POR_PAGINA
+    inicio = (pagina - 1) * por_pagina
+    # Uma foto a mais indica se existe proxima pagina, sem COUNT.
+    fotos = list(
+        InspecaoFoto.objects.filter(inspecao=inspecao)
+        .only("id", "imagem", "legenda", "inspecao_id")
+        .order_by("criado_em", "id")[inicio : inicio + por_pagina + 1]
+    )
+    proxima = None
+    if len(fotos) > por_pagina:
+        fotos = fotos[:por_pagina]
+        proxima = f"{reverse('inspecoes:fotos_inspecao', args=[inspecao.pk])}?pagina={pagina + 1}"
+    return {"fotos": fotos, "fotos_inicio": inicio, "fotos_proxima_url": proxima}
+
+
+@login_required
+@require_GET
+def inspecao_fotos_pagina(request, pk):
+    """Fragmento HTML com uma pagina da galeria de fotos da inspecao."""
+    inspecao = get_object_or_404(
+        filter_queryset_by_user_obras(Inspecao.objects.only("id", "obra_id"), request.user), pk=pk
+    )
+    try:
+        pagina = max(int(request.GET.get("pagina", "1")), 1)
+    except ValueError:
+        pagina = 1
+    return render(request, "inspecoes/_fotos_pagina.html", _fotos_pagina_context(inspecao, pagina))
+
+
+def _upload_progress_payload(upload):
+    return {
+        "status": "success",
+        "token": str(upload.token),
+        "offset": upload.recebido,
+        "tamanho_total": upload.tamanho_total,
+        "concluido": upload.concluido,
+        "chunk_size": settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+    }
+
+
+@login_required
+@require_POST
+@level_required(INSPECAO_ROLES, json_response=True)
+def iniciar_upload_foto(request, obra_id):
+    obra = get_object_or_404(Obra, pk=obra_id, deletada=False)
+    if not user_has_obra_access(request.user, obra):
+        return JsonResponse({"status": "error", "message": NO_OBRA_PERMISSION_MESSAGE}, status=403)
+    if obra.status == "finalizada":
+        return JsonResponse({"status": "error", "message": READ_ONLY_MESSAGE}, status=403)
+
+    try:
+        data = json.loads(request.body)
+        upload = iniciar_upload_parcial(
+            obra,
+            request.user,
+            data.get("nome"),
+            int(data.get("tamanho")),
+        )
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return JsonResponse({"status": "error", "message": "Dados inválidos."}, status=400)
+    except ValidationError as exc:
+        return JsonResponse({"status": "error", "message": exc.messages[0]}, status=400)
+    return JsonResponse(_upload_progress_payload(upload), status=201)
+
+
+@login_required
+@require_http_methods(["GET", "POST"])
+@level_required(INSPECAO_ROLES, json_response=True)
+def upload_foto_parte(request, token):
+    """GET informa o offset ja recebido; POST grava a parte enviada no corpo bruto."""
+    upload = get_object_or_404(UploadParcial, token=token, usuario=request.user)
+    if request.method == "GET":
+        return JsonResponse(_upload_progress_payload(upload))
+
+    try:
+        offset = int(request.GET.get("offset", ""))
+        tamanho = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Offset inválido."}, status=400)
+
+    try:
+        upload = gravar_parte_upload(upload, offset, request, tamanho)
+    except UploadOffsetMismatch as exc:
+        return JsonResponse(
+            {"status": "conflict", "offset": exc.offset_atual, "message": str(exc)},
+            status=409,
+        )
+    except ValidationError as exc:
+        return JsonResponse({"status": "error", "message": exc.messages[0]}, status=400)
+    return JsonResponse(_upload_progress_payload(upload))
+
+
+@login_required
+@require_POST
+@level_required(INSPECAO_ROLES, json_response=True)
+def sincronizar_inspecoes_offline(request):
+    """Recebe o lote de inspecoes registradas offline; reenvios com a mesma chave sao ignorados."""
+    try:
+        data = json.loads(request.body)
+        entradas = data["inspecoes"]
+        if not isinstance(entradas, list):
+            raise TypeError
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return JsonResponse({"status": "error", "message": "Dados inválidos."}, status=400)
+
+    try:
+        resultados = sincronizar_inspecoes(request.user, entradas)
+    except ValidationError as exc:
+        return JsonResponse({"status": "error", "message": exc.messages[0]}, status=400)
+    return JsonResponse({"status": "success", "resultados": resultados})
+
+
+def _progresso_response(request, obra, tarefas):
+    if not user_has_obra_access(request.user, obra):
+        return JsonResponse({"status": "error", "message": NO_OBRA_PERMISSION_MESSAGE}, status=403)
+    try:
+        janela_dias = int(request.GET.get("dias") or settings.PROGRESSO_JANELA_DIAS)
+        if janela_dias < 1:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Parâmetro dias inválido."}, status=400)
+    incluir_historico = request.GET.get("historico", "1") != "0"
+    return JsonResponse(
+        {
+            "status": "success",
+            "janela_dias": janela_dias,
+            "tarefas": progresso_tarefas_payload(tarefas, janela_dias, incluir_historico),
+        }
+    )
+
+
+@login_required
+@require_GET
+def progresso_tarefa(request, tarefa_id):
+    """Historico de percentuais e velocidade (% por dia) de uma tarefa."""
+    tarefa = get_object_or_404(Tarefa.objects.select_related("categoria__obra"), pk=tarefa_id)
+    return _progresso_response(request, tarefa.categoria.obra, [tarefa])
+
+
+@login_required
+@require_GET
+def progresso_categoria(request, categoria_id):
+    """Historico e velocidade de todas as tarefas de uma categoria."""
+    categoria = get_object_or_404(Categoria.objects.select_related("obra"), pk=categoria_id)
+    tarefas = categoria.tarefas.order_by("ordem", "id")
+    return _progresso_response(request, categoria.obra, tarefas)
+
+
+@login_required
+@require_GET
+def inspecoes_proximas(request):
+    """Inspecoes (de todas as obras acessiveis) num raio em metros a partir de lat/lng."""
+    ponto = parse_point(request.GET.get("lat"), request.GET.get("lng"))
+    if ponto is None:
+        return JsonResponse({"status": "error", "message": "Coordenadas inválidas."}, status=400)
+    try:
+        raio_m = float(request.GET.get("raio") or 500)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Raio inválido."}, status=400)
+    if not (0 < raio_m <= settings.INSPECAO_RAIO_MAX_M):
+        return JsonResponse(
+            {"status": "error", "message": f"Use um raio entre 1 e {settings.INSPECAO_RAIO_MAX_M} metros."},
+            status=400,
+        )
+
+    qs = filter_queryset_by_user_obras(
+        Inspecao.objects.filter(obra__deletada=False).select_related("obra", "usuario"),
+        request.user,
+    )
+    inspecoes = inspecoes_no_raio(qs, ponto[0], ponto[1], raio_m, limite=200)
+    return JsonResponse(
+        {
+            "status": "success",
+            "inspecoes": [
+                {
+                    "id": inspecao.pk,
+                    "obra_id": inspecao.obra_id,
+                    "obra": inspecao.obra.nome,
+                    "data": f"{inspecao.data_inspecao:%d/%m/%Y}",
+                    "usuario": inspecao.usuario.username,
+                    "distancia_m": inspecao.distancia_m,
+                    "url": reverse("inspecoes:detalhe_inspecao", args=[inspecao.pk]),
+                }
+                for inspecao in inspecoes
+            ],
+        }
+    )
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Categoria, Obra, ObraSnapshot, Pendencia, SolucaoPendencia, Tarefa
+from .models import Categoria, ImagemOtimizada, Obra, ObraSnapshot, Pendencia, SolucaoPendencia, Tarefa
 
 
 class CategoriaInline(admin.TabularInline):
@@ -85,3 +85,11 @@ class ObraSnapshotAdmin(admin.ModelAdmin):
     search_fields = ("obra__nome",)
     ordering = ("obra", "data")
 
+
+
+@admin.register(ImagemOtimizada)
+class ImagemOtimizadaAdmin(admin.ModelAdmin):
+    list_display = ("arquivo", "origem", "formato", "tamanho_original", "tamanho_armazenado", "criado_em")
+    list_filter = ("origem", "formato")
+    search_fields = ("arquivo",)
+    ordering = ("-criado_em",)
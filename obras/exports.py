@@ -0,0 +1,292 @@
+"""Exportações em streaming (CSV/XLSX/JSON Lines) com memória constante.
+
+As linhas vêm de ``.iterator(chunk_size=...)`` (cursor no servidor no Postgres)
+e saem para o cliente conforme são geradas; nada é montado inteiro em memória.
+O XLSX é escrito direto no zip de saída, sem dependências externas.
+"""
+
+import csv
+import json
+import re
+import zipfile
+import zlib
+from datetime import date, datetime
+from typing import Iterable, Iterator, Sequence
+from xml.sax.saxutils import escape
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Pendencia
+
+PENDENCIAS_CABECALHO = (
+    "ID",
+    "Obra",
+    "Categoria",
+    "Tarefa",
+    "Descrição",
+    "Prioridade",
+    "Status",
+    "Responsável",
+    "Data limite",
+    "Aberta em",
+    "Fechada em",
+)
+
+_PENDENCIAS_CAMPOS = (
+    "id",
+    "obra__nome",
+    "categoria__nome",
+    "tarefa__nome",
+    "descricao",
+    "prioridade",
+    "status",
+    "responsavel__first_name",
+    "responsavel__last_name",
+    "responsavel__username",
+    "data_limite",
+    "data_abertura",
+    "data_fechamento",
+)
+
+
+def _formatar(valor) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime("%Y-%m-%d %H:%M")
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return str(valor)
+
+
+def linhas_pendencias(queryset) -> Iterator[list]:
+    """Uma lista de strings por pendência, na ordem de ``PENDENCIAS_CABECALHO``."""
+    prioridades = dict(Pendencia.PRIORIDADE_CHOICES)
+    status = dict(Pendencia.STATUS_CHOICES)
+    linhas = queryset.values_list(*_PENDENCIAS_CAMPOS).iterator(
+        chunk_size=settings.EXPORT_CHUNK_SIZE
+    )
+    for (
+        pk,
+        obra,
+        categoria,
+        tarefa,
+        descricao,
+        prioridade,
+        situacao,
+        first_name,
+        last_name,
+        username,
+        data_limite,
+        data_abertura,
+        data_fechamento,
+    ) in linhas:
+        responsavel = f"{first_name or ''} {last_name or ''}".strip() or (username or "")
+        yield [
+            _formatar(pk),
+            _formatar(obra),
+            _formatar(categoria),
+            _formatar(tarefa),
+            _formatar(descricao),
+            prioridades.get(prioridade, prioridade),
+            status.get(situacao, situacao),
+            responsavel,
+            _formatar(data_limite),
+            _formatar(data_abertura),
+            _formatar(data_fechamento),
+        ]
+
+
+class _Eco:
+    """Pseudo-arquivo: ``write`` devolve o texto em vez de guardá-lo."""
+
+    def write(self, valor):
+        return valor
+
+
+# Planilhas interpretam células iniciadas por estes caracteres como fórmula.
+_INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _celula_csv(valor) -> str:
+    """Neutraliza injeção de fórmula: o apóstrofo faz o Excel tratar a célula como texto."""
+    valor = str(valor)
+    if valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def stream_csv(cabecalho: Sequence[str], linhas: Iterable[Sequence[str]]) -> Iterator[str]:
+    # BOM + ";" para o Excel em pt-BR abrir acentos e colunas corretamente.
+    writer = csv.writer(_Eco(), delimiter=";")
+    yield "\ufeff" + writer.writerow(cabecalho)
+    for linha in linhas:
+        yield writer.writerow([_celula_csv(valor) for valor in linha])
+
+
+class _BufferSaida:
+    """Destino não posicionável do zip; ``drenar`` entrega o que já foi escrito."""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+# Caracteres de controle não são aceitos em XML 1.0.
+_XML_INVALIDOS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_ESTATICOS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+
+
+def _xlsx_workbook(nome_planilha: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(nome_planilha[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    )
+
+
+def _xlsx_linha(numero: int, valores: Sequence[str]) -> str:
+    celulas = "".join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_XML_INVALIDOS.sub("", valor))}</t></is></c>'
+        for valor in valores
+    )
+    return f'<row r="{numero}">{celulas}</row>'
+
+
+def stream_xlsx(
+    cabecalho: Sequence[str],
+    linhas: Iterable[Sequence[str]],
+    nome_planilha: str = "Planilha1",
+    linhas_por_bloco: int = 500,
+) -> Iterator[bytes]:
+    saida = _BufferSaida()
+    with zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_DEFLATED) as arquivo:
+        for nome, conteudo in _XLSX_ESTATICOS.items():
+            arquivo.writestr(nome, conteudo)
+        arquivo.writestr("xl/workbook.xml", _xlsx_workbook(nome_planilha))
+        yield saida.drenar()
+
+        with arquivo.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as planilha:
+            planilha.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b"<sheetData>"
+            )
+            planilha.write(_xlsx_linha(1, cabecalho).encode("utf-8"))
+            bloco = []
+            for numero, linha in enumerate(linhas, start=2):
+                bloco.append(_xlsx_linha(numero, linha))
+                if len(bloco) >= linhas_por_bloco:
+                    planilha.write("".join(bloco).encode("utf-8"))
+                    bloco.clear()
+                    yield saida.drenar()
+            planilha.write("".join(bloco).encode("utf-8"))
+            planilha.write(b"</sheetData></worksheet>")
+    yield saida.drenar()
+
+
+# (tipo, modelo, filtro até a obra). Ordem de pais para filhos, para quem
+# importar linha a linha já ter a referência ao pai.
+_OBRA_TABELAS = (
+    ("obra", "obras.Obra", "pk"),
+    ("categoria", "obras.Categoria", "obra"),
+    ("tarefa", "obras.Tarefa", "categoria__obra"),
+    ("ponto_inspecao", "inspecoes.PontoInspecaoTemplate", "obra"),
+    ("pendencia", "obras.Pendencia", "obra"),
+    ("solucao_pendencia", "obras.SolucaoPendencia", "pendencia__obra"),
+    ("inspecao", "inspecoes.Inspecao", "obra"),
+    ("item_inspecao", "inspecoes.ItemInspecao", "inspecao__obra"),
+    ("alteracao_tarefa", "inspecoes.InspecaoAlteracaoTarefa", "inspecao__obra"),
+    ("inspecao_foto", "inspecoes.InspecaoFoto", "inspecao__obra"),
+    ("snapshot", "obras.ObraSnapshot", "obra"),
+    ("anexo", "obras.AnexoObra", "obra"),
+)
+
+
+def registros_obra(obra_id: int, using: str = "default") -> Iterator[dict]:
+    """Toda a árvore da obra, uma tabela por vez, em lotes; nada é pré-carregado.
+
+    Arquivos (fotos, anexos, imagens de pendência) saem como o caminho no storage.
+    """
+    for tipo, modelo, caminho in _OBRA_TABELAS:
+        linhas = (
+            apps.get_model(modelo)
+            ._default_manager.using(using)
+            .filter(**{caminho: obra_id})
+            .order_by("pk")
+            .values()
+            .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        )
+        for dados in linhas:
+            yield {"tipo": tipo, "dados": dados}
+
+
+def stream_jsonl(registros: Iterable[dict], tamanho_bloco: int = 64 * 1024) -> Iterator[bytes]:
+    bloco = []
+    tamanho = 0
+    for registro in registros:
+        linha = json.dumps(registro, cls=DjangoJSONEncoder, ensure_ascii=False).encode("utf-8") + b"\n"
+        bloco.append(linha)
+        tamanho += len(linha)
+        if tamanho >= tamanho_bloco:
+            yield b"".join(bloco)
+            bloco.clear()
+            tamanho = 0
+    if bloco:
+        yield b"".join(bloco)
+
+
+def stream_gzip(partes: Iterable[bytes], nivel: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for parte in partes:
+        comprimido = compressor.compress(parte)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
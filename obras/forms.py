@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from .models import Obra, Categoria, Pendencia, Tarefa, AnexoObra
 from accounts.models import UserProfile
@@ -26,20 +27,58 @@ class ObraForm(forms.ModelForm):
 class ObraCreateForm(ObraForm):
     duplicate_last = forms.BooleanField(
         required=False,
-        label="Duplicar ultima obra (categorias e tarefas)",
+        label="Duplicar obra modelo (categorias, tarefas e pontos de inspecao)",
+    )
+    # Id da obra escolhida no seletor por busca (accounts:buscar_obras_alocacao);
+    # a obra e carregada e validada no clean(), sem listar todas no formulario.
+    obra_origem = forms.IntegerField(required=False, widget=forms.HiddenInput)
+    deslocar_datas = forms.BooleanField(
+        required=False,
+        label="Ajustar prazos das tarefas ao novo inicio",
+        help_text="Desloca prazos e datas previstas pela diferenca entre o inicio da obra modelo e o desta obra.",
     )
 
     def __init__(self, *args, **kwargs):
         self.last_obra = kwargs.pop("last_obra", None)
+        self.obras_modelo = kwargs.pop("obras_modelo", None)
+        if self.obras_modelo is None:
+            self.obras_modelo = Obra.objects.none()
         allow_duplicate = kwargs.pop("allow_duplicate", True)
         super().__init__(*args, **kwargs)
         if not allow_duplicate or self.last_obra is None:
-            self.fields.pop("duplicate_last", None)
+            for nome in ("duplicate_last", "obra_origem", "deslocar_datas"):
+                self.fields.pop(nome, None)
         else:
             nome_modelo = getattr(self.last_obra, "nome", "")
             self.fields["duplicate_last"].help_text = (
-                f"Modelo atual: {nome_modelo}. Apenas categorias e tarefas serao copiadas."
+                f"Sem escolher a obra modelo, usamos a ultima: {nome_modelo}."
             )
+            self.fields["obra_origem"].initial = self.last_obra.pk
+
+    def obra_origem_selecionada(self):
+        """Id e nome da obra modelo marcada no seletor (a enviada ou, de inicio, a ultima)."""
+        if "obra_origem" not in self.fields:
+            return None
+        valor = self["obra_origem"].value()
+        if str(valor) == str(self.last_obra.pk):
+            return {"id": self.last_obra.pk, "nome": self.last_obra.nome}
+        if not str(valor or "").isdigit():
+            return None
+        return self.obras_modelo.filter(pk=int(valor)).values("id", "nome").first()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if "obra_origem" in self.fields:
+            obra_id = cleaned_data.get("obra_origem")
+            cleaned_data["obra_origem"] = None
+            if cleaned_data.get("duplicate_last"):
+                # ``last_obra`` traz so id e nome (vem do cache); a obra completa sai do escopo permitido.
+                cleaned_data["obra_origem"] = self.obras_modelo.filter(pk=obra_id or self.last_obra.pk).first()
+                if cleaned_data["obra_origem"] is None:
+                    self.add_error("obra_origem", "A obra modelo nao esta mais disponivel; escolha outra.")
+        if cleaned_data.get("deslocar_datas") and not cleaned_data.get("data_inicio"):
+            self.add_error("data_inicio", "Informe a data de inicio para ajustar os prazos.")
+        return cleaned_data
 
 
 class CategoriaForm(forms.ModelForm):
@@ -72,6 +111,21 @@ class TarefaForm(forms.ModelForm):
         }
 
 
+class ImportarCronogramaForm(forms.Form):
+    arquivo = forms.FileField(
+        label="Planilha (CSV ou XLSX)",
+        widget=forms.ClearableFileInput(attrs={"accept": ".csv,.xlsx"}),
+    )
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data["arquivo"]
+        if not arquivo.name.lower().endswith((".csv", ".xlsx")):
+            raise forms.ValidationError("Envie um arquivo .csv ou .xlsx.")
+        if arquivo.size > settings.IMPORTACAO_MAX_BYTES:
+            raise forms.ValidationError("Arquivo muito grande.")
+        return arquivo
+
+
 class PendenciaForm(forms.ModelForm):
     class Meta:
         model = Pendencia
@@ -0,0 +1,136 @@
+import logging
+import os
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+_FORMAT_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+
+
+@dataclass
+class ProcessedImage:
+    content: ContentFile
+    original_size: int
+    stored_size: int
+    width: int
+    height: int
+    format: str
+
+
+def _upload_size(upload) -> int:
+    size = getattr(upload, "size", None)
+    if size is not None:
+        return int(size)
+    position = upload.tell()
+    upload.seek(0, os.SEEK_END)
+    size = upload.tell()
+    upload.seek(position)
+    return size
+
+
+def _flatten_alpha(image: Image.Image) -> Image.Image:
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def process_image_upload(upload, max_dimension=None, output_format=None, quality=None) -> Optional[ProcessedImage]:
+    """Decodifica a imagem uma vez, corrige a orientacao EXIF, remove metadados,
+    limita as dimensoes e regrava em WEBP ou JPEG progressivo.
+
+    Retorna None quando o arquivo nao pode ser processado; nesse caso o
+    original deve ser mantido.
+    """
+    if max_dimension is None:
+        max_dimension = settings.IMAGE_UPLOAD_MAX_DIMENSION
+    if output_format is None:
+        output_format = settings.IMAGE_UPLOAD_FORMAT
+    if quality is None:
+        quality = settings.IMAGE_UPLOAD_QUALITY
+    output_format = output_format.upper()
+    if output_format not in _FORMAT_EXTENSIONS:
+        raise ValueError(f"Formato de imagem nao suportado: {output_format!r}")
+
+    original_size = _upload_size(upload)
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            # JPEG: decodifica direto em escala reduzida (DCT), limitando a memoria.
+            image.draft("RGB", (max_dimension, max_dimension))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+            if output_format == "JPEG":
+                image = _flatten_alpha(image)
+            elif image.mode not in ("RGB", "RGBA"):
+                has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+                image = image.convert("RGBA" if has_alpha else "RGB")
+
+            buffer = BytesIO()
+            save_kwargs = {"quality": quality}
+            if output_format == "JPEG":
+                save_kwargs.update(optimize=True, progressive=True)
+            else:
+                save_kwargs.update(method=4)
+            # Sem exif/icc/xmp nos kwargs: os metadados nao sao copiados.
+            image.save(buffer, format=output_format, **save_kwargs)
+            width, height = image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+        logger.warning("Nao foi possivel otimizar a imagem enviada.", exc_info=True)
+        upload.seek(0)
+        return None
+
+    base_name = os.path.splitext(os.path.basename(getattr(upload, "name", "") or "imagem"))[0]
+    content = ContentFile(buffer.getvalue(), name=f"{base_name}.{_FORMAT_EXTENSIONS[output_format]}")
+    return ProcessedImage(
+        content=content,
+        original_size=original_size,
+        stored_size=content.size,
+        width=width,
+        height=height,
+        format=output_format,
+    )
+
+
+def build_upload_stat(origem: str, arquivo: str, processed: ProcessedImage):
+    ImagemOtimizada = apps.get_model("obras", "ImagemOtimizada")
+    return ImagemOtimizada(
+        origem=origem,
+        arquivo=arquivo,
+        tamanho_original=processed.original_size,
+        tamanho_armazenado=processed.stored_size,
+        largura=processed.width,
+        altura=processed.height,
+        formato=processed.format,
+    )
+
+
+class OptimizedImageField(models.ImageField):
+    """ImageField que recomprime o arquivo enviado antes de grava-lo no storage."""
+
+    def pre_save(self, model_instance, add):
+        file = getattr(model_instance, self.attname)
+        processed = None
+        if file and not file._committed and getattr(settings, "IMAGE_UPLOAD_OPTIMIZE", True):
+            processed = process_image_upload(file.file)
+            if processed is not None:
+                setattr(model_instance, self.attname, processed.content)
+
+        file = super().pre_save(model_instance, add)
+
+        if processed is not None:
+            build_upload_stat(
+                f"{self.model._meta.label}.{self.name}", file.name, processed
+            ).save()
+        return file
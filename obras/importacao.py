@@ -0,0 +1,367 @@
+"""Importação do cronograma (categorias e tarefas) a partir de CSV ou XLSX.
+
+Todas as linhas são validadas em memória antes de qualquer escrita; se houver
+erro, nada é gravado e cada problema é reportado com o número da linha. A
+gravação é feita com dois ``bulk_create`` (categorias, depois tarefas) e um
+único recálculo de snapshot no fim.
+"""
+
+import csv
+import io
+import re
+import unicodedata
+import zipfile
+import zlib
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Categoria, Obra, Tarefa
+from .services import agendar_snapshot_obra
+
+COLUNAS = (
+    "categoria",
+    "categoria_descricao",
+    "categoria_prazo_final",
+    "tarefa",
+    "tarefa_descricao",
+    "ordem",
+    "data_inicio_prevista",
+    "data_fim_prevista",
+    "percentual_concluido",
+)
+
+_APELIDOS = {
+    "prazo_final": "categoria_prazo_final",
+    "descricao_categoria": "categoria_descricao",
+    "descricao_tarefa": "tarefa_descricao",
+    "descricao": "tarefa_descricao",
+    "inicio": "data_inicio_prevista",
+    "inicio_previsto": "data_inicio_prevista",
+    "fim": "data_fim_prevista",
+    "fim_previsto": "data_fim_prevista",
+    "percentual": "percentual_concluido",
+}
+
+_XLSX_NS = {
+    "m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_EXCEL_EPOCA = date(1899, 12, 30)
+# Seriais do Excel aceitos como data de cronograma: 1950-01-01 a 2199-12-31.
+_EXCEL_SERIAL_MIN = (date(1950, 1, 1) - _EXCEL_EPOCA).days
+_EXCEL_SERIAL_MAX = (date(2199, 12, 31) - _EXCEL_EPOCA).days
+# Limite do PositiveIntegerField de Tarefa.ordem.
+_ORDEM_MAXIMA = 2147483647
+# Tudo o que um zip/XML malformado pode levantar durante a leitura.
+_ERROS_XLSX = (
+    zipfile.BadZipFile,
+    zlib.error,
+    ElementTree.ParseError,
+    KeyError,
+    IndexError,
+    ValueError,
+    AttributeError,
+    NotImplementedError,
+    RuntimeError,
+)
+
+
+@dataclass
+class ResultadoImportacao:
+    categorias_criadas: int = 0
+    tarefas_criadas: int = 0
+
+
+@dataclass
+class _CategoriaPlano:
+    nome: str
+    descricao: str = ""
+    prazo_final: Optional[date] = None
+    existente: Optional[Categoria] = None
+    tarefas: List[Tarefa] = field(default_factory=list)
+    ordens: Dict[int, int] = field(default_factory=dict)
+    proxima_ordem: int = 1
+
+
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", texto.strip().lower()).strip("_")
+
+
+def _chave_nome(nome: str) -> str:
+    return " ".join(nome.split()).casefold()
+
+
+# ---- leitura ----
+
+def _linhas_csv(conteudo: bytes) -> Iterator[List[str]]:
+    try:
+        texto = conteudo.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        texto = conteudo.decode("latin-1")
+    amostra = texto[:4096]
+    delimitador = ";" if amostra.count(";") > amostra.count(",") else ","
+    yield from csv.reader(io.StringIO(texto), delimiter=delimitador)
+
+
+def _coluna_indice(referencia: str) -> int:
+    indice = 0
+    for letra in re.match(r"[A-Z]+", referencia).group(0):
+        indice = indice * 26 + (ord(letra) - 64)
+    return indice - 1
+
+
+class _NumeroXlsx(str):
+    """Valor de célula numérica do XLSX; só estes podem ser lidos como serial de data."""
+
+
+def _linhas_xlsx(conteudo: bytes) -> Iterator[List[str]]:
+    try:
+        yield from _ler_xlsx(conteudo)
+    except _ERROS_XLSX:
+        raise ValidationError("Arquivo XLSX inválido.")
+
+
+def _ler_membro(arquivo: zipfile.ZipFile, nome: str) -> bytes:
+    # O leitor do zipfile para no file_size declarado, entao checar o cabecalho basta contra zip bomb.
+    if arquivo.getinfo(nome).file_size > settings.IMPORTACAO_XLSX_MAX_DESCOMPACTADO:
+        raise ValidationError("Arquivo XLSX grande demais depois de descompactado.")
+    return arquivo.read(nome)
+
+
+def _ler_xlsx(conteudo: bytes) -> Iterator[List[str]]:
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo:
+        compartilhadas = []
+        if "xl/sharedStrings.xml" in arquivo.namelist():
+            raiz = ElementTree.fromstring(_ler_membro(arquivo, "xl/sharedStrings.xml"))
+            for item in raiz.findall("m:si", _XLSX_NS):
+                compartilhadas.append("".join(t.text or "" for t in item.iter(f"{{{_XLSX_NS['m']}}}t")))
+
+        # Primeira planilha do workbook, resolvida pelos relacionamentos.
+        workbook = ElementTree.fromstring(_ler_membro(arquivo, "xl/workbook.xml"))
+        rels = ElementTree.fromstring(_ler_membro(arquivo, "xl/_rels/workbook.xml.rels"))
+        primeira = workbook.find("m:sheets/m:sheet", _XLSX_NS)
+        rel_id = primeira.get(f"{{{_XLSX_NS['r']}}}id")
+        alvo = next(
+            (rel.get("Target") for rel in rels.findall("rel:Relationship", _XLSX_NS) if rel.get("Id") == rel_id),
+            None,
+        )
+        if not alvo:
+            raise KeyError(rel_id)
+        caminho = alvo.lstrip("/") if alvo.startswith("/") else f"xl/{alvo}"
+
+        planilha = ElementTree.fromstring(_ler_membro(arquivo, caminho))
+        for linha in planilha.iterfind("m:sheetData/m:row", _XLSX_NS):
+            valores: List[str] = []
+            for celula in linha.findall("m:c", _XLSX_NS):
+                posicao = _coluna_indice(celula.get("r")) if celula.get("r") else len(valores)
+                tipo = celula.get("t")
+                if tipo == "inlineStr":
+                    valor = "".join(t.text or "" for t in celula.iter(f"{{{_XLSX_NS['m']}}}t"))
+                else:
+                    bruto = celula.findtext("m:v", default="", namespaces=_XLSX_NS)
+                    if tipo == "s" and bruto:
+                        valor = compartilhadas[int(bruto)]
+                    elif tipo in (None, "n") and bruto:
+                        valor = _NumeroXlsx(bruto)
+                    else:
+                        valor = bruto
+                valores.extend([""] * (posicao - len(valores) + 1))
+                valores[posicao] = valor
+            yield valores
+
+
+def ler_planilha(nome_arquivo: str, conteudo: bytes) -> Iterator[List[str]]:
+    if nome_arquivo.lower().endswith(".xlsx"):
+        return _linhas_xlsx(conteudo)
+    return _linhas_csv(conteudo)
+
+
+# ---- validação ----
+
+def _data(valor: str) -> Optional[date]:
+    numerico = isinstance(valor, _NumeroXlsx)
+    valor = valor.strip()
+    if not valor:
+        return None
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    if numerico:
+        # Células de data do XLSX chegam como número de dias desde 1899-12-30.
+        try:
+            serial = float(valor)
+        except ValueError:
+            serial = None
+        if serial is not None and _EXCEL_SERIAL_MIN <= serial <= _EXCEL_SERIAL_MAX:
+            return _EXCEL_EPOCA + timedelta(days=int(serial))
+    raise ValueError(f"data inválida '{valor}' (use AAAA-MM-DD ou DD/MM/AAAA)")
+
+
+def _inteiro(valor: str, nome: str, minimo: int, maximo: Optional[int] = None) -> Optional[int]:
+    valor = valor.strip().replace(",", ".")
+    if not valor:
+        return None
+    try:
+        numero = float(valor)
+    except ValueError:
+        raise ValueError(f"{nome} deve ser um número inteiro")
+    if not numero.is_integer() or numero < minimo or (maximo is not None and numero > maximo):
+        limite = f"entre {minimo} e {maximo}" if maximo is not None else f"maior ou igual a {minimo}"
+        raise ValueError(f"{nome} deve ser um inteiro {limite}")
+    return int(numero)
+
+
+def _mapear_cabecalho(cabecalho: List[str]) -> Dict[str, int]:
+    indices = {}
+    for posicao, nome in enumerate(cabecalho):
+        coluna = _normalizar(nome)
+        coluna = _APELIDOS.get(coluna, coluna)
+        if coluna in COLUNAS and coluna not in indices:
+            indices[coluna] = posicao
+    if "categoria" not in indices:
+        raise ValidationError("Cabeçalho sem a coluna obrigatória 'categoria'.")
+    return indices
+
+
+def planejar_importacao(obra: Obra, linhas) -> Tuple[List[_CategoriaPlano], List[str]]:
+    """Valida todas as linhas e monta as instâncias a criar, sem tocar no banco além de leituras."""
+    linhas = iter(linhas)
+    try:
+        cabecalho = next(linhas)
+    except StopIteration:
+        raise ValidationError("Arquivo vazio.")
+    indices = _mapear_cabecalho(cabecalho)
+
+    existentes = {_chave_nome(c.nome): c for c in Categoria.objects.filter(obra=obra)}
+    ordens_existentes: Dict[int, set] = {}
+    for categoria_id, ordem in Tarefa.objects.filter(categoria__obra=obra).values_list("categoria_id", "ordem"):
+        ordens_existentes.setdefault(categoria_id, set()).add(ordem)
+
+    planos: Dict[str, _CategoriaPlano] = {}
+    erros: List[str] = []
+    total = 0
+
+    for numero, valores in enumerate(linhas, start=2):
+        if not any((v or "").strip() for v in valores):
+            continue
+        total += 1
+        if total > settings.IMPORTACAO_MAX_LINHAS:
+            erros.append(f"O arquivo excede o limite de {settings.IMPORTACAO_MAX_LINHAS} linhas.")
+            break
+
+        def campo(nome):
+            posicao = indices.get(nome)
+            return (valores[posicao] if posicao is not None and posicao < len(valores) else "") or ""
+
+        try:
+            nome_categoria = " ".join(campo("categoria").split())
+            if not nome_categoria:
+                raise ValueError("categoria é obrigatória")
+            if len(nome_categoria) > 255:
+                raise ValueError("nome da categoria com mais de 255 caracteres")
+
+            chave = _chave_nome(nome_categoria)
+            plano = planos.get(chave)
+            prazo_final = _data(campo("categoria_prazo_final"))
+            descricao_categoria = campo("categoria_descricao").strip()
+            if plano is None:
+                existente = existentes.get(chave)
+                plano = _CategoriaPlano(
+                    nome=existente.nome if existente else nome_categoria,
+                    descricao=descricao_categoria,
+                    prazo_final=prazo_final,
+                    existente=existente,
+                )
+                if existente:
+                    usadas = ordens_existentes.get(existente.pk, set())
+                    plano.ordens = {ordem: 0 for ordem in usadas}
+                    plano.proxima_ordem = max(usadas, default=0) + 1
+                planos[chave] = plano
+            elif prazo_final and plano.prazo_final and prazo_final != plano.prazo_final:
+                raise ValueError(f"prazo final diferente do informado antes para '{plano.nome}'")
+            elif prazo_final and not plano.prazo_final:
+                plano.prazo_final = prazo_final
+
+            nome_tarefa = " ".join(campo("tarefa").split())
+            if not nome_tarefa:
+                continue
+            if len(nome_tarefa) > 255:
+                raise ValueError("nome da tarefa com mais de 255 caracteres")
+
+            inicio = _data(campo("data_inicio_prevista"))
+            fim = _data(campo("data_fim_prevista"))
+            if inicio and fim and fim < inicio:
+                raise ValueError("data_fim_prevista anterior à data_inicio_prevista")
+            if obra.data_inicio and inicio and inicio < obra.data_inicio:
+                raise ValueError("data_inicio_prevista anterior ao início da obra")
+            if plano.prazo_final and fim and fim > plano.prazo_final:
+                raise ValueError("data_fim_prevista depois do prazo final da categoria")
+
+            ordem = _inteiro(campo("ordem"), "ordem", 1, _ORDEM_MAXIMA)
+            if ordem is None:
+                ordem = plano.proxima_ordem
+            if ordem in plano.ordens:
+                anterior = plano.ordens[ordem]
+                origem = f"linha {anterior}" if anterior else "tarefa já cadastrada"
+                raise ValueError(f"ordem {ordem} repetida na categoria '{plano.nome}' ({origem})")
+            plano.ordens[ordem] = numero
+            plano.proxima_ordem = max(plano.proxima_ordem, ordem + 1)
+
+            percentual = _inteiro(campo("percentual_concluido"), "percentual_concluido", 0, 100) or 0
+        except ValueError as exc:
+            erros.append(f"Linha {numero}: {exc}.")
+            continue
+
+        tarefa = Tarefa(
+            nome=nome_tarefa,
+            descricao=campo("tarefa_descricao").strip(),
+            ordem=ordem,
+            data_inicio_prevista=inicio,
+            data_fim_prevista=fim,
+            percentual_concluido=percentual,
+        )
+        tarefa.atualizar_status_por_percentual()
+        plano.tarefas.append(tarefa)
+
+    if not erros and total == 0:
+        erros.append("Nenhuma linha para importar.")
+    return list(planos.values()), erros
+
+
+# ---- gravação ----
+
+def importar_cronograma(obra: Obra, nome_arquivo: str, conteudo: bytes) -> ResultadoImportacao:
+    planos, erros = planejar_importacao(obra, ler_planilha(nome_arquivo, conteudo))
+    if erros:
+        raise ValidationError(erros)
+
+    with transaction.atomic():
+        novas = [
+            Categoria(obra=obra, nome=plano.nome, descricao=plano.descricao, prazo_final=plano.prazo_final)
+            for plano in planos
+            if plano.existente is None
+        ]
+        Categoria.objects.bulk_create(novas)
+        criadas = iter(novas)
+
+        tarefas = []
+        for plano in planos:
+            categoria = plano.existente or next(criadas)
+            for tarefa in plano.tarefas:
+                tarefa.categoria = categoria
+                tarefas.append(tarefa)
+        # bulk_create não dispara os sinais da Tarefa; o snapshot é agendado uma vez abaixo.
+        Tarefa.objects.bulk_create(tarefas, batch_size=500)
+        agendar_snapshot_obra(obra)
+
+    return ResultadoImportacao(categorias_criadas=len(novas), tarefas_criadas=len(tarefas))
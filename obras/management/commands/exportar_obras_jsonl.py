@@ -0,0 +1,56 @@
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from obras.exports import registros_obra, stream_gzip, stream_jsonl
+from obras.models import Obra
+
+
+class Command(BaseCommand):
+    help = "Dumps each obra subtree as JSON Lines (one file per obra), optionally gzipped."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--saida", required=True, help="Diretorio de destino.")
+        parser.add_argument("--obra", type=int, action="append", default=[], help="ID da obra (repetivel).")
+        parser.add_argument("--finalizadas", action="store_true", help="Exporta todas as obras finalizadas.")
+        parser.add_argument("--gzip", action="store_true", help="Grava .jsonl.gz.")
+        parser.add_argument("--database", default="default", help="Alias do banco (ex.: replica).")
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if using not in connections.settings:
+            raise CommandError(f"Banco desconhecido: {using}")
+        if not options["obra"] and not options["finalizadas"]:
+            raise CommandError("Informe --obra ou --finalizadas.")
+
+        obras = Obra.objects.using(using).filter(deletada=False)
+        if options["obra"]:
+            obras = obras.filter(pk__in=options["obra"])
+        if options["finalizadas"]:
+            obras = obras.filter(status="finalizada")
+
+        saida = Path(options["saida"])
+        saida.mkdir(parents=True, exist_ok=True)
+        sufixo = ".jsonl.gz" if options["gzip"] else ".jsonl"
+
+        inicio = time.monotonic()
+        total = 0
+        for obra_id in obras.order_by("pk").values_list("pk", flat=True):
+            conteudo = stream_jsonl(registros_obra(obra_id, using=using))
+            if options["gzip"]:
+                conteudo = stream_gzip(conteudo)
+            destino = saida / f"obra-{obra_id}{sufixo}"
+            temporario = destino.with_name(destino.name + ".tmp")
+            with open(temporario, "wb") as arquivo:
+                for parte in conteudo:
+                    arquivo.write(parte)
+            # Troca atomica: quem le o diretorio nunca ve um arquivo pela metade.
+            os.replace(temporario, destino)
+            total += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{total} obra(s) exportada(s) em {time.monotonic() - inicio:.2f}s.")
+        )
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from obras.models import ImagemOtimizada
+
+
+def _format_bytes(value) -> str:
+    value = float(value or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}GB"
+
+
+class Command(BaseCommand):
+    help = "Reports storage saved by upload-time image recompression, grouped by field."
+
+    def handle(self, *args, **options):
+        rows = (
+            ImagemOtimizada.objects.values("origem")
+            .annotate(
+                total=Count("id"),
+                original=Sum("tamanho_original"),
+                armazenado=Sum("tamanho_armazenado"),
+            )
+            .order_by("origem")
+        )
+        total_original = 0
+        total_armazenado = 0
+        for row in rows:
+            original = row["original"] or 0
+            armazenado = row["armazenado"] or 0
+            total_original += original
+            total_armazenado += armazenado
+            economia = (1 - armazenado / original) * 100 if original else 0
+            self.stdout.write(
+                f"{row['origem']}: {row['total']} imagem(ns), "
+                f"{_format_bytes(original)} -> {_format_bytes(armazenado)} ({economia:.1f}% economizado)"
+            )
+
+        if not total_original:
+            self.stdout.write("Nenhuma imagem otimizada registrada.")
+            return
+        economia_total = (1 - total_armazenado / total_original) * 100
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Total: {_format_bytes(total_original)} -> {_format_bytes(total_armazenado)} "
+                f"({_format_bytes(total_original - total_armazenado)} economizados, {economia_total:.1f}%)"
+            )
+        )
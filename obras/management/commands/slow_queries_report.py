@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.slow_queries import aggregate_entries, iter_log_entries
+
+
+class Command(BaseCommand):
+    help = "Aggregates captured slow queries by fingerprint and lists the top offenders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=10, help="Quantidade de consultas listadas.")
+        parser.add_argument(
+            "--sort",
+            choices=["total", "avg", "max", "count"],
+            default="total",
+            help="Criterio de ordenacao (padrao: tempo total).",
+        )
+        parser.add_argument("--hours", type=float, default=None, help="Considera apenas as ultimas N horas.")
+        parser.add_argument("--path", default=None, help="Arquivo de log (padrao: SLOW_QUERY_LOG_PATH).")
+        parser.add_argument("--explain", action="store_true", help="Exibe o ultimo plano amostrado.")
+
+    def handle(self, *args, **options):
+        since_ts = None
+        if options["hours"]:
+            since_ts = time.time() - options["hours"] * 3600
+
+        path = options["path"] or settings.SLOW_QUERY_LOG_PATH
+        items = aggregate_entries(iter_log_entries(path), since_ts=since_ts)
+        if not items:
+            self.stdout.write(f"Nenhuma consulta lenta registrada em {path}.")
+            return
+
+        sort_key = {
+            "total": "total_ms",
+            "avg": "avg_ms",
+            "max": "max_ms",
+            "count": "count",
+        }[options["sort"]]
+        items.sort(key=lambda item: item[sort_key], reverse=True)
+
+        for position, item in enumerate(items[: options["top"]], start=1):
+            views = ", ".join(
+                f"{name} ({total})"
+                for name, total in sorted(item["views"].items(), key=lambda kv: kv[1], reverse=True)[:3]
+            )
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"#{position} [{item['fingerprint']}] total={item['total_ms']:.1f}ms "
+                    f"n={item['count']} avg={item['avg_ms']:.1f}ms max={item['max_ms']:.1f}ms"
+                )
+            )
+            self.stdout.write(f"  views: {views}")
+            self.stdout.write(f"  sql: {item['query'][:500]}")
+            if options["explain"] and item["explain"]:
+                for line in item["explain"].splitlines():
+                    self.stdout.write(f"    {line}")
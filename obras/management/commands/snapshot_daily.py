@@ -0,0 +1,28 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from obras.services import upsert_snapshots_em_lote
+
+
+class Command(BaseCommand):
+    help = "Writes the daily progress snapshot of every non-deleted obra in one bulk upsert."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--data", default=None, help="Data de referencia (AAAA-MM-DD, padrao: hoje).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Linhas por INSERT.")
+
+    def handle(self, *args, **options):
+        reference_date = None
+        if options["data"]:
+            try:
+                reference_date = date.fromisoformat(options["data"])
+            except ValueError:
+                raise CommandError("Data invalida. Use AAAA-MM-DD.")
+
+        inicio = time.monotonic()
+        total = upsert_snapshots_em_lote(reference_date=reference_date, batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{total} snapshot(s) gravado(s) em {time.monotonic() - inicio:.2f}s.")
+        )
@@ -0,0 +1,45 @@
+from django.db import migrations, models
+import obras.images
+import obras.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("obras", "0008_obra_soft_delete"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImagemOtimizada",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("origem", models.CharField(max_length=100)),
+                ("arquivo", models.CharField(max_length=255)),
+                ("tamanho_original", models.PositiveBigIntegerField()),
+                ("tamanho_armazenado", models.PositiveBigIntegerField()),
+                ("largura", models.PositiveIntegerField()),
+                ("altura", models.PositiveIntegerField()),
+                ("formato", models.CharField(max_length=10)),
+                ("criado_em", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["-criado_em"],
+            },
+        ),
+        migrations.AlterField(
+            model_name="obra",
+            name="capa",
+            field=obras.images.OptimizedImageField(blank=True, null=True, upload_to="obras/capas/"),
+        ),
+        migrations.AlterField(
+            model_name="pendencia",
+            name="imagem_problema",
+            field=obras.images.OptimizedImageField(blank=True, null=True, upload_to="pendencias/problemas/", validators=[obras.models.validate_image_extension_optional, obras.models.validate_image_file]),
+        ),
+        migrations.AlterField(
+            model_name="pendencia",
+            name="imagem_resolucao",
+            field=obras.images.OptimizedImageField(blank=True, null=True, upload_to="pendencias/resolucoes/", validators=[obras.models.validate_image_extension_optional, obras.models.validate_image_file]),
+        ),
+    ]
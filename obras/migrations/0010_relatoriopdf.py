@@ -0,0 +1,32 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("obras", "0009_imagemotimizada_optimized_image_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelatorioPDF",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("versao", models.CharField(max_length=16)),
+                ("arquivo", models.CharField(max_length=255)),
+                ("criado_em", models.DateTimeField(auto_now_add=True)),
+                (
+                    "obra",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="relatorios_pdf",
+                        to="obras.obra",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("obra", "versao")},
+            },
+        ),
+    ]
@@ -2,11 +2,13 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.db.models import Avg
 from django.utils import timezone
 
+from .images import OptimizedImageField
+
 
 class Obra(models.Model):
     STATUS_CHOICES = [
@@ -19,7 +21,7 @@ class Obra(models.Model):
     endereco = models.CharField(max_length=200, blank=True)
     data_inicio = models.DateField(null=True, blank=True)
     data_fim_prevista = models.DateField(null=True, blank=True)
-    capa = models.ImageField(upload_to="obras/capas/", null=True, blank=True)
+    capa = OptimizedImageField(upload_to="obras/capas/", null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="ativa")
     deletada = models.BooleanField(default=False)
     deletada_em = models.DateTimeField(null=True, blank=True)
@@ -40,13 +42,17 @@ def validate_image_file(image):
     if not image:
         return
 
-    max_size = 5 * 1024 * 1024  # 5MB
+    # O arquivo e recomprimido antes de ir para o storage (OptimizedImageField),
+    # entao o limite vale apenas para o upload bruto.
+    max_size = settings.IMAGE_UPLOAD_MAX_BYTES
     content_type = getattr(image, "content_type", "")
     allowed_types = {"image/jpeg", "image/jpg", "image/png", "image/webp"}
     if content_type and content_type not in allowed_types:
         raise ValidationError("Envie arquivos JPG, PNG ou WEBP.")
     if image.size > max_size:
-        raise ValidationError("O tamanho da imagem não pode ultrapassar 5MB.")
+        raise ValidationError(
+            f"O tamanho da imagem não pode ultrapassar {max_size // (1024 * 1024)}MB."
+        )
 
 
 def validate_image_extension_optional(image):
@@ -141,8 +147,8 @@ class Tarefa(models.Model):
                     "Não é possível concluir a tarefa com pendências em aberto."
                 )
 
-    def save(self, *args, **kwargs):
-        # Atualiza o status com base no percentual
+    def atualizar_status_por_percentual(self):
+        """Atualiza o status com base no percentual (tambem usado nas gravacoes em lote)."""
         if self.percentual_concluido == 100:
             if self.status != "concluida":
                 self.status = "concluida"
@@ -154,6 +160,8 @@ class Tarefa(models.Model):
             self.status = "nao_iniciada"
             self.data_fim_real = None
 
+    def save(self, *args, **kwargs):
+        self.atualizar_status_por_percentual()
         self.full_clean()
         return super().save(*args, **kwargs)
 
@@ -189,7 +197,7 @@ class Pendencia(models.Model):
     prioridade = models.CharField(
         max_length=10, choices=PRIORIDADE_CHOICES, default="media"
     )
-    imagem_problema = models.ImageField(
+    imagem_problema = OptimizedImageField(
         upload_to="pendencias/problemas/",
         null=True,
         blank=True,
@@ -205,7 +213,7 @@ class Pendencia(models.Model):
         blank=True,
         related_name="pendencias_responsavel",
     )
-    imagem_resolucao = models.ImageField(
+    imagem_resolucao = OptimizedImageField(
         upload_to="pendencias/resolucoes/",
         null=True,
         blank=True,
@@ -292,6 +300,46 @@ class ObraSnapshot(models.Model):
         return f"{self.obra} - {self.data:%Y-%m-%d}"
 
 
+class ImagemOtimizada(models.Model):
+    origem = models.CharField(max_length=100)
+    arquivo = models.CharField(max_length=255)
+    tamanho_original = models.PositiveBigIntegerField()
+    tamanho_armazenado = models.PositiveBigIntegerField()
+    largura = models.PositiveIntegerField()
+    altura = models.PositiveIntegerField()
+    formato = models.CharField(max_length=10)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-criado_em"]
+
+    def __str__(self):
+        return f"{self.origem} - {self.arquivo}"
+
+    @property
+    def bytes_economizados(self):
+        return int(self.tamanho_original) - int(self.tamanho_armazenado)
+
+
+class RelatorioPDF(models.Model):
+    """PDF gerado do relatório da obra, por versão dos dados.
+
+    ``arquivo`` guarda o nome devolvido pelo storage no ``save`` (o Cloudinary não
+    preserva o nome pedido). ``unique_together`` resolve gerações concorrentes.
+    """
+
+    obra = models.ForeignKey(Obra, on_delete=models.CASCADE, related_name="relatorios_pdf")
+    versao = models.CharField(max_length=16)
+    arquivo = models.CharField(max_length=255)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("obra", "versao")
+
+    def __str__(self):
+        return f"{self.obra} - {self.versao}"
+
+
 @receiver(pre_save, sender=Tarefa)
 def tarefa_capture_previous_state(sender, instance, **kwargs):
     if not instance.pk:
@@ -305,8 +353,8 @@ def tarefa_capture_previous_state(sender, instance, **kwargs):
 def tarefa_upsert_snapshot_on_progress_change(sender, instance, created, **kwargs):
     previous = getattr(instance, "_previous_percentual_concluido", None)
     if created or previous is None or previous != instance.percentual_concluido:
-        from .services import upsert_obra_snapshot
-        upsert_obra_snapshot(instance.categoria.obra)
+        from .services import agendar_snapshot_obra
+        agendar_snapshot_obra(instance.categoria.obra)
 
 
 @receiver(pre_save, sender=Pendencia)
@@ -322,5 +370,12 @@ def pendencia_capture_previous_state(sender, instance, **kwargs):
 def pendencia_create_snapshot_on_resolve(sender, instance, created, **kwargs):
     previous = getattr(instance, "_previous_status", None)
     if created or (previous is not None and previous != instance.status):
-        from .services import upsert_obra_snapshot
-        upsert_obra_snapshot(instance.obra)
+        from .services import agendar_snapshot_obra
+        agendar_snapshot_obra(instance.obra)
+
+
+@receiver(post_save, sender=Obra)
+@receiver(post_delete, sender=Obra)
+def obra_invalidate_model_cache(sender, instance, **kwargs):
+    from .services import invalidar_obra_modelo_cache
+    invalidar_obra_modelo_cache()
@@ -0,0 +1,236 @@
+"""Gerador de PDF mínimo, em Python puro.
+
+Usa só as fontes padrão (Helvetica/Helvetica-Bold, codificação WinAnsi), texto,
+retângulos e linhas — o suficiente para relatórios tabulares sem depender de
+bibliotecas externas. Coordenadas em pontos, origem no canto superior esquerdo.
+"""
+
+import unicodedata
+import zlib
+from typing import List, Optional, Tuple
+
+A4 = (595.28, 841.89)
+
+# Larguras AFM da Helvetica (ASCII 32..126), em milésimos do corpo.
+_LARGURAS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+# A Helvetica-Bold é um pouco mais larga; o fator evita estourar colunas.
+_FATOR_NEGRITO = 1.08
+
+Cor = Tuple[float, float, float]
+PRETO: Cor = (0, 0, 0)
+CINZA: Cor = (0.42, 0.45, 0.49)
+
+
+def largura_texto(texto: str, tamanho: float, negrito: bool = False) -> float:
+    total = 0
+    for char in texto:
+        codigo = ord(char)
+        if codigo > 126:
+            base = unicodedata.normalize("NFKD", char)[:1]
+            codigo = ord(base) if base else 0
+        total += _LARGURAS[codigo - 32] if 32 <= codigo <= 126 else 556
+    return total * tamanho / 1000 * (_FATOR_NEGRITO if negrito else 1)
+
+
+def quebrar_linhas(texto: str, largura: float, tamanho: float, negrito: bool = False) -> List[str]:
+    linhas: List[str] = []
+    for paragrafo in (texto or "").splitlines() or [""]:
+        atual = ""
+        for palavra in paragrafo.split():
+            candidato = f"{atual} {palavra}".strip()
+            if largura_texto(candidato, tamanho, negrito) <= largura:
+                atual = candidato
+                continue
+            if atual:
+                linhas.append(atual)
+            # Palavra maior que a coluna: corta por caractere.
+            while largura_texto(palavra, tamanho, negrito) > largura and len(palavra) > 1:
+                corte = len(palavra)
+                while corte > 1 and largura_texto(palavra[:corte], tamanho, negrito) > largura:
+                    corte -= 1
+                linhas.append(palavra[:corte])
+                palavra = palavra[corte:]
+            atual = palavra
+        linhas.append(atual)
+    return linhas
+
+
+def _literal(texto: str) -> bytes:
+    dados = texto.encode("cp1252", "replace")
+    return b"(" + dados.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class DocumentoPDF:
+    def __init__(self, tamanho=A4, margem: float = 40, titulo: str = ""):
+        self.largura, self.altura = tamanho
+        self.margem = margem
+        self.titulo = titulo
+        self._paginas: List[List[bytes]] = []
+        self.y = 0.0
+        self.nova_pagina()
+
+    @property
+    def largura_util(self) -> float:
+        return self.largura - 2 * self.margem
+
+    def nova_pagina(self) -> None:
+        self._paginas.append([])
+        self.y = self.margem
+
+    def garantir_espaco(self, altura: float) -> None:
+        if self.y + altura > self.altura - self.margem:
+            self.nova_pagina()
+
+    def _op(self, comando: bytes) -> None:
+        self._paginas[-1].append(comando)
+
+    def texto(self, x: float, y: float, texto: str, tamanho: float = 10, negrito: bool = False, cor: Cor = PRETO):
+        fonte = b"/F2" if negrito else b"/F1"
+        base = self.altura - y - tamanho
+        self._op(
+            b"BT %.3f %.3f %.3f rg %s %.1f Tf %.2f %.2f Td %s Tj ET"
+            % (cor[0], cor[1], cor[2], fonte, tamanho, x, base, _literal(texto))
+        )
+
+    def retangulo(self, x: float, y: float, largura: float, altura: float, cor: Cor = PRETO, preenchido=True):
+        operador = b"f" if preenchido else b"S"
+        comando = b"rg" if preenchido else b"RG"
+        self._op(
+            b"%.3f %.3f %.3f %s %.2f %.2f %.2f %.2f re %s"
+            % (cor[0], cor[1], cor[2], comando, x, self.altura - y - altura, largura, altura, operador)
+        )
+
+    def linha_horizontal(self, y: float, cor: Cor = (0.85, 0.85, 0.85)):
+        self._op(
+            b"%.3f %.3f %.3f RG 0.5 w %.2f %.2f m %.2f %.2f l S"
+            % (cor[0], cor[1], cor[2], self.margem, self.altura - y, self.largura - self.margem, self.altura - y)
+        )
+
+    # ---- fluxo ----
+
+    def paragrafo(
+        self,
+        texto: str,
+        tamanho: float = 10,
+        negrito: bool = False,
+        cor: Cor = PRETO,
+        x: Optional[float] = None,
+        largura: Optional[float] = None,
+        espaco_depois: float = 2,
+    ) -> None:
+        x = self.margem if x is None else x
+        largura = self.largura_util if largura is None else largura
+        entrelinha = tamanho * 1.25
+        for linha in quebrar_linhas(texto, largura, tamanho, negrito):
+            self.garantir_espaco(entrelinha)
+            self.texto(x, self.y, linha, tamanho, negrito, cor)
+            self.y += entrelinha
+        self.y += espaco_depois
+
+    def barra(self, percentual: float, cor: Cor, largura: Optional[float] = None, altura: float = 6) -> None:
+        largura = self.largura_util if largura is None else largura
+        self.garantir_espaco(altura + 4)
+        self.retangulo(self.margem, self.y, largura, altura, (0.91, 0.92, 0.93))
+        preenchido = largura * max(0.0, min(float(percentual or 0), 100.0)) / 100
+        if preenchido:
+            self.retangulo(self.margem, self.y, preenchido, altura, cor)
+        self.y += altura + 4
+
+    def tabela(self, colunas: List[Tuple[str, float]], linhas: List[List[str]], tamanho: float = 8.5) -> None:
+        """``colunas``: (título, fração da largura útil). Repete o cabeçalho a cada página."""
+        larguras = [self.largura_util * fracao for _titulo, fracao in colunas]
+        entrelinha = tamanho * 1.25
+
+        def cabecalho():
+            self.garantir_espaco(entrelinha + 4)
+            x = self.margem
+            for (titulo, _fracao), largura in zip(colunas, larguras):
+                self.texto(x, self.y, titulo, tamanho, True, CINZA)
+                x += largura
+            self.y += entrelinha
+            self.linha_horizontal(self.y)
+            self.y += 3
+
+        cabecalho()
+        for linha in linhas:
+            quebradas = [
+                quebrar_linhas(valor, largura - 4, tamanho) for valor, largura in zip(linha, larguras)
+            ]
+            altura = max(len(celula) for celula in quebradas) * entrelinha + 3
+            if self.y + altura > self.altura - self.margem:
+                self.nova_pagina()
+                cabecalho()
+            x = self.margem
+            for celula, largura in zip(quebradas, larguras):
+                for indice, texto in enumerate(celula):
+                    self.texto(x, self.y + indice * entrelinha, texto, tamanho)
+                x += largura
+            self.y += altura
+            self.linha_horizontal(self.y - 1.5, (0.93, 0.93, 0.93))
+
+    # ---- saída ----
+
+    def _rodape(self, numero: int, total: int) -> bytes:
+        texto = f"{self.titulo}  —  página {numero} de {total}" if self.titulo else f"página {numero} de {total}"
+        x = self.largura - self.margem - largura_texto(texto, 7)
+        return b"BT 0.42 0.45 0.49 rg /F1 7 Tf %.2f %.2f Td %s Tj ET" % (x, self.margem / 2, _literal(texto))
+
+    def to_bytes(self) -> bytes:
+        objetos: List[bytes] = []
+
+        def adicionar(conteudo: bytes) -> int:
+            objetos.append(conteudo)
+            return len(objetos)
+
+        catalogo = adicionar(b"")
+        paginas_id = adicionar(b"")
+        fonte = adicionar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        fonte_negrito = adicionar(
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"
+        )
+        recursos = b"<< /Font << /F1 %d 0 R /F2 %d 0 R >> >>" % (fonte, fonte_negrito)
+
+        filhos = []
+        total = len(self._paginas)
+        for numero, comandos in enumerate(self._paginas, start=1):
+            fluxo = zlib.compress(b"\n".join(comandos + [self._rodape(numero, total)]))
+            conteudo = adicionar(
+                b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(fluxo), fluxo)
+            )
+            filhos.append(
+                adicionar(
+                    b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] /Resources %s /Contents %d 0 R >>"
+                    % (paginas_id, self.largura, self.altura, recursos, conteudo)
+                )
+            )
+
+        objetos[catalogo - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % paginas_id
+        objetos[paginas_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % filho for filho in filhos),
+            len(filhos),
+        )
+        info = adicionar(b"<< /Title %s >>" % _literal(self.titulo))
+
+        saida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for numero, conteudo in enumerate(objetos, start=1):
+            offsets.append(len(saida))
+            saida += b"%d 0 obj\n%s\nendobj\n" % (numero, conteudo)
+        xref = len(saida)
+        saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+        for offset in offsets:
+            saida += b"%010d 00000 n \n" % offset
+        saida += b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objetos) + 1,
+            catalogo,
+            info,
+            xref,
+        )
+        return bytes(saida)
@@ -0,0 +1,263 @@
+"""Relatório da obra: dados compartilhados entre a página HTML e o PDF gerado no servidor.
+
+O PDF é guardado no storage de mídia por versão dos dados da obra e registrado
+em ``RelatorioPDF`` com o nome que o storage devolveu; downloads repetidos servem
+o arquivo pronto e só uma mudança nos dados (ou a virada do dia, que altera o
+progresso esperado) provoca nova geração.
+"""
+
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .models import Categoria, Obra, Pendencia, RelatorioPDF, Tarefa
+from .pdf import CINZA, DocumentoPDF
+from .services import calculate_expected_progress, get_obras_progress_snapshot
+
+logger = logging.getLogger(__name__)
+
+_PASTA = "relatorios"
+_COR_REAL = (0.098, 0.529, 0.329)
+_COR_ESPERADO = (0.051, 0.792, 0.941)
+_COR_CATEGORIA = (0.051, 0.431, 0.992)
+
+
+def dados_relatorio(obra: Obra) -> Dict[str, Any]:
+    tarefas_stats = Tarefa.objects.filter(categoria__obra=obra).aggregate(
+        total=Count("id"),
+        concluidas=Count("id", filter=Q(status="concluida")),
+    )
+    total_tarefas = tarefas_stats.get("total") or 0
+    concluidas = tarefas_stats.get("concluidas") or 0
+    progresso_real = get_obras_progress_snapshot([obra]).get(obra.id, {}).get("real", 0.0)
+
+    pendencias = (
+        obra.pendencias.select_related("tarefa", "categoria", "responsavel")
+        .order_by("status", "-data_abertura")
+    )
+    pendencias_grupos = {
+        "aberta": [],
+        "andamento": [],
+        "resolvida": [],
+    }
+    for pendencia in pendencias:
+        pendencias_grupos.setdefault(pendencia.status, []).append(pendencia)
+    pendencias_counts = {
+        status: len(items) for status, items in pendencias_grupos.items()
+    }
+
+    inspecoes_qs = obra.inspecoes.select_related("usuario", "categoria", "tarefa").order_by("-data_inspecao", "-id")
+    inspecoes_total = inspecoes_qs.count()
+    inspecoes_recentes = list(inspecoes_qs[:5])
+    ultima_inspecao = inspecoes_recentes[0] if inspecoes_recentes else None
+
+    return {
+        "categorias": obra.categorias.all(),
+        "total_tarefas": total_tarefas,
+        "tarefas_concluidas": concluidas,
+        "progresso_real": progresso_real,
+        "progresso_esperado": calculate_expected_progress(obra),
+        "pendencias_por_status": pendencias_grupos,
+        "pendencias_counts": pendencias_counts,
+        "pendencias_total": sum(pendencias_counts.values()),
+        "inspecoes_total": inspecoes_total,
+        "ultima_inspecao": ultima_inspecao,
+        "inspecoes_recentes": inspecoes_recentes,
+        "generated_at": timezone.now(),
+    }
+
+
+def versao_relatorio(obra: Obra) -> str:
+    """Impressão digital dos dados que aparecem no relatório (poucos agregados, sem carregar linhas).
+
+    Soma de percentuais e contagens cobrem gravações em lote que não tocam ``atualizado_em``.
+    """
+    partes = [
+        obra.pk,
+        obra.atualizado_em,
+        timezone.now().date(),
+        Categoria.objects.filter(obra=obra).aggregate(n=Count("id"), t=Max("atualizado_em")),
+        Tarefa.objects.filter(categoria__obra=obra).aggregate(
+            n=Count("id"),
+            t=Max("atualizado_em"),
+            p=Sum("percentual_concluido"),
+            c=Count("id", filter=Q(status="concluida")),
+        ),
+        Pendencia.objects.filter(obra=obra).aggregate(
+            n=Count("id"),
+            t=Max("atualizado_em"),
+            a=Count("id", filter=Q(status="aberta")),
+            r=Count("id", filter=Q(status="resolvida")),
+        ),
+        obra.inspecoes.aggregate(n=Count("id"), t=Max("atualizado_em")),
+    ]
+    return hashlib.sha1(repr(partes).encode("utf-8")).hexdigest()[:16]
+
+
+def caminho_relatorio_pdf(obra_id: int, versao: str) -> str:
+    return f"{_PASTA}/obra-{obra_id}/{versao}.pdf"
+
+
+def _data(valor, formato="%d/%m/%Y") -> str:
+    return valor.strftime(formato) if valor else "—"
+
+
+def renderizar_relatorio_pdf(obra: Obra) -> bytes:
+    dados = dados_relatorio(obra)
+    doc = DocumentoPDF(titulo=f"Relatório - {obra.nome}")
+
+    doc.paragrafo(obra.nome, tamanho=18, negrito=True)
+    doc.paragrafo(obra.cliente or "Cliente não informado", cor=CINZA)
+    doc.paragrafo(
+        f"{obra.get_status_display()} · Início {_data(obra.data_inicio)} · "
+        f"Previsto {_data(obra.data_fim_prevista)} · Gerado em {_data(dados['generated_at'], '%d/%m/%Y %H:%M')}",
+        tamanho=9,
+        cor=CINZA,
+        espaco_depois=10,
+    )
+
+    doc.paragrafo(f"Progresso real: {dados['progresso_real']}%", negrito=True)
+    doc.barra(dados["progresso_real"], _COR_REAL)
+    doc.paragrafo(
+        f"{dados['tarefas_concluidas']}/{dados['total_tarefas']} tarefas concluídas", tamanho=8.5, cor=CINZA
+    )
+    if dados["progresso_esperado"] is not None:
+        doc.paragrafo(f"Progresso esperado: {dados['progresso_esperado']}%", negrito=True)
+        doc.barra(dados["progresso_esperado"], _COR_ESPERADO)
+    else:
+        doc.paragrafo("Progresso esperado: não definido", negrito=True)
+    counts = dados["pendencias_counts"]
+    doc.paragrafo(
+        f"Pendências: {dados['pendencias_total']} (abertas {counts.get('aberta', 0)}, "
+        f"em andamento {counts.get('andamento', 0)}, resolvidas {counts.get('resolvida', 0)})",
+        negrito=True,
+        espaco_depois=12,
+    )
+
+    doc.paragrafo("Pendências por status", tamanho=13, negrito=True, espaco_depois=4)
+    titulos = {"aberta": "Abertas", "andamento": "Em andamento", "resolvida": "Resolvidas"}
+    for status, lista in dados["pendencias_por_status"].items():
+        doc.paragrafo(f"{titulos.get(status, status)} ({len(lista)})", tamanho=10, negrito=True, cor=CINZA)
+        if not lista:
+            doc.paragrafo("Nenhuma pendência.", tamanho=8.5, cor=CINZA, espaco_depois=6)
+            continue
+        doc.tabela(
+            [("Tarefa", 0.25), ("Descrição", 0.5), ("Data", 0.25)],
+            [
+                [
+                    pendencia.tarefa.nome,
+                    pendencia.descricao[:500],
+                    (
+                        f"Fechada {_data(pendencia.data_fechamento, '%d/%m/%Y %H:%M')}"
+                        if status == "resolvida"
+                        else f"Abertura {_data(pendencia.data_abertura, '%d/%m/%Y %H:%M')}"
+                    ),
+                ]
+                for pendencia in lista
+            ],
+        )
+        doc.y += 6
+
+    doc.paragrafo("Inspeções", tamanho=13, negrito=True, espaco_depois=4)
+    ultima = dados["ultima_inspecao"]
+    doc.paragrafo(
+        f"{dados['inspecoes_total']} inspeção(ões)"
+        + (f" · última em {_data(ultima.data_inspecao)} às {_data(ultima.data_hora, '%H:%M')}" if ultima else ""),
+        tamanho=9,
+        cor=CINZA,
+    )
+    if dados["inspecoes_recentes"]:
+        doc.tabela(
+            [("Data", 0.2), ("Responsável", 0.25), ("Categoria / Tarefa", 0.55)],
+            [
+                [
+                    f"{_data(insp.data_inspecao)} {_data(insp.data_hora, '%H:%M')}",
+                    insp.usuario.username,
+                    f"{insp.categoria or 'Sem categoria'} / {insp.tarefa.nome if insp.tarefa else 'Sem tarefa'}",
+                ]
+                for insp in dados["inspecoes_recentes"]
+            ],
+        )
+    doc.y += 8
+
+    doc.paragrafo("Categorias e tarefas", tamanho=13, negrito=True, espaco_depois=4)
+    categorias = list(dados["categorias"].prefetch_related("tarefas"))
+    if not categorias:
+        doc.paragrafo("Nenhuma categoria cadastrada.", tamanho=8.5, cor=CINZA)
+    for categoria in categorias:
+        tarefas = sorted(categoria.tarefas.all(), key=lambda tarefa: (tarefa.ordem, tarefa.pk))
+        media = round(sum(t.percentual_concluido for t in tarefas) / len(tarefas), 1) if tarefas else 0
+        doc.garantir_espaco(60)
+        doc.paragrafo(categoria.nome, tamanho=11, negrito=True)
+        doc.paragrafo(
+            f"Prazo: {_data(categoria.prazo_final)} · {media}% concluído", tamanho=8.5, cor=CINZA
+        )
+        doc.barra(media, _COR_CATEGORIA, altura=4)
+        if tarefas:
+            doc.tabela(
+                [("Tarefa", 0.4), ("Prazo", 0.3), ("Status", 0.15), ("Progresso", 0.15)],
+                [
+                    [
+                        tarefa.nome,
+                        f"{_data(tarefa.data_inicio_prevista)} a {_data(tarefa.data_fim_prevista)}",
+                        tarefa.get_status_display(),
+                        f"{tarefa.percentual_concluido}%",
+                    ]
+                    for tarefa in tarefas
+                ],
+            )
+        doc.y += 8
+
+    return doc.to_bytes()
+
+
+def gerar_relatorio_pdf(obra_id: int) -> Optional[RelatorioPDF]:
+    """Gera (se preciso) o PDF da versão atual e remove versões anteriores. Usado pela fila."""
+    obra = Obra.objects.filter(pk=obra_id, deletada=False).first()
+    if obra is None:
+        return None
+    versao = versao_relatorio(obra)
+    existente = RelatorioPDF.objects.filter(obra=obra, versao=versao).first()
+    if existente is not None:
+        return existente
+
+    salvo = default_storage.save(
+        caminho_relatorio_pdf(obra.pk, versao), ContentFile(renderizar_relatorio_pdf(obra))
+    )
+    try:
+        with transaction.atomic():
+            relatorio = RelatorioPDF.objects.create(obra=obra, versao=versao, arquivo=salvo)
+    except IntegrityError:
+        # Outra geração registrou a mesma versão primeiro; fica a dela.
+        default_storage.delete(salvo)
+        return RelatorioPDF.objects.get(obra=obra, versao=versao)
+
+    for antigo in RelatorioPDF.objects.filter(obra=obra).exclude(pk=relatorio.pk):
+        try:
+            default_storage.delete(antigo.arquivo)
+        except Exception:
+            logger.warning("Falha ao remover PDF antigo %s", antigo.arquivo, exc_info=True)
+        antigo.delete()
+    return relatorio
+
+
+def abrir_relatorio_pdf(obra: Obra, versao: str):
+    """Arquivo do PDF já gerado para a versão, ou ``None``.
+
+    Lê pelo storage (no Cloudinary, o servidor baixa e repassa), para que o PDF
+    só saia pela view autenticada. Registro sem arquivo é descartado.
+    """
+    relatorio = RelatorioPDF.objects.filter(obra=obra, versao=versao).first()
+    if relatorio is None:
+        return None
+    try:
+        return default_storage.open(relatorio.arquivo, "rb")
+    except OSError:
+        relatorio.delete()
+        return None
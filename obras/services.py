@@ -1,25 +1,69 @@
-from typing import Any, Dict, Iterable, Optional
-from datetime import timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+from datetime import date, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 
-from django.db.models import Avg, Count, Q
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Case, Count, Max, Q, Value, When
 from django.utils import timezone
 
 from accounts.utils import filter_obras_for_user
-from .models import Categoria, Obra, ObraSnapshot, Tarefa
+from .models import Categoria, Obra, ObraSnapshot, Pendencia, Tarefa
 
 
-def get_last_accessible_obra(user) -> Optional[Obra]:
-    """Retorna a obra mais recente disponivel para o usuario, priorizando as ativas."""
-    base_qs = filter_obras_for_user(
-        Obra.objects.filter(deletada=False).prefetch_related("categorias__tarefas"),
-        user,
-    )
-    ordered_qs = base_qs.order_by("-criado_em", "-id")
-    last_active = ordered_qs.filter(status="ativa").first()
-    if last_active:
-        return last_active
-    return ordered_qs.first()
+_OBRA_MODELO_VERSAO = "obras:modelo:versao"
+
+
+class ObraModelo(NamedTuple):
+    pk: int
+    nome: str
+
+
+def _obra_modelo_chave(versao, usuario_id) -> str:
+    return f"obras:modelo:{versao}:{usuario_id}"
+
+
+def invalidar_obra_modelo_cache(usuario_ids: Optional[Iterable[int]] = None) -> None:
+    """Descarta a obra modelo guardada.
+
+    Sem ``usuario_ids`` vale para todos (muda a versao das chaves); com eles,
+    apaga so as entradas desses usuarios, numa chamada ao cache.
+    """
+    if usuario_ids is None:
+        try:
+            cache.incr(_OBRA_MODELO_VERSAO)
+        except ValueError:
+            cache.set(_OBRA_MODELO_VERSAO, 1, None)
+        return
+    versao = cache.get(_OBRA_MODELO_VERSAO)
+    if versao is not None:
+        cache.delete_many([_obra_modelo_chave(versao, usuario_id) for usuario_id in usuario_ids])
+
+
+def get_last_accessible_obra(user) -> Optional[ObraModelo]:
+    """Retorna id e nome da obra mais recente disponivel para o usuario, priorizando as ativas.
+
+    Uma consulta so, guardada no cache por usuario; a estrutura da obra so e lida
+    na hora de clonar (``clone_obra_structure``).
+    """
+    if not getattr(user, "is_authenticated", False):
+        return None
+    versao = cache.get_or_set(_OBRA_MODELO_VERSAO, 1, None)
+    chave = _obra_modelo_chave(versao, user.pk)
+    valor = cache.get(chave)
+    if valor is None:
+        valor = (
+            filter_obras_for_user(Obra.objects.filter(deletada=False), user)
+            .order_by(
+                Case(When(status="ativa", then=Value(0)), default=Value(1)),
+                "-criado_em",
+                "-id",
+            )
+            .values_list("pk", "nome")
+            .first()
+        ) or ()
+        cache.set(chave, valor, settings.OBRA_MODELO_CACHE_S)
+    return ObraModelo(*valor) if valor else None
 
 
 def generate_duplicate_name(original_name: str) -> str:
@@ -36,32 +80,77 @@ def generate_duplicate_name(original_name: str) -> str:
     return f"{base_nome}{sufixo}" if base_nome else "Nova obra (copia)"
 
 
-def clone_obra_structure(source: Obra, target: Obra) -> None:
-    for categoria in source.categorias.all():
-        nova_categoria = Categoria.objects.create(
+_CLONE_LOTE = 500
+
+
+def clone_obra_structure(source: Obra, target: Obra, *, deslocar_datas: bool = False) -> Dict[str, int]:
+    """Copia categorias, tarefas e pontos de inspecao com bulk_create (tarefas em lotes).
+
+    As PKs devolvidas pelo bulk_create das categorias sao mapeadas para as
+    tarefas. Com ``deslocar_datas``, prazos e datas previstas andam junto com a
+    diferenca entre o ``data_inicio`` das duas obras.
+    """
+    from inspecoes.models import PontoInspecaoTemplate
+
+    delta = timedelta(0)
+    if deslocar_datas and source.data_inicio and target.data_inicio:
+        delta = target.data_inicio - source.data_inicio
+
+    def deslocar(valor):
+        return valor + delta if valor else valor
+
+    categorias = list(source.categorias.order_by("pk"))
+    novas_categorias = [
+        Categoria(
             obra=target,
             nome=categoria.nome,
             descricao=categoria.descricao,
-            prazo_final=categoria.prazo_final,
+            prazo_final=deslocar(categoria.prazo_final),
             status=categoria.status,
         )
-        tarefas = []
-        for tarefa in categoria.tarefas.all():
-            tarefas.append(
-                Tarefa(
-                    categoria=nova_categoria,
-                    nome=tarefa.nome,
-                    descricao=tarefa.descricao,
-                    ordem=tarefa.ordem,
-                    data_inicio_prevista=tarefa.data_inicio_prevista,
-                    data_fim_prevista=tarefa.data_fim_prevista,
-                    data_fim_real=None,
-                    status="nao_iniciada",
-                    percentual_concluido=0,
-                )
+        for categoria in categorias
+    ]
+    Categoria.objects.bulk_create(novas_categorias)
+    categoria_map = {antiga.pk: nova.pk for antiga, nova in zip(categorias, novas_categorias)}
+
+    # Tarefas em lotes direto do cursor: a arvore da obra modelo nunca fica inteira em memoria.
+    total_tarefas = 0
+    lote: List[Tarefa] = []
+    campos = ("categoria_id", "nome", "descricao", "ordem", "data_inicio_prevista", "data_fim_prevista")
+    linhas = (
+        Tarefa.objects.filter(categoria__obra=source)
+        .order_by("pk")
+        .values_list(*campos)
+        .iterator(chunk_size=_CLONE_LOTE)
+    )
+    for categoria_id, nome, descricao, ordem, inicio, fim in linhas:
+        lote.append(
+            Tarefa(
+                categoria_id=categoria_map[categoria_id],
+                nome=nome,
+                descricao=descricao,
+                ordem=ordem,
+                data_inicio_prevista=deslocar(inicio),
+                data_fim_prevista=deslocar(fim),
+                data_fim_real=None,
+                status="nao_iniciada",
+                percentual_concluido=0,
             )
-        if tarefas:
-            Tarefa.objects.bulk_create(tarefas)
+        )
+        if len(lote) >= _CLONE_LOTE:
+            Tarefa.objects.bulk_create(lote)
+            total_tarefas += len(lote)
+            lote = []
+    Tarefa.objects.bulk_create(lote)
+    total_tarefas += len(lote)
+
+    pontos = [
+        PontoInspecaoTemplate(obra=target, nome=ponto.nome, descricao=ponto.descricao, ativo=ponto.ativo)
+        for ponto in PontoInspecaoTemplate.objects.filter(obra=source).order_by("pk")
+    ]
+    PontoInspecaoTemplate.objects.bulk_create(pontos)
+
+    return {"categorias": len(novas_categorias), "tarefas": total_tarefas, "pontos": len(pontos)}
 
 
 def _clamp_percentage(value: float) -> float:
@@ -125,15 +214,9 @@ def calculate_expected_progress(obra: Obra, reference_date=None) -> Optional[flo
     return round(_clamp_percentage(percentual), 1)
 
 
-def get_obras_progress_snapshot(obras: Iterable[Obra]) -> Dict[int, Dict[str, Any]]:
-    obras = list(obras)
-    if not obras:
-        return {}
-
-    obra_ids = [obra.id for obra in obras]
+def _tarefa_stats_por_obra(tarefas_qs) -> Dict[int, Dict[str, Any]]:
     tarefa_stats = (
-        Tarefa.objects
-        .filter(categoria__obra_id__in=obra_ids)
+        tarefas_qs
         .values("categoria__obra_id")
         .annotate(
             total=Count("id"),
@@ -141,9 +224,20 @@ def get_obras_progress_snapshot(obras: Iterable[Obra]) -> Dict[int, Dict[str, An
             avg_percentual=Avg("percentual_concluido"),
             tarefas_com_percentual=Count("id", filter=~Q(percentual_concluido__in=[0, 100])),
         )
+        .order_by()
     )
-    stats_map = {item["categoria__obra_id"]: item for item in tarefa_stats}
-    reference_date = timezone.now().date()
+    return {item["categoria__obra_id"]: item for item in tarefa_stats}
+
+
+def get_obras_progress_snapshot(obras: Iterable[Obra], reference_date=None) -> Dict[int, Dict[str, Any]]:
+    obras = list(obras)
+    if not obras:
+        return {}
+
+    obra_ids = [obra.id for obra in obras]
+    stats_map = _tarefa_stats_por_obra(Tarefa.objects.filter(categoria__obra_id__in=obra_ids))
+    if reference_date is None:
+        reference_date = timezone.now().date()
 
     snapshot = {}
     for obra in obras:
@@ -189,6 +283,73 @@ def get_obras_progress_snapshot(obras: Iterable[Obra]) -> Dict[int, Dict[str, An
     return snapshot
 
 
+def kpis_portfolio(obras: Iterable[Obra], reference_date=None) -> List[Dict[str, Any]]:
+    """Indicadores de todas as obras com um agregado agrupado por tabela (sem consulta por obra)."""
+    from inspecoes.models import Inspecao
+
+    obras = list(obras)
+    if not obras:
+        return []
+    hoje = reference_date or timezone.now().date()
+    obra_ids = [obra.id for obra in obras]
+    progresso = get_obras_progress_snapshot(obras, hoje)
+
+    nao_resolvida = ~Q(status="resolvida")
+    pendencias = {
+        item["obra_id"]: item
+        for item in Pendencia.objects.filter(obra_id__in=obra_ids)
+        .values("obra_id")
+        .annotate(
+            abertas_alta=Count("id", filter=nao_resolvida & Q(prioridade="alta")),
+            abertas_media=Count("id", filter=nao_resolvida & Q(prioridade="media")),
+            abertas_baixa=Count("id", filter=nao_resolvida & Q(prioridade="baixa")),
+            vencidas=Count("id", filter=nao_resolvida & Q(data_limite__lt=hoje)),
+        )
+        .order_by()
+    }
+    inspecoes = {
+        item["obra_id"]: item
+        for item in Inspecao.objects.filter(obra_id__in=obra_ids)
+        .values("obra_id")
+        .annotate(
+            ultimos_7=Count("id", filter=Q(data_inspecao__gt=hoje - timedelta(days=7))),
+            ultimos_30=Count("id", filter=Q(data_inspecao__gt=hoje - timedelta(days=30))),
+            ultima=Max("data_inspecao"),
+        )
+        .order_by()
+    }
+
+    linhas = []
+    for obra in obras:
+        prog = progresso.get(obra.id, {})
+        pend = pendencias.get(obra.id, {})
+        insp = inspecoes.get(obra.id, {})
+        ultima = insp.get("ultima")
+        abertas = {
+            "alta": pend.get("abertas_alta", 0),
+            "media": pend.get("abertas_media", 0),
+            "baixa": pend.get("abertas_baixa", 0),
+        }
+        linhas.append(
+            {
+                "obra": obra,
+                "real": prog.get("real", 0.0),
+                "esperado": prog.get("expected"),
+                "delta": prog.get("delta"),
+                "status_label": prog.get("status_label"),
+                "badge_class": prog.get("badge_class"),
+                "pendencias_abertas": abertas,
+                "pendencias_abertas_total": sum(abertas.values()),
+                "pendencias_vencidas": pend.get("vencidas", 0),
+                "inspecoes_7d": insp.get("ultimos_7", 0),
+                "inspecoes_30d": insp.get("ultimos_30", 0),
+                "ultima_inspecao": ultima,
+                "dias_sem_inspecao": (hoje - ultima).days if ultima else None,
+            }
+        )
+    return linhas
+
+
 def calculate_real_progress_for_snapshot(obra: Obra) -> float:
     return calcular_progresso_real(obra)
 
@@ -217,6 +378,73 @@ def upsert_obra_snapshot(obra: Obra, reference_date=None) -> ObraSnapshot:
     return snapshot
 
 
+def upsert_snapshots_em_lote(obras_qs=None, reference_date=None, batch_size: int = 1000) -> int:
+    """Grava o snapshot do dia de todas as obras com um agregado agrupado e um upsert em lote.
+
+    Idempotente: rodar de novo no mesmo dia apenas atualiza os percentuais.
+    """
+    if reference_date is None:
+        reference_date = timezone.now().date()
+    if obras_qs is None:
+        obras_qs = Obra.objects.filter(deletada=False)
+
+    obras = list(obras_qs.only("id", "data_inicio", "data_fim_prevista").order_by("pk"))
+    if not obras:
+        return 0
+    stats_map = _tarefa_stats_por_obra(Tarefa.objects.filter(categoria__obra__in=obras_qs))
+
+    snapshots = []
+    for obra in obras:
+        stats = stats_map.get(obra.id, {})
+        percentual_real = _calculate_real_progress_from_stats(
+            total=stats.get("total") or 0,
+            concluidas=stats.get("concluidas") or 0,
+            avg_percentual=stats.get("avg_percentual"),
+            tarefas_com_percentual=stats.get("tarefas_com_percentual") or 0,
+        )
+        snapshots.append(
+            ObraSnapshot(
+                obra_id=obra.id,
+                data=reference_date,
+                percentual_real=_quantize_percentage(percentual_real),
+                percentual_esperado=_quantize_percentage(calculate_expected_progress(obra, reference_date)),
+            )
+        )
+
+    ObraSnapshot.objects.bulk_create(
+        snapshots,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["obra", "data"],
+        update_fields=["percentual_real", "percentual_esperado"],
+    )
+    return len(snapshots)
+
+
+def upsert_obra_snapshot_por_id(obra_id: int, reference_date: Optional[str] = None) -> None:
+    """Versao serializavel de upsert_obra_snapshot, executada pela fila de trabalhos."""
+    obra = Obra.objects.filter(pk=obra_id).first()
+    if obra is None:
+        return
+    upsert_obra_snapshot(obra, date.fromisoformat(reference_date) if reference_date else None)
+
+
+def agendar_snapshot_obra(obra: Obra, reference_date=None) -> None:
+    """Recalcula o snapshot na hora ou, com SNAPSHOT_ASYNC, pela fila (um pendente por obra/dia)."""
+    if not settings.SNAPSHOT_ASYNC:
+        upsert_obra_snapshot(obra, reference_date)
+        return
+
+    from fila.services import enqueue
+
+    reference_date = reference_date or timezone.now().date()
+    enqueue(
+        upsert_obra_snapshot_por_id,
+        [obra.pk, reference_date.isoformat()],
+        chave=f"snapshot:{obra.pk}:{reference_date.isoformat()}",
+    )
+
+
 def build_snapshot_timeline(obra: Obra, snapshots: Iterable[ObraSnapshot], end_date=None) -> Dict[str, Any]:
     snapshots = list(snapshots)
     if not snapshots and not obra.data_inicio:
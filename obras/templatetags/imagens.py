@@ -0,0 +1,35 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.urls import reverse
+
+from obras.thumbnails import origem_for_fieldfile
+
+register = template.Library()
+
+
+@register.simple_tag
+def miniatura_url(fieldfile, largura=480):
+    """URL da miniatura de um ImageField; cai para a URL original se nao houver rendicao."""
+    if not fieldfile:
+        return ""
+    origem = origem_for_fieldfile(fieldfile)
+    largura = int(largura)
+    if origem is None or largura not in settings.THUMBNAIL_WIDTHS:
+        return fieldfile.url
+    versao = hashlib.sha1(fieldfile.name.encode("utf-8")).hexdigest()[:10]
+    url = reverse(
+        "obras:miniatura_imagem",
+        kwargs={"origem": origem, "pk": fieldfile.instance.pk, "largura": largura},
+    )
+    return f"{url}?v={versao}"
+
+
+@register.simple_tag
+def miniatura_srcset(fieldfile):
+    if not fieldfile or origem_for_fieldfile(fieldfile) is None:
+        return ""
+    return ", ".join(
+        f"{miniatura_url(fieldfile, largura)} {largura}w" for largura in settings.THUMBNAIL_WIDTHS
+    )
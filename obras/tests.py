@@ -1,3 +1,477 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from app.slow_queries import _explain, aggregate_entries, fingerprint_sql, normalize_sql
+from fila.models import Trabalho
+from fila.services import claim_next, run_job
+
+from .exports import stream_csv
+from .images import process_image_upload
+from .importacao import _data, _NumeroXlsx, importar_cronograma, planejar_importacao
+from .models import Categoria, ImagemOtimizada, Obra, RelatorioPDF
+from .services import kpis_portfolio
+from .thumbnails import ThumbnailCache
+
+
+def criar_admin(username="admin"):
+    usuario = get_user_model().objects.create_user(username, password="x")
+    usuario.profile.role = "admin"
+    usuario.profile.save()
+    return usuario
+
+
+class MiniaturaImagemTests(TestCase):
+    def setUp(self):
+        self.client.force_login(criar_admin())
+        self.obra = Obra.objects.create(nome="Obra", capa="obras/capas/enorme.jpg")
+
+    def test_imagem_gigante_vira_404(self):
+        url = reverse("obras:miniatura_imagem", args=["obra-capa", self.obra.pk, 160])
+        with mock.patch("obras.views.get_or_create_thumbnail", side_effect=Image.DecompressionBombError("grande")):
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 404)
+
+    def test_miniatura_descartada_antes_da_leitura_e_gerada_de_novo(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        existente = f"{pasta}/ok.webp"
+        with open(existente, "wb") as arquivo:
+            arquivo.write(b"webp")
+        url = reverse("obras:miniatura_imagem", args=["obra-capa", self.obra.pk, 160])
+
+        with mock.patch(
+            "obras.views.get_or_create_thumbnail", side_effect=[f"{pasta}/descartada.webp", existente]
+        ) as gerar:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(b"".join(resposta.streaming_content), b"webp")
+        self.assertEqual(gerar.call_count, 2)
+
+        with mock.patch("obras.views.get_or_create_thumbnail", return_value=f"{pasta}/sumiu.webp"):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ThumbnailCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+        self.cache = ThumbnailCache(self.pasta, max_bytes=1000, low_water=0.5)
+
+    def test_so_varre_o_diretorio_quando_estoura_o_limite(self):
+        with mock.patch.object(self.cache, "_scan", wraps=self.cache._scan) as scan:
+            self.cache.put("aa01", b"x" * 300)
+            self.cache.put("aa02", b"x" * 300)
+            self.cache.put("aa02", b"x" * 300)
+            self.assertEqual(scan.call_count, 1)
+            self.assertEqual(self.cache._total, 600)
+
+            self.cache.put("bb03", b"x" * 300)
+            self.cache.put("bb04", b"x" * 300)
+            self.assertEqual(scan.call_count, 2)
+
+    def test_descarte_vai_ate_a_marca_baixa_preservando_o_recente(self):
+        for indice in range(4):
+            path = self.cache.put(f"k{indice:03d}", b"x" * 300)
+            os.utime(path, (indice, indice))
+        # O quarto put passou do limite: fica so o arquivo recem-gravado.
+        self.assertIsNone(self.cache.get("k000"))
+        self.assertIsNone(self.cache.get("k001"))
+        self.assertIsNone(self.cache.get("k002"))
+        self.assertIsNotNone(self.cache.get("k003"))
+        self.assertEqual(self.cache._total, 300)
+
+
+def imagem_jpeg(largura, altura, orientacao=None, nome="foto.jpg"):
+    exif = Image.Exif()
+    exif[0x010F] = "Camera"
+    if orientacao:
+        exif[0x0112] = orientacao
+    buffer = io.BytesIO()
+    Image.new("RGB", (largura, altura), (200, 30, 30)).save(buffer, format="JPEG", exif=exif)
+    return SimpleUploadedFile(nome, buffer.getvalue(), content_type="image/jpeg")
+
+
+class ProcessImageUploadTests(SimpleTestCase):
+    def _abrir(self, processada):
+        return Image.open(io.BytesIO(processada.content.read()))
+
+    def test_aplica_orientacao_exif_e_remove_metadados(self):
+        processada = process_image_upload(imagem_jpeg(40, 20, orientacao=6), output_format="JPEG")
+
+        self.assertEqual((processada.width, processada.height), (20, 40))
+        with self._abrir(processada) as imagem:
+            self.assertEqual(imagem.size, (20, 40))
+            self.assertEqual(len(imagem.getexif()), 0)
+            self.assertNotIn("icc_profile", imagem.info)
+
+    def test_limita_a_maior_dimensao(self):
+        processada = process_image_upload(imagem_jpeg(300, 100), max_dimension=100)
+
+        self.assertEqual((processada.width, processada.height), (100, 33))
+
+    def test_formatos_de_saida(self):
+        for formato, extensao in (("WEBP", "webp"), ("JPEG", "jpg")):
+            with self.subTest(formato):
+                upload = imagem_jpeg(30, 30)
+                processada = process_image_upload(upload, output_format=formato)
+
+                self.assertEqual(processada.format, formato)
+                self.assertEqual(processada.content.name, f"foto.{extensao}")
+                self.assertEqual(processada.original_size, upload.size)
+                self.assertEqual(processada.stored_size, processada.content.size)
+                with self._abrir(processada) as imagem:
+                    self.assertEqual(imagem.format, formato)
+
+    def test_png_transparente_em_jpeg_ganha_fundo_branco(self):
+        buffer = io.BytesIO()
+        Image.new("RGBA", (10, 10), (0, 0, 0, 0)).save(buffer, format="PNG")
+        upload = SimpleUploadedFile("logo.png", buffer.getvalue(), content_type="image/png")
+
+        processada = process_image_upload(upload, output_format="JPEG")
+
+        with self._abrir(processada) as imagem:
+            self.assertEqual(imagem.mode, "RGB")
+            self.assertGreater(min(imagem.getpixel((5, 5))), 240)
+
+    def test_arquivo_que_nao_decodifica_fica_com_o_original(self):
+        upload = SimpleUploadedFile("foto.jpg", b"\xff\xd8\xff" + bytes(64), content_type="image/jpeg")
+        upload.seek(10)
+
+        with self.assertLogs("obras.images", "WARNING"):
+            self.assertIsNone(process_image_upload(upload))
+        self.assertEqual(upload.tell(), 0)
+
+
+class OptimizedImageFieldTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=pasta, IMAGE_UPLOAD_FORMAT="WEBP"))
+
+    def test_capa_e_recomprimida_e_registra_estatistica(self):
+        obra = Obra.objects.create(nome="Obra", capa=imagem_jpeg(3000, 1000, nome="capa.jpg"))
+
+        self.assertTrue(obra.capa.name.endswith(".webp"))
+        stat = ImagemOtimizada.objects.get()
+        self.assertEqual(stat.origem, "obras.Obra.capa")
+        self.assertEqual(stat.arquivo, obra.capa.name)
+        self.assertEqual((stat.largura, stat.altura, stat.formato), (2048, 683, "WEBP"))
+        self.assertEqual(stat.tamanho_armazenado, obra.capa.size)
+
+    @override_settings(IMAGE_UPLOAD_OPTIMIZE=False)
+    def test_sem_otimizacao_grava_o_original(self):
+        obra = Obra.objects.create(nome="Obra", capa=imagem_jpeg(30, 30, nome="capa.jpg"))
+
+        self.assertTrue(obra.capa.name.endswith(".jpg"))
+        self.assertFalse(ImagemOtimizada.objects.exists())
+
+
+class StreamCsvTests(SimpleTestCase):
+    def test_celulas_com_formula_viram_texto(self):
+        linhas = [["=HYPERLINK(\"http://x\")", "+1", "-2", "@SUM(A1)", "normal", "a=b"]]
+        saida = "".join(stream_csv(["c1", "c2", "c3", "c4", "c5", "c6"], linhas))
+
+        self.assertEqual(
+            saida.splitlines()[1],
+            '"\'=HYPERLINK(""http://x"")";\'+1;\'-2;\'@SUM(A1);normal;a=b',
+        )
+
+
+_WORKBOOK = (
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="P" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_RELS = (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>'
+)
+_PLANILHA = (
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+    '<row><c r="A1" t="inlineStr"><is><t>categoria</t></is></c>'
+    '<c r="B1" t="inlineStr"><is><t>tarefa</t></is></c>'
+    '<c r="C1" t="inlineStr"><is><t>inicio</t></is></c></row>'
+    '<row><c r="A2" t="inlineStr"><is><t>Fundação</t></is></c>'
+    '<c r="B2" t="inlineStr"><is><t>Escavação</t></is></c><c r="C2"><v>45663</v></c></row>'
+    "</sheetData></worksheet>"
+)
+
+
+def montar_xlsx(**partes):
+    arquivos = {
+        "xl/workbook.xml": _WORKBOOK,
+        "xl/_rels/workbook.xml.rels": _RELS,
+        "xl/worksheets/sheet1.xml": _PLANILHA,
+    }
+    arquivos.update(partes)
+    saida = io.BytesIO()
+    with zipfile.ZipFile(saida, "w") as arquivo:
+        for nome, conteudo in arquivos.items():
+            if conteudo is not None:
+                arquivo.writestr(nome, conteudo)
+    return saida.getvalue()
+
+
+class ImportacaoCronogramaTests(TestCase):
+    def setUp(self):
+        self.obra = Obra.objects.create(nome="Obra")
+
+    def test_serial_excel_so_em_celula_numerica_e_faixa_valida(self):
+        self.assertEqual(_data(_NumeroXlsx("45663")), date(2025, 1, 6))
+        for valor in ("2025", "45663", "20250106", "3000000", "inf"):
+            with self.assertRaises(ValueError):
+                _data(valor)
+        for valor in ("2025", "20250106", "3000000", "inf", "nan", "1e400"):
+            with self.assertRaises(ValueError):
+                _data(_NumeroXlsx(valor))
+
+    def test_datas_fora_da_faixa_viram_erro_de_linha(self):
+        linhas = [
+            ["categoria", "tarefa", "inicio", "fim", "ordem"],
+            ["A", "T1", "20250106", "", ""],
+            ["A", "T2", "inf", "", ""],
+            ["A", "T3", "", "3000000", ""],
+            ["A", "T4", "", "", "1e30"],
+        ]
+        _planos, erros = planejar_importacao(self.obra, linhas)
+
+        self.assertEqual([erro.split(":")[0] for erro in erros], ["Linha 2", "Linha 3", "Linha 4", "Linha 5"])
+
+    def test_xlsx_valido_importa_data_serial(self):
+        resultado = importar_cronograma(self.obra, "cronograma.xlsx", montar_xlsx())
+
+        self.assertEqual(resultado.tarefas_criadas, 1)
+        tarefa = self.obra.categorias.get().tarefas.get()
+        self.assertEqual(tarefa.data_inicio_prevista, date(2025, 1, 6))
+
+    def test_xlsx_malformado_vira_validation_error(self):
+        casos = {
+            "sem workbook": montar_xlsx(**{"xl/workbook.xml": None}),
+            "xml quebrado": montar_xlsx(**{"xl/worksheets/sheet1.xml": "<worksheet"}),
+            "sem sheet": montar_xlsx(
+                **{"xl/workbook.xml": _WORKBOOK.replace('<sheet name="P" sheetId="1" r:id="rId1"/>', "")}
+            ),
+            "rel ausente": montar_xlsx(**{"xl/_rels/workbook.xml.rels": _RELS.replace("rId1", "rId9")}),
+            "string compartilhada ausente": montar_xlsx(
+                **{
+                    "xl/worksheets/sheet1.xml": _PLANILHA.replace(
+                        't="inlineStr"><is><t>Fundação</t></is>', 't="s"><v>7</v>'
+                    )
+                }
+            ),
+            "nao e zip": b"isto nao e um zip",
+        }
+        for nome, conteudo in casos.items():
+            with self.subTest(nome), self.assertRaisesMessage(ValidationError, "Arquivo XLSX inválido."):
+                importar_cronograma(self.obra, "cronograma.xlsx", conteudo)
+
+    @override_settings(IMPORTACAO_XLSX_MAX_DESCOMPACTADO=1024)
+    def test_xlsx_que_descompacta_demais_e_recusado(self):
+        planilha = _PLANILHA.replace("</sheetData>", "<row/>" * 1000 + "</sheetData>")
+        conteudo = montar_xlsx(**{"xl/worksheets/sheet1.xml": planilha})
+
+        with self.assertRaisesMessage(ValidationError, "grande demais depois de descompactado"):
+            importar_cronograma(self.obra, "cronograma.xlsx", conteudo)
+        self.assertFalse(self.obra.categorias.exists())
+
+
+class StorageRenomeia(FileSystemStorage):
+    """Como o Cloudinary: grava com outro nome (sem extensão) e devolve esse nome."""
+
+    def _save(self, name, content):
+        return super()._save(f"media/{uuid.uuid4().hex}", content)
+
+
+class RelatorioObraPdfTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        self.enterContext(
+            override_settings(
+                RELATORIO_PDF_ASYNC=False,
+                STORAGES={
+                    "default": {"BACKEND": "obras.tests.StorageRenomeia", "OPTIONS": {"location": pasta}},
+                    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+                },
+            )
+        )
+        self.client.force_login(criar_admin())
+        self.obra = Obra.objects.create(nome="Obra")
+        self.url = reverse("obras:relatorio_obra_pdf", args=[self.obra.pk])
+
+    def test_pdf_gerado_uma_vez_e_servido_pela_view(self):
+        with mock.patch("obras.relatorio.renderizar_relatorio_pdf", return_value=b"%PDF-1.4 teste") as renderizar:
+            primeira = self.client.get(self.url)
+            segunda = self.client.get(self.url)
+
+        self.assertEqual(renderizar.call_count, 1)
+        for resposta in (primeira, segunda):
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual(b"".join(resposta.streaming_content), b"%PDF-1.4 teste")
+        relatorio = RelatorioPDF.objects.get(obra=self.obra)
+        self.assertTrue(relatorio.arquivo.startswith("media/"))
+
+    def test_nova_versao_remove_a_anterior(self):
+        with mock.patch("obras.relatorio.renderizar_relatorio_pdf", return_value=b"%PDF-1.4 v1"):
+            self.client.get(self.url)
+        anterior = RelatorioPDF.objects.get(obra=self.obra)
+        Obra.objects.filter(pk=self.obra.pk).update(nome="Obra renomeada", atualizado_em=timezone.now())
+
+        with mock.patch("obras.relatorio.renderizar_relatorio_pdf", return_value=b"%PDF-1.4 v2"):
+            resposta = self.client.get(self.url)
+
+        self.assertEqual(b"".join(resposta.streaming_content), b"%PDF-1.4 v2")
+        self.assertEqual(RelatorioPDF.objects.filter(obra=self.obra).count(), 1)
+        self.assertFalse(RelatorioPDF.objects.filter(pk=anterior.pk).exists())
+        self.assertFalse(default_storage.exists(anterior.arquivo))
+
+    @override_settings(RELATORIO_PDF_ASYNC=True)
+    def test_modo_fila_enfileira_uma_vez_e_serve_depois_do_worker(self):
+        with mock.patch("obras.relatorio.renderizar_relatorio_pdf", return_value=b"%PDF-1.4 fila") as renderizar:
+            primeira = self.client.get(self.url)
+            segunda = self.client.get(self.url)
+            self.assertEqual(renderizar.call_count, 0)
+            self.assertEqual((primeira.status_code, segunda.status_code), (202, 202))
+            self.assertEqual(Trabalho.objects.count(), 1)
+
+            self.assertTrue(run_job(claim_next(worker="w1")))
+            resposta = self.client.get(self.url)
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(b"".join(resposta.streaming_content), b"%PDF-1.4 fila")
+
+
+class KpisPortfolioTests(TestCase):
+    def test_progresso_esperado_usa_a_data_de_referencia(self):
+        obra = Obra.objects.create(nome="Obra", data_inicio=date(2025, 1, 1), data_fim_prevista=date(2025, 1, 11))
+
+        (linha,) = kpis_portfolio([obra], reference_date=date(2025, 1, 6))
+
+        self.assertEqual(linha["esperado"], 50.0)
+
+
+class ObraCreateObraModeloTests(TestCase):
+    def setUp(self):
+        self.client.force_login(criar_admin())
+        self.modelo = Obra.objects.create(nome="Modelo")
+        Categoria.objects.create(obra=self.modelo, nome="Fundação")
+        self.outras = [Obra.objects.create(nome=f"Outra obra {indice}") for indice in range(5)]
+        self.url = reverse("obras:nova_obra")
+
+    def _post(self, **dados):
+        base = {
+            "nome": "Nova",
+            "status": "ativa",
+            "duplicate_last": "on",
+            "categorias-TOTAL_FORMS": "0",
+            "categorias-INITIAL_FORMS": "0",
+        }
+        return self.client.post(self.url, {**base, **dados})
+
+    def test_formulario_nao_lista_todas_as_obras(self):
+        resposta = self.client.get(self.url)
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotContains(resposta, '<select name="obra_origem"')
+        self.assertNotContains(resposta, "Outra obra 0")
+        self.assertContains(resposta, 'name="obra_origem"')
+
+    def test_obra_modelo_escolhida_pelo_id(self):
+        resposta = self._post(obra_origem=self.modelo.pk)
+
+        self.assertEqual(resposta.status_code, 302)
+        nova = Obra.objects.exclude(pk__in=[self.modelo.pk] + [obra.pk for obra in self.outras]).get()
+        self.assertEqual(list(nova.categorias.values_list("nome", flat=True)), ["Fundação"])
+
+    def test_obra_modelo_fora_do_escopo_e_recusada(self):
+        Obra.objects.filter(pk=self.modelo.pk).update(deletada=True)
+
+        resposta = self._post(obra_origem=self.modelo.pk)
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, "A obra modelo nao esta mais disponivel")
+
+
+class SlowQueriesTests(SimpleTestCase):
+    def test_normalize_sql_remove_literais_e_listas(self):
+        sql = """SELECT *  FROM obras_obra WHERE nome = 'O''Brien' AND id IN (1, 2, 3) AND x > -1.5"""
+        self.assertEqual(
+            normalize_sql(sql), "SELECT * FROM obras_obra WHERE nome = ? AND id IN (...) AND x > ?"
+        )
+        self.assertEqual(
+            normalize_sql("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)"), "INSERT INTO t (a, b) VALUES (...)"
+        )
+
+    def test_fingerprint_ignora_literais_e_caixa(self):
+        self.assertEqual(
+            fingerprint_sql("SELECT * FROM t WHERE id IN (1, 2)"),
+            fingerprint_sql("select * from t where id in (7)"),
+        )
+        self.assertNotEqual(fingerprint_sql("SELECT a FROM t"), fingerprint_sql("SELECT b FROM t"))
+
+    def test_aggregate_entries_agrupa_por_fingerprint(self):
+        entradas = [
+            {"ts": 100, "fingerprint": "a", "query": "q1", "duration_ms": 10, "view": "v1"},
+            {"ts": 200, "fingerprint": "a", "query": "q1", "duration_ms": 30, "view": "v2", "explain": "plano"},
+            {"ts": 300, "fingerprint": "b", "query": "q2", "duration_ms": 5, "view": "v1"},
+            {"ts": 50, "fingerprint": "b", "query": "q2", "duration_ms": 99, "view": "v1"},
+        ]
+
+        itens = {item["fingerprint"]: item for item in aggregate_entries(entradas, since_ts=100)}
+
+        self.assertEqual(itens["a"]["count"], 2)
+        self.assertEqual(itens["a"]["total_ms"], 40)
+        self.assertEqual(itens["a"]["avg_ms"], 20)
+        self.assertEqual(itens["a"]["max_ms"], 30)
+        self.assertEqual(itens["a"]["views"], {"v1": 1, "v2": 1})
+        self.assertEqual(itens["a"]["explain"], "plano")
+        self.assertEqual(itens["a"]["last_ts"], 200)
+        self.assertEqual(itens["b"]["count"], 1)
+
+    def test_comando_lista_as_piores_consultas(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        caminho = f"{pasta}/slow.jsonl"
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            for fingerprint, duracao in (("lenta", 500), ("rapida", 20), ("rapida", 20), ("rapida", 20), ("lenta", 100)):
+                linha = {"ts": 1, "fingerprint": fingerprint, "query": f"SELECT {fingerprint}", "duration_ms": duracao}
+                arquivo.write(json.dumps(linha) + "\n")
+            arquivo.write("linha quebrada\n")
+
+        saida = io.StringIO()
+        call_command("slow_queries_report", path=caminho, top=1, stdout=saida)
+
+        self.assertIn("[lenta] total=600.0ms n=2", saida.getvalue())
+        self.assertNotIn("rapida", saida.getvalue())
+
+        saida = io.StringIO()
+        call_command("slow_queries_report", path=caminho, sort="count", top=1, stdout=saida)
+        self.assertIn("[rapida]", saida.getvalue())
+
+
+class ExplainSavepointTests(TestCase):
+    def test_explain_com_erro_nao_estraga_a_transacao(self):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertIsNone(_explain(connection, "SELECT * FROM tabela_que_nao_existe", []))
+            self.assertTrue(any("SAVEPOINT" in consulta["sql"] for consulta in consultas))
+            self.assertEqual(Obra.objects.count(), 0)
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import tempfile
+import threading
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# origem -> (modelo, campo, lookup da obra para checagem de acesso)
+THUMBNAIL_SOURCES: Dict[str, Tuple[str, str, Optional[str]]] = {
+    "obra-capa": ("obras.Obra", "capa", None),
+    "pendencia-problema": ("obras.Pendencia", "imagem_problema", "obra"),
+    "pendencia-resolucao": ("obras.Pendencia", "imagem_resolucao", "obra"),
+    "inspecao-foto": ("inspecoes.InspecaoFoto", "imagem", "inspecao__obra"),
+}
+
+_SOURCE_BY_FIELD = {(label, field): origem for origem, (label, field, _lookup) in THUMBNAIL_SOURCES.items()}
+
+
+def origem_for_fieldfile(fieldfile) -> Optional[str]:
+    instance = getattr(fieldfile, "instance", None)
+    field = getattr(fieldfile, "field", None)
+    if instance is None or field is None:
+        return None
+    return _SOURCE_BY_FIELD.get((instance._meta.label, field.name))
+
+
+def thumbnail_key(origem: str, pk: int, largura: int, file_name: str) -> str:
+    raw = f"{origem}:{pk}:{largura}:{file_name}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def render_thumbnail(source, largura: int, quality: int = 75) -> bytes:
+    with Image.open(source) as image:
+        image.draft("RGB", (largura, largura))
+        image = ImageOps.exif_transpose(image)
+        # Caixa alta o suficiente para que so a largura limite a imagem.
+        image.thumbnail((largura, largura * 10), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        buffer = BytesIO()
+        image.save(buffer, format="WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+class ThumbnailCache:
+    """Cache em disco limitado por tamanho, com descarte LRU pelo mtime dos arquivos.
+
+    O tamanho total fica em memoria e e atualizado a cada gravacao; o diretorio so e
+    varrido na primeira gravacao e quando o limite estoura. O descarte desce ate
+    ``low_water`` do limite para que a varredura nao se repita a cada miniatura nova.
+    """
+
+    def __init__(self, directory, max_bytes: int, low_water: float = 0.9):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._total: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.webp"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path_for(key)
+        try:
+            # Atualiza o mtime: o arquivo passa a ser o mais recente no LRU.
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes) -> Path:
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+        with self._lock:
+            if self._total is not None:
+                self._total += len(data) - replaced
+            over_limit = self._total is None or self._total > self.max_bytes
+        if over_limit:
+            self.evict(keep=path)
+        return path
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".webp"):
+                    continue
+                file_path = Path(root) / name
+                try:
+                    stat = file_path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+                total += stat.st_size
+        return entries, total
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        with self._lock:
+            # A varredura tambem corrige o total quando outros processos gravam no mesmo diretorio.
+            entries, total = self._scan()
+            removed = 0
+            if total > self.max_bytes:
+                target = int(self.max_bytes * self.low_water)
+                entries.sort()
+                for _mtime, size, file_path in entries:
+                    if total <= target:
+                        break
+                    if keep is not None and file_path == keep:
+                        continue
+                    try:
+                        file_path.unlink()
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    removed += 1
+            self._total = total
+            return removed
+
+
+_cache: Optional[ThumbnailCache] = None
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    global _cache
+    if _cache is None:
+        _cache = ThumbnailCache(settings.THUMBNAIL_CACHE_DIR, settings.THUMBNAIL_CACHE_MAX_BYTES)
+    return _cache
+
+
+def get_or_create_thumbnail(origem: str, pk: int, largura: int, fieldfile) -> Path:
+    cache = get_thumbnail_cache()
+    key = thumbnail_key(origem, pk, largura, fieldfile.name)
+    path = cache.get(key)
+    if path is not None:
+        return path
+    with fieldfile.open("rb") as source:
+        data = render_thumbnail(source, largura)
+    return cache.put(key, data)
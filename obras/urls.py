@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -6,12 +7,20 @@ app_name = "obras"
 urlpatterns = [
     path("", views.ObraListView.as_view(), name="listar_obras"),
     path("nova/", views.ObraCreateView.as_view(), name="nova_obra"),
-    path("<int:pk>/", views.ObraDetailView.as_view(), name="detalhe_obra"),
+    path(
+        "<int:pk>/",
+        views.obra_detail_async if settings.OBRA_DETALHE_ASYNC else views.ObraDetailView.as_view(),
+        name="detalhe_obra",
+    ),
     path("visao-geral/", views.ObraOverviewView.as_view(), name="visao_geral"),
+    path("portfolio/", views.PortfolioReportView.as_view(), name="relatorio_portfolio"),
+    path("<int:pk>/exportar.jsonl", views.exportar_obra_jsonl, name="exportar_obra_jsonl"),
     path("<int:pk>/relatorio/", views.ObraReportView.as_view(), name="relatorio_obra"),
+    path("<int:pk>/relatorio.pdf", views.relatorio_obra_pdf, name="relatorio_obra_pdf"),
     path("<int:pk>/editar/", views.ObraUpdateView.as_view(), name="editar_obra"),
     path("<int:pk>/excluir/", views.ExcluirObraView.as_view(), name="excluir_obra"),
     path("<int:obra_id>/nova-categoria/", views.CategoriaCreateView.as_view(), name="nova_categoria"),
+    path("<int:obra_id>/importar-cronograma/", views.ImportarCronogramaView.as_view(), name="importar_cronograma"),
     path("categorias/<int:pk>/editar/", views.CategoriaUpdateView.as_view(), name="editar_categoria"),
     path("categorias/<int:pk>/excluir/", views.CategoriaDeleteView.as_view(), name="excluir_categoria"),
     path("<int:obra_id>/nova-pendencia/", views.PendenciaCreateView.as_view(), name="nova_pendencia"),
@@ -23,7 +32,9 @@ urlpatterns = [
     path("tarefa/update-progress/", views.update_task_progress, name="update_task_progress"),
     path("<int:pk>/concluir/", views.ConcluirObraView.as_view(), name="concluir_obra"),
     path("pendencias/", views.PendenciaListView.as_view(), name="listar_pendencias"),
+    path("pendencias/exportar/", views.exportar_pendencias, name="exportar_pendencias"),
     path("pendencias/<int:pk>/", views.PendenciaDetailView.as_view(), name="detalhe_pendencia"),
     path("pendencias/<int:pk>/atualizar/", views.PendenciaUpdateStatusView.as_view(), name="atualizar_pendencia"),
     path("pendencias/<int:pk>/resolver/", views.PendenciaResolveView.as_view(), name="resolver_pendencia"),
+    path("miniaturas/<slug:origem>/<int:pk>/<int:largura>/", views.miniatura_imagem, name="miniatura_imagem"),
 ]
@@ -1,19 +1,28 @@
+import asyncio
 import json
-from django.db import transaction
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
 from django.db.models import Count, Q
 from django.core.paginator import Paginator
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView, TemplateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404, redirect
 from django.shortcuts import render
 from django.urls import reverse_lazy, reverse
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.apps import apps
+from django.http import FileResponse, Http404, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.core.exceptions import ValidationError
+from PIL import Image
 
 from .models import Obra, Categoria, Tarefa, Pendencia, AnexoObra, SolucaoPendencia, ObraSnapshot
 from .forms import (
@@ -25,6 +34,7 @@ from .forms import (
     PendenciaResolveForm,
     CategoriaInlineFormSet,
     AnexoObraForm,
+    ImportarCronogramaForm,
 )
 from .services import (
     clone_obra_structure,
@@ -32,9 +42,25 @@ from .services import (
     get_last_accessible_obra,
     get_obras_progress_snapshot,
     build_snapshot_timeline,
+    kpis_portfolio,
+)
+from .exports import (
+    PENDENCIAS_CABECALHO,
+    linhas_pendencias,
+    registros_obra,
+    stream_csv,
+    stream_gzip,
+    stream_jsonl,
+    stream_xlsx,
 )
+from .importacao import COLUNAS as COLUNAS_CRONOGRAMA, importar_cronograma
+from .relatorio import abrir_relatorio_pdf, dados_relatorio, gerar_relatorio_pdf, versao_relatorio
+from .thumbnails import THUMBNAIL_SOURCES, get_or_create_thumbnail
 from .utils import calculate_progress_milestones
 from accounts.mixins import RoleRequiredMixin, level_required
+from app.db_router import ReplicaReadMixin, usar_replica
+from app.slow_queries import SlowQueryRecorder
+from inspecoes.services import tarefa_parada, velocidade_tarefas
 from accounts.models import UserProfile, ObraAlocacao
 from accounts.utils import (
     filter_obras_for_user,
@@ -104,7 +130,7 @@ class ObraListView(LoginRequiredMixin, ListView):
         return context
 
 
-class ObraOverviewView(LoginRequiredMixin, ListView):
+class ObraOverviewView(LoginRequiredMixin, ReplicaReadMixin, ListView):
     model = Obra
     template_name = "obras/visao_geral.html"
     context_object_name = "obras"
@@ -179,6 +205,91 @@ class ObraOverviewView(LoginRequiredMixin, ListView):
         return context
 
 
+PORTFOLIO_ORDENACOES = {
+    "nome": (lambda linha: linha["obra"].nome.lower(), False),
+    "delta": (lambda linha: linha["delta"] if linha["delta"] is not None else float("inf"), False),
+    "vencidas": (lambda linha: linha["pendencias_vencidas"], True),
+    "sem_inspecao": (
+        lambda linha: linha["dias_sem_inspecao"] if linha["dias_sem_inspecao"] is not None else float("inf"),
+        True,
+    ),
+}
+
+PORTFOLIO_CABECALHO = (
+    "Obra",
+    "Status",
+    "Progresso real",
+    "Progresso esperado",
+    "Delta",
+    "Pendências alta",
+    "Pendências média",
+    "Pendências baixa",
+    "Pendências vencidas",
+    "Inspeções 7 dias",
+    "Inspeções 30 dias",
+    "Última inspeção",
+    "Dias sem inspeção",
+)
+
+
+class PortfolioReportView(RoleRequiredMixin, ReplicaReadMixin, TemplateView):
+    template_name = "obras/portfolio.html"
+    allowed_roles = [UserProfile.Level.ADMIN, UserProfile.Level.NIVEL2]
+
+    def get_linhas(self):
+        obras = filter_obras_for_user(Obra.objects.filter(deletada=False), self.request.user)
+        linhas = kpis_portfolio(obras.order_by("nome"))
+        ordem = self.request.GET.get("ordem") or "delta"
+        chave, reverso = PORTFOLIO_ORDENACOES.get(ordem, PORTFOLIO_ORDENACOES["delta"])
+        linhas.sort(key=chave, reverse=reverso)
+        return linhas, ordem if ordem in PORTFOLIO_ORDENACOES else "delta"
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get("formato") == "csv":
+            linhas, _ordem = self.get_linhas()
+            response = StreamingHttpResponse(
+                stream_csv(
+                    PORTFOLIO_CABECALHO,
+                    (
+                        [
+                            linha["obra"].nome,
+                            linha["obra"].get_status_display(),
+                            linha["real"],
+                            "" if linha["esperado"] is None else linha["esperado"],
+                            "" if linha["delta"] is None else linha["delta"],
+                            linha["pendencias_abertas"]["alta"],
+                            linha["pendencias_abertas"]["media"],
+                            linha["pendencias_abertas"]["baixa"],
+                            linha["pendencias_vencidas"],
+                            linha["inspecoes_7d"],
+                            linha["inspecoes_30d"],
+                            linha["ultima_inspecao"] or "",
+                            "" if linha["dias_sem_inspecao"] is None else linha["dias_sem_inspecao"],
+                        ]
+                        for linha in linhas
+                    ),
+                ),
+                content_type="text/csv; charset=utf-8",
+            )
+            response["Content-Disposition"] = f'attachment; filename="portfolio-{timezone.now():%Y%m%d}.csv"'
+            return response
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        linhas, ordem = self.get_linhas()
+        context["linhas"] = linhas
+        context["ordem"] = ordem
+        context["totais"] = {
+            "obras": len(linhas),
+            "atrasadas": sum(1 for linha in linhas if linha["delta"] is not None and linha["delta"] < 0),
+            "pendencias_alta": sum(linha["pendencias_abertas"]["alta"] for linha in linhas),
+            "pendencias_vencidas": sum(linha["pendencias_vencidas"] for linha in linhas),
+            "sem_inspecao_30d": sum(1 for linha in linhas if not linha["inspecoes_30d"]),
+        }
+        return context
+
+
 class ObraCreateView(RoleRequiredMixin, CreateView):
     model = Obra
     form_class = ObraCreateForm
@@ -208,6 +319,9 @@ class ObraCreateView(RoleRequiredMixin, CreateView):
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs["last_obra"] = self.get_last_model_obra()
+        kwargs["obras_modelo"] = filter_obras_for_user(
+            Obra.objects.filter(deletada=False), self.request.user
+        ).order_by("nome")
         kwargs["allow_duplicate"] = self.user_can_duplicate()
         return kwargs
 
@@ -240,18 +354,28 @@ class ObraCreateView(RoleRequiredMixin, CreateView):
         if not duplicate_last and not formset.is_valid():
             return self.form_invalid(form)
 
-        source_obra = self.get_last_model_obra() if duplicate_last else None
+        source_obra = form.cleaned_data.get("obra_origem") if duplicate_last else None
+        deslocar_datas = bool(form.cleaned_data.get("deslocar_datas"))
 
         with transaction.atomic():
             self.object = form.save(commit=False)
             if duplicate_last and source_obra:
                 self.object.nome = generate_duplicate_name(source_obra.nome)
                 self.object.status = "ativa"
+                if (
+                    deslocar_datas
+                    and not self.object.data_fim_prevista
+                    and source_obra.data_inicio
+                    and source_obra.data_fim_prevista
+                ):
+                    self.object.data_fim_prevista = self.object.data_inicio + (
+                        source_obra.data_fim_prevista - source_obra.data_inicio
+                    )
             self.object.save()
             form.save_m2m()
 
             if duplicate_last and source_obra:
-                clone_obra_structure(source_obra, self.object)
+                copiados = clone_obra_structure(source_obra, self.object, deslocar_datas=deslocar_datas)
             else:
                 formset.instance = self.object
                 formset.save()
@@ -259,7 +383,8 @@ class ObraCreateView(RoleRequiredMixin, CreateView):
         if duplicate_last:
             messages.success(
                 self.request,
-                f"Obra criada a partir de '{source_obra.nome}' (categorias e tarefas copiadas).",
+                f"Obra criada a partir de '{source_obra.nome}' ({copiados['categorias']} categoria(s), "
+                f"{copiados['tarefas']} tarefa(s) e {copiados['pontos']} ponto(s) de inspecao copiados).",
             )
         else:
             messages.success(self.request, "Obra criada com sucesso.")
@@ -320,6 +445,53 @@ class CategoriaCreateView(RoleRequiredMixin, CreateView):
         return reverse_lazy("obras:detalhe_obra", kwargs={"pk": self.obra.pk})
 
 
+class ImportarCronogramaView(RoleRequiredMixin, FormView):
+    form_class = ImportarCronogramaForm
+    template_name = "obras/importar_cronograma.html"
+    allowed_roles = [UserProfile.Level.ADMIN, UserProfile.Level.NIVEL2]
+
+    def dispatch(self, request, *args, **kwargs):
+        self.obra = get_object_or_404(Obra, pk=self.kwargs["obra_id"], deletada=False)
+        denied = self.ensure_obra_access(self.obra)
+        if denied:
+            return denied
+        if self.obra.status == "finalizada":
+            return obra_read_only_redirect(request, self.obra)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get("modelo"):
+            response = StreamingHttpResponse(
+                stream_csv(
+                    COLUNAS_CRONOGRAMA,
+                    [["Fundação", "", "", "Escavação", "", "1", "2025-01-06", "2025-01-17", "0"]],
+                ),
+                content_type="text/csv; charset=utf-8",
+            )
+            response["Content-Disposition"] = 'attachment; filename="modelo-cronograma.csv"'
+            return response
+        return super().get(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        arquivo = form.cleaned_data["arquivo"]
+        try:
+            resultado = importar_cronograma(self.obra, arquivo.name, arquivo.read())
+        except ValidationError as exc:
+            return self.render_to_response(self.get_context_data(form=form, erros=exc.messages))
+        messages.success(
+            self.request,
+            f"Cronograma importado: {resultado.categorias_criadas} categoria(s) e "
+            f"{resultado.tarefas_criadas} tarefa(s) criada(s).",
+        )
+        return redirect("obras:detalhe_obra", pk=self.obra.pk)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["obra"] = self.obra
+        context["colunas"] = COLUNAS_CRONOGRAMA
+        return context
+
+
 class TarefaCreateView(RoleRequiredMixin, CreateView):
     model = Tarefa
     form_class = TarefaForm
@@ -652,114 +824,191 @@ class PendenciaCreateView(RoleRequiredMixin, CreateView):
 
 
 
+def _painel_estrutura(obra, user, params):
+    categorias = list(obra.categorias.prefetch_related("tarefas"))
+    tarefas_obra = [tarefa for categoria in categorias for tarefa in categoria.tarefas.all()]
+    progresso = velocidade_tarefas([tarefa.pk for tarefa in tarefas_obra])
+    return {
+        "categorias": categorias,
+        "tarefas_paradas": {
+            tarefa.pk for tarefa in tarefas_obra if tarefa_parada(tarefa, progresso.get(tarefa.pk))
+        },
+    }
+
+
+def _painel_pendencias(obra, user, params):
+    pend_status = params.get("pend_status") or "aberta"
+    if pend_status not in {"aberta", "andamento", "resolvida"}:
+        pend_status = "aberta"
+    pendencias = (
+        Pendencia.objects.filter(obra=obra, status=pend_status)
+        .select_related("tarefa", "categoria", "responsavel")
+        .prefetch_related("solucoes__usuario")
+        .order_by("-data_abertura")
+    )
+
+    counts = Pendencia.objects.filter(obra=obra).aggregate(
+        abertas=Count("id", filter=Q(status="aberta")),
+        andamento=Count("id", filter=Q(status="andamento")),
+        resolvidas=Count("id", filter=Q(status="resolvida")),
+    )
+
+    return {
+        "pendencias": list(pendencias),
+        "pendencias_status": pend_status,
+        "abertas_count": counts["abertas"],
+        "andamento_count": counts["andamento"],
+        "em_andamento_count": counts["andamento"],
+        "resolvidas_count": counts["resolvidas"],
+    }
+
+
+def _painel_progresso(obra, user, params):
+    stats = Tarefa.objects.filter(categoria__obra=obra).aggregate(
+        total_tarefas=Count("id"),
+        concluidas=Count("id", filter=Q(status="concluida")),
+        atrasadas=Count("id", filter=Q(status="bloqueada")),
+    )
+    progress = get_obras_progress_snapshot([obra]).get(obra.id, {})
+    return {
+        "percentual_concluido": round(progress.get("real", 0.0), 1),
+        "stats_resumo": {
+            "total": stats.get("total_tarefas", 0),
+            "concluidas": stats.get("concluidas", 0),
+            "atrasadas": stats.get("atrasadas", 0),
+        },
+    }
+
+
+def _painel_inspecoes(obra, user, params):
+    inspecoes_qs = obra.inspecoes.select_related("usuario", "categoria", "tarefa").order_by(
+        "-data_inspecao", "-id"
+    )
+    insp_paginator = Paginator(inspecoes_qs, 10)
+    inspecoes_page = insp_paginator.get_page(params.get("insp_page"))
+    inspecoes_page.object_list = list(inspecoes_page.object_list)
+    return {
+        "inspecoes_page": inspecoes_page,
+        "inspecoes_total": inspecoes_page.paginator.count,
+    }
+
+
+def _painel_anexos(obra, user, params):
+    return {"anexos": list(obra.anexos.select_related("categoria", "enviado_por"))}
+
+
+OBRA_DETAIL_PAINEIS = (
+    _painel_estrutura,
+    _painel_pendencias,
+    _painel_progresso,
+    _painel_inspecoes,
+    _painel_anexos,
+)
+
+
+def _obra_detail_permissoes(user):
+    user_level = get_user_level(user)
+    can_manage_pendencias = user_level in (
+        UserProfile.Level.ADMIN,
+        UserProfile.Level.NIVEL2,
+        UserProfile.Level.NIVEL1,
+    )
+    return {
+        "user_level": user_level,
+        "can_manage_obra": user_level == UserProfile.Level.ADMIN,
+        "can_manage_structure": user_level in (
+            UserProfile.Level.ADMIN,
+            UserProfile.Level.NIVEL2,
+        ),
+        "can_manage_pendencias": can_manage_pendencias,
+        "can_add_inspecao": can_manage_pendencias,
+        "can_add_anexo": can_manage_pendencias,
+        "can_update_task_progress": can_manage_pendencias,
+        "nivel1_lock_message": "Tarefa concluída. Solicite apoio de um usuário Nível 2 para ajustes.",
+    }
+
+
 class ObraDetailView(LoginRequiredMixin, DetailView):
     model = Obra
     template_name = "obras/obra_detail.html"
     context_object_name = "obra"
 
     def get_queryset(self):
-        qs = (
-            super()
-            .get_queryset()
-            .filter(deletada=False)
-            .prefetch_related("categorias__tarefas", "anexos")
-        )
+        qs = super().get_queryset().filter(deletada=False)
         return filter_obras_for_user(qs, self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        obra = self.object
+        for painel in OBRA_DETAIL_PAINEIS:
+            context.update(painel(self.object, self.request.user, self.request.GET))
+        context["pendencias_redirect"] = self.request.get_full_path()
+        context["anexo_form"] = AnexoObraForm()
+        context.update(_obra_detail_permissoes(self.request.user))
+        return context
 
-        # As categorias ja vem com as tarefas pre-carregadas devido ao get_queryset
-        categorias = obra.categorias.all()
 
-        pend_status = self.request.GET.get("pend_status") or "aberta"
-        base_pendencias_qs = (
-            Pendencia.objects.filter(obra=obra)
-            .select_related("tarefa", "categoria", "responsavel")
-            .prefetch_related("solucoes__usuario")
-            .order_by("-data_abertura")
-        )
+_paineis_executor = None
+_paineis_executor_lock = threading.Lock()
 
-        pendencias_abertas = base_pendencias_qs.filter(status="aberta")
-        pendencias_andamento = base_pendencias_qs.filter(status="andamento")
-        pendencias_resolvidas = base_pendencias_qs.filter(status="resolvida")
 
-        abertas_count = pendencias_abertas.count()
-        andamento_count = pendencias_andamento.count()
-        resolvidas_count = pendencias_resolvidas.count()
+def _get_paineis_executor() -> ThreadPoolExecutor:
+    global _paineis_executor
+    with _paineis_executor_lock:
+        if _paineis_executor is None:
+            _paineis_executor = ThreadPoolExecutor(
+                max_workers=settings.OBRA_DETALHE_PAINEIS_WORKERS,
+                thread_name_prefix="obra-painel",
+            )
+    return _paineis_executor
 
-        if pend_status == "andamento":
-            pendencias = pendencias_andamento
-        elif pend_status == "resolvida":
-            pendencias = pendencias_resolvidas
-        else:
-            pend_status = "aberta"
-            pendencias = pendencias_abertas
 
-        stats = Tarefa.objects.filter(categoria__obra=obra).aggregate(
-            total_tarefas=Count("id"),
-            concluidas=Count("id", filter=Q(status="concluida")),
-            atrasadas=Count("id", filter=Q(status="bloqueada")),
-        )
-        total_tarefas = stats.get("total_tarefas", 0)
-        concluidas = stats.get("concluidas", 0)
-        atrasadas = stats.get("atrasadas", 0)
+def _executar_painel(painel, request, obra, user, params):
+    # Cada thread do pool usa a propria conexao; close_old_connections respeita CONN_MAX_AGE.
+    close_old_connections()
+    try:
+        if settings.SLOW_QUERY_THRESHOLD_MS > 0:
+            with connection.execute_wrapper(SlowQueryRecorder(request)):
+                return painel(obra, user, params)
+        return painel(obra, user, params)
+    finally:
+        close_old_connections()
 
-        progress = get_obras_progress_snapshot([obra]).get(obra.id, {})
-        percentual_concluido = progress.get("real", 0.0)
 
-        inspecoes_qs = obra.inspecoes.select_related("usuario", "categoria", "tarefa").order_by(
-            "-data_inspecao", "-id"
-        )
-        insp_paginator = Paginator(inspecoes_qs, 10)
-        insp_page_number = self.request.GET.get("insp_page")
-        inspecoes_page = insp_paginator.get_page(insp_page_number)
-
-        context["categorias"] = categorias
-        context["percentual_concluido"] = round(percentual_concluido, 1)
-        context["stats_resumo"] = {
-            "total": total_tarefas,
-            "concluidas": concluidas,
-            "atrasadas": atrasadas,
-        }
-        context["pendencias"] = pendencias
-        context["pendencias_status"] = pend_status
-        context["pendencias_abertas"] = pendencias_abertas
-        context["pendencias_andamento"] = pendencias_andamento
-        context["pendencias_resolvidas"] = pendencias_resolvidas
-        context["abertas_count"] = abertas_count
-        context["andamento_count"] = andamento_count
-        context["em_andamento_count"] = andamento_count
-        context["resolvidas_count"] = resolvidas_count
-        context["inspecoes_page"] = inspecoes_page
-        context["inspecoes_total"] = inspecoes_page.paginator.count
-        context["pendencias_redirect"] = self.request.get_full_path()
-        context["anexo_form"] = AnexoObraForm()
-        context["anexos"] = obra.anexos.select_related("categoria", "enviado_por")
-        user_level = get_user_level(self.request.user)
-        context["user_level"] = user_level
-        context["can_manage_obra"] = user_level == UserProfile.Level.ADMIN
-        context["can_manage_structure"] = user_level in (
-            UserProfile.Level.ADMIN,
-            UserProfile.Level.NIVEL2,
-        )
-        context["can_manage_pendencias"] = user_level in (
-            UserProfile.Level.ADMIN,
-            UserProfile.Level.NIVEL2,
-            UserProfile.Level.NIVEL1,
-        )
-        context["can_add_inspecao"] = context["can_manage_pendencias"]
-        context["can_add_anexo"] = context["can_manage_pendencias"]
-        context["can_update_task_progress"] = context["can_manage_pendencias"]
-        context["nivel1_lock_message"] = (
-            "Tarefa concluída. Solicite apoio de um usuário Nível 2 para ajustes."
-        )
-        return context
+def _obra_detail_async_object(pk, user):
+    qs = filter_obras_for_user(Obra.objects.filter(deletada=False), user)
+    return get_object_or_404(qs, pk=pk)
+
+
+@login_required
+async def obra_detail_async(request, pk):
+    """Detalhe da obra com os paineis consultados em paralelo (threads com conexoes proprias).
+
+    A latencia passa a ser a do painel mais lento, nao a soma de todos.
+    """
+    user = await request.auser()
+    request.user = user
+    obra = await sync_to_async(_obra_detail_async_object)(pk, user)
+
+    loop = asyncio.get_running_loop()
+    executor = _get_paineis_executor()
+    params = request.GET.copy()
+    resultados = await asyncio.gather(
+        *(
+            loop.run_in_executor(executor, _executar_painel, painel, request, obra, user, params)
+            for painel in OBRA_DETAIL_PAINEIS
+        ),
+        sync_to_async(_obra_detail_permissoes)(user),
+    )
 
+    context = {"obra": obra, "object": obra}
+    for resultado in resultados:
+        context.update(resultado)
+    context["pendencias_redirect"] = request.get_full_path()
+    context["anexo_form"] = AnexoObraForm()
+    return await sync_to_async(render)(request, "obras/obra_detail.html", context)
 
 
-class ObraReportView(LoginRequiredMixin, DetailView):
+class ObraReportView(LoginRequiredMixin, ReplicaReadMixin, DetailView):
     model = Obra
     template_name = "obras/relatorio_obra.html"
     context_object_name = "obra"
@@ -780,64 +1029,41 @@ class ObraReportView(LoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        obra = self.object
-        tarefas_stats = Tarefa.objects.filter(categoria__obra=obra).aggregate(
-            total=Count("id"),
-            concluidas=Count("id", filter=Q(status="concluida")),
-        )
-        total_tarefas = tarefas_stats.get("total") or 0
-        concluidas = tarefas_stats.get("concluidas") or 0
-        progresso_real = get_obras_progress_snapshot([obra]).get(obra.id, {}).get("real", 0.0)
-        progresso_esperado = self._calc_progresso_esperado(obra)
-
-        pendencias = (
-            obra.pendencias.select_related("tarefa", "categoria", "responsavel")
-            .order_by("status", "-data_abertura")
-        )
-        pendencias_grupos = {
-            "aberta": [],
-            "andamento": [],
-            "resolvida": [],
-        }
-        for pendencia in pendencias:
-            pendencias_grupos.setdefault(pendencia.status, []).append(pendencia)
-        pendencias_counts = {
-            status: len(items) for status, items in pendencias_grupos.items()
-        }
-
-        inspecoes_qs = obra.inspecoes.select_related("usuario", "categoria", "tarefa").order_by("-data_inspecao", "-id")
-        inspecoes_total = inspecoes_qs.count()
-        inspecoes_recentes = list(inspecoes_qs[:5])
-        ultima_inspecao = inspecoes_recentes[0] if inspecoes_recentes else None
-
-        context.update(
-            {
-                "categorias": obra.categorias.all(),
-                "total_tarefas": total_tarefas,
-                "tarefas_concluidas": concluidas,
-                "progresso_real": progresso_real,
-                "progresso_esperado": progresso_esperado,
-                "pendencias_por_status": pendencias_grupos,
-                "pendencias_counts": pendencias_counts,
-                "pendencias_total": sum(pendencias_counts.values()),
-                "inspecoes_total": inspecoes_total,
-                "ultima_inspecao": ultima_inspecao,
-                "inspecoes_recentes": inspecoes_recentes,
-                "generated_at": timezone.now(),
-            }
-        )
+        context.update(dados_relatorio(self.object))
         return context
 
-    def _calc_progresso_esperado(self, obra):
-        if obra.data_inicio and obra.data_fim_prevista:
-            total_dias = (obra.data_fim_prevista - obra.data_inicio).days
-            if total_dias <= 0:
-                return 100.0 if timezone.now().date() >= obra.data_fim_prevista else 0.0
-            dias_passados = (timezone.now().date() - obra.data_inicio).days
-            percentual = (dias_passados / total_dias) * 100
-            percentual = max(0, min(percentual, 100))
-            return round(percentual, 1)
-        return None
+
+@login_required
+@require_GET
+def relatorio_obra_pdf(request, pk):
+    obra = get_object_or_404(filter_obras_for_user(Obra.objects.filter(deletada=False), request.user), pk=pk)
+    versao = versao_relatorio(obra)
+    etag = f'"{versao}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    arquivo = abrir_relatorio_pdf(obra, versao)
+    if arquivo is None:
+        if settings.RELATORIO_PDF_ASYNC:
+            from fila.services import enqueue
+
+            enqueue(gerar_relatorio_pdf, [obra.pk], chave=f"relatorio_pdf:{obra.pk}:{versao}")
+            response = render(request, "obras/relatorio_pdf_aguarde.html", {"obra": obra}, status=202)
+            patch_cache_control(response, no_store=True)
+            return response
+        gerar_relatorio_pdf(obra.pk)
+        arquivo = abrir_relatorio_pdf(obra, versao)
+        if arquivo is None:
+            raise Http404("Relatório indisponível.")
+
+    # Servido pela view (sem redirecionar para a URL pública do storage): só quem acessa a obra baixa.
+    response = FileResponse(arquivo, content_type="application/pdf", filename=f"relatorio-obra-{obra.pk}.pdf")
+    response["ETag"] = etag
+    # O mesmo endereço muda de conteúdo quando a versão muda: revalida sempre, via ETag.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 class AnexoObraCreateView(RoleRequiredMixin, CreateView):
@@ -906,25 +1132,30 @@ class ExcluirObraView(RoleRequiredMixin, View):
         return redirect("obras:listar_obras")
 
 
-class PendenciaListView(LoginRequiredMixin, ListView):
+def filtrar_pendencias(qs, user, params):
+    """Escopo do usuário + filtros ``status`` e ``q`` da lista de pendências."""
+    qs = filter_queryset_by_user_obras(qs, user)
+    status = params.get("status")
+    q = params.get("q")
+    if status:
+        qs = qs.filter(status=status)
+    if q:
+        qs = qs.filter(
+            Q(descricao__icontains=q) |
+            Q(obra__nome__icontains=q) |
+            Q(tarefa__nome__icontains=q)
+        )
+    return qs
+
+
+class PendenciaListView(LoginRequiredMixin, ReplicaReadMixin, ListView):
     model = Pendencia
     template_name = "obras/pendencia_list.html"
     context_object_name = "pendencias"
 
     def get_queryset(self):
         qs = Pendencia.objects.select_related("obra", "tarefa", "categoria", "responsavel").order_by("-data_abertura")
-        qs = filter_queryset_by_user_obras(qs, self.request.user)
-        status = self.request.GET.get("status")
-        q = self.request.GET.get("q")
-        if status:
-            qs = qs.filter(status=status)
-        if q:
-            qs = qs.filter(
-                Q(descricao__icontains=q) |
-                Q(obra__nome__icontains=q) |
-                Q(tarefa__nome__icontains=q)
-            )
-        return qs
+        return filtrar_pendencias(qs, self.request.user, self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -945,6 +1176,55 @@ class PendenciaListView(LoginRequiredMixin, ListView):
         return context
 
 
+@login_required
+@require_GET
+@usar_replica
+def exportar_pendencias(request):
+    formato = (request.GET.get("formato") or "csv").lower()
+    if formato not in ("csv", "xlsx"):
+        raise Http404
+    qs = filtrar_pendencias(Pendencia.objects.order_by("-data_abertura", "-id"), request.user, request.GET)
+    # O corpo é consumido depois que a view retorna: fixa agora o banco escolhido pelo roteador.
+    linhas = linhas_pendencias(qs.using(qs.db))
+    nome = f"pendencias-{timezone.now():%Y%m%d}.{formato}"
+
+    if formato == "xlsx":
+        response = StreamingHttpResponse(
+            stream_xlsx(PENDENCIAS_CABECALHO, linhas, nome_planilha="Pendências"),
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+    else:
+        response = StreamingHttpResponse(
+            stream_csv(PENDENCIAS_CABECALHO, linhas),
+            content_type="text/csv; charset=utf-8",
+        )
+    response["Content-Disposition"] = f'attachment; filename="{nome}"'
+    response["X-Accel-Buffering"] = "no"
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@login_required
+@require_GET
+@level_required([UserProfile.Level.ADMIN, UserProfile.Level.NIVEL2])
+@usar_replica
+def exportar_obra_jsonl(request, pk):
+    obras_qs = filter_obras_for_user(Obra.objects.filter(deletada=False), request.user)
+    obra = get_object_or_404(obras_qs, pk=pk)
+    conteudo = stream_jsonl(registros_obra(obra.pk, using=obras_qs.db))
+    nome = f"obra-{obra.pk}-{timezone.now():%Y%m%d}.jsonl"
+
+    if request.GET.get("gzip") in ("1", "true"):
+        response = StreamingHttpResponse(stream_gzip(conteudo), content_type="application/gzip")
+        nome += ".gz"
+    else:
+        response = StreamingHttpResponse(conteudo, content_type="application/x-ndjson")
+    response["Content-Disposition"] = f'attachment; filename="{nome}"'
+    response["X-Accel-Buffering"] = "no"
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
 class PendenciaDetailView(LoginRequiredMixin, DetailView):
     model = Pendencia
     template_name = "obras/pendencia_detail.html"
@@ -1095,3 +1375,39 @@ class PendenciaResolveView(RoleRequiredMixin, View):
         )
         messages.success(request, "Pendencia marcada como resolvida.")
         return redirect(redirect_url)
+
+
+@login_required
+@require_GET
+def miniatura_imagem(request, origem, pk, largura):
+    if origem not in THUMBNAIL_SOURCES or largura not in settings.THUMBNAIL_WIDTHS:
+        raise Http404("Miniatura indisponivel.")
+
+    model_label, field_name, obra_lookup = THUMBNAIL_SOURCES[origem]
+    model = apps.get_model(model_label)
+    qs = model.objects.only("pk", field_name)
+    if obra_lookup is None:
+        qs = filter_obras_for_user(qs, request.user)
+    else:
+        qs = filter_queryset_by_user_obras(qs, request.user, obra_lookup=obra_lookup)
+    instance = get_object_or_404(qs, pk=pk)
+
+    fieldfile = getattr(instance, field_name)
+    if not fieldfile:
+        raise Http404("Imagem inexistente.")
+    for tentativa in range(2):
+        try:
+            path = get_or_create_thumbnail(origem, instance.pk, largura, fieldfile)
+            arquivo = open(path, "rb")
+            break
+        except FileNotFoundError:
+            # O descarte LRU de outro processo pode apagar o arquivo entre a geracao e a leitura.
+            if tentativa:
+                raise Http404("Nao foi possivel gerar a miniatura.")
+        except (OSError, ValueError, Image.DecompressionBombError):
+            raise Http404("Nao foi possivel gerar a miniatura.")
+
+    response = FileResponse(arquivo, content_type="image/webp")
+    # A URL carrega a versao do arquivo (?v=...), entao pode ficar em cache por um ano.
+    patch_cache_control(response, private=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    return response
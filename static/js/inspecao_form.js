@@ -15,10 +15,139 @@ document.addEventListener('DOMContentLoaded', function () {
   const spinnerEl = document.getElementById('location-spinner');
   const captureBtnText = document.getElementById('location-btn-text');
 
+  const fotosInput = document.getElementById('id_fotos');
+  const uploadStatusEl = document.getElementById('fotos-upload-status');
+  const uploadTokensEl = document.getElementById('fotos-upload-tokens');
+
   if (!form || !latInput || !lngInput) return;
 
   let requestInFlight = false;
   let allowSubmitWithoutGeo = false;
+  let uploadsPromise = null;
+
+  const sync = window.AgirInspecoes;
+
+  const setUploadStatus = (message) => {
+    if (uploadStatusEl) uploadStatusEl.textContent = message || '';
+  };
+
+  const uploadUrls = {
+    startUrl: form.dataset.uploadStartUrl,
+    partUrl: form.dataset.uploadPartUrl,
+  };
+
+  const uploadSelectedPhotos = async () => {
+    if (!fotosInput || !fotosInput.files || !fotosInput.files.length) return false;
+    if (!sync || !form.dataset.uploadStartUrl || !window.fetch) return false;
+    if (navigator.onLine === false) return false;
+
+    const files = Array.from(fotosInput.files);
+    const totalBytes = files.reduce((sum, file) => sum + file.size, 0) || 1;
+    const sent = files.map(() => 0);
+    const report = () => {
+      const done = sent.reduce((sum, value) => sum + value, 0);
+      setUploadStatus(`Enviando fotos… ${Math.round((done / totalBytes) * 100)}%`);
+    };
+
+    if (uploadTokensEl) uploadTokensEl.innerHTML = '';
+    const tokens = [];
+    for (let index = 0; index < files.length; index += 1) {
+      tokens.push(
+        await sync.uploadFileChunked(files[index], uploadUrls, (offset) => {
+          sent[index] = offset;
+          report();
+        })
+      );
+    }
+
+    tokens.forEach((token) => {
+      const hidden = document.createElement('input');
+      hidden.type = 'hidden';
+      hidden.name = 'foto_tokens';
+      hidden.value = token;
+      uploadTokensEl.appendChild(hidden);
+    });
+    setUploadStatus(`${tokens.length} foto(s) enviada(s).`);
+    return true;
+  };
+
+  const startPhotoUploads = () => {
+    uploadsPromise = uploadSelectedPhotos().catch((error) => {
+      if (uploadTokensEl) uploadTokensEl.innerHTML = '';
+      setUploadStatus(
+        `Envio em partes indisponível (${error.message}). As fotos seguirão junto com o formulário.`
+      );
+      return false;
+    });
+    return uploadsPromise;
+  };
+
+  const taskInputs = () => Array.from(form.querySelectorAll('input[data-tarefa-id]'));
+
+  const changedTasks = () =>
+    taskInputs()
+      .filter((input) => !input.disabled && input.value !== '' && Number(input.value) !== Number(input.dataset.percentualAnterior))
+      .map((input) => ({
+        id: Number(input.dataset.tarefaId),
+        antes: Number(input.dataset.percentualAnterior),
+        depois: Number(input.value),
+      }));
+
+  // Envia só as tarefas alteradas (com o percentual anterior), não um campo por tarefa.
+  const packTaskChanges = () => {
+    const payloadInput = document.getElementById('id_tarefas_alteradas');
+    if (!payloadInput || !window.JSON) return;
+    payloadInput.value = JSON.stringify(changedTasks());
+    payloadInput.name = 'tarefas_alteradas';
+    taskInputs().forEach((input) => {
+      input.removeAttribute('name');
+    });
+  };
+
+  // Sem rede: guarda a inspeção na fila local; ela é enviada quando a conexão voltar.
+  const enqueueOffline = async () => {
+    const tarefas = {};
+    changedTasks().forEach((item) => {
+      tarefas[item.id] = item.depois;
+    });
+    const observacoes = form.querySelector('[name="observacoes_gerais"]');
+    await sync.enqueue({
+      obra_id: Number(form.dataset.obraId),
+      obra_nome: form.dataset.obraNome || '',
+      observacoes_gerais: observacoes ? observacoes.value : '',
+      latitude: latInput.value || null,
+      longitude: lngInput.value || null,
+      tarefas,
+      fotos: fotosInput && fotosInput.files ? Array.from(fotosInput.files) : [],
+      uploadStartUrl: uploadUrls.startUrl,
+      uploadPartUrl: uploadUrls.partUrl,
+    });
+    form.reset();
+    if (uploadTokensEl) uploadTokensEl.innerHTML = '';
+    uploadsPromise = null;
+    showAlert('Sem conexão: a inspeção foi salva no aparelho e será enviada quando a rede voltar.', 'success');
+  };
+
+  const submitForm = async () => {
+    if (navigator.onLine === false && sync && window.indexedDB && form.dataset.obraId) {
+      try {
+        await enqueueOffline();
+        return;
+      } catch (error) {
+        // IndexedDB indisponível (ex.: navegação privada): segue com o envio normal.
+      }
+    }
+    if (uploadsPromise === null) startPhotoUploads();
+    const uploaded = await uploadsPromise;
+    // As fotos já estão no servidor: não reenviar os bytes no POST do formulário.
+    if (uploaded && fotosInput) fotosInput.disabled = true;
+    packTaskChanges();
+    form.submit();
+  };
+
+  if (fotosInput) {
+    fotosInput.addEventListener('change', startPhotoUploads);
+  }
 
   const clearErrorMeta = () => {
     if (errCodeInput) errCodeInput.value = '';
@@ -156,7 +285,7 @@ document.addEventListener('DOMContentLoaded', function () {
       hideAlert();
       if (submitAfter) {
         allowSubmitWithoutGeo = true;
-        form.submit();
+        await submitForm();
       }
     } catch (error) {
       const reason = buildErrorReason(error);
@@ -175,7 +304,7 @@ document.addEventListener('DOMContentLoaded', function () {
 
       if (submitAfter) {
         allowSubmitWithoutGeo = true;
-        form.submit();
+        await submitForm();
       }
     } finally {
       requestInFlight = false;
@@ -184,9 +313,10 @@ document.addEventListener('DOMContentLoaded', function () {
   };
 
   form.addEventListener('submit', function (event) {
-    if (allowSubmitWithoutGeo) return;
-    if (hasCoords()) {
+    if (allowSubmitWithoutGeo || hasCoords()) {
       hideAlert();
+      event.preventDefault();
+      submitForm();
       return;
     }
 
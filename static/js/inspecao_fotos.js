@@ -0,0 +1,73 @@
+document.addEventListener('DOMContentLoaded', function () {
+  const grid = document.getElementById('inspecao-fotos');
+  if (!grid) return;
+
+  const modalEl = document.getElementById('fotoLightbox');
+  const modalImg = document.getElementById('fotoLightboxImagem');
+  const modalLegenda = document.getElementById('fotoLightboxLegenda');
+  const modal = modalEl && window.bootstrap ? new bootstrap.Modal(modalEl) : null;
+
+  // Resolução total apenas no lightbox; a grade usa as miniaturas.
+  grid.addEventListener('click', function (event) {
+    const link = event.target.closest('.js-foto-lightbox');
+    if (!link || !modal) return;
+    event.preventDefault();
+    modalImg.src = link.href;
+    modalLegenda.textContent = link.dataset.legenda || '';
+    modal.show();
+  });
+  if (modalEl) {
+    modalEl.addEventListener('hidden.bs.modal', function () {
+      modalImg.removeAttribute('src');
+    });
+  }
+
+  let loading = false;
+  const loadMore = function (wrapper) {
+    const link = wrapper.querySelector('[data-fragment-url]');
+    if (!link || loading || !window.fetch) return;
+    loading = true;
+    link.classList.add('disabled');
+    fetch(link.dataset.fragmentUrl, { credentials: 'same-origin' })
+      .then(function (response) {
+        if (!response.ok) throw new Error('Falha ao carregar fotos');
+        return response.text();
+      })
+      .then(function (html) {
+        wrapper.insertAdjacentHTML('afterend', html);
+        wrapper.remove();
+        observeMore();
+      })
+      .catch(function () {
+        link.classList.remove('disabled');
+      })
+      .finally(function () {
+        loading = false;
+      });
+  };
+
+  const observer = window.IntersectionObserver
+    ? new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+          if (entry.isIntersecting) {
+            observer.unobserve(entry.target);
+            loadMore(entry.target);
+          }
+        });
+      }, { rootMargin: '400px' })
+    : null;
+
+  const observeMore = function () {
+    const wrapper = grid.querySelector('.js-fotos-mais');
+    if (wrapper && observer) observer.observe(wrapper);
+  };
+
+  grid.addEventListener('click', function (event) {
+    const link = event.target.closest('[data-fragment-url]');
+    if (!link) return;
+    event.preventDefault();
+    loadMore(link.closest('.js-fotos-mais'));
+  });
+
+  observeMore();
+});
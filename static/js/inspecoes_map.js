@@ -2,28 +2,11 @@ document.addEventListener('DOMContentLoaded', function () {
   const mapElement = document.getElementById('map');
   if (!mapElement || typeof L === 'undefined') return;
 
-  const dataElement = document.getElementById('markers-data');
-  const rawMarkers = dataElement ? JSON.parse(dataElement.textContent) : [];
-  const markersData = Array.isArray(rawMarkers)
-    ? rawMarkers.filter(function (m) {
-        return m && Number.isFinite(m.lat) && Number.isFinite(m.lng);
-      })
-    : [];
-
-  let initialLat = -15.77972;
-  let initialLng = -47.92972;
-  let initialZoom = 5;
-
-  if (markersData.length > 0) {
-    initialLat = markersData[0].lat;
-    initialLng = markersData[0].lng;
-    initialZoom = 16;
-  }
+  const geojsonUrl = mapElement.dataset.geojsonUrl;
+  const extentElement = document.getElementById('mapa-extent');
+  const extent = extentElement ? JSON.parse(extentElement.textContent) : null;
 
-  const map = L.map('map', { scrollWheelZoom: false }).setView(
-    [initialLat, initialLng],
-    initialZoom
-  );
+  const map = L.map('map', { scrollWheelZoom: false }).setView([-15.77972, -47.92972], 5);
 
   L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
     maxZoom: 19,
@@ -36,16 +19,85 @@ document.addEventListener('DOMContentLoaded', function () {
     map.scrollWheelZoom.enable();
   });
 
-  const bounds = [];
-  markersData.forEach(function (item) {
-    const marker = L.marker([item.lat, item.lng]).addTo(map);
-    marker.bindPopup(item.popup);
-    bounds.push([item.lat, item.lng]);
+  const layer = L.layerGroup().addTo(map);
+
+  const buildPopup = function (props) {
+    const wrapper = document.createElement('div');
+    wrapper.textContent = props.data + ' - ' + props.usuario + ' ';
+    const link = document.createElement('a');
+    link.href = props.url;
+    link.textContent = 'Ver';
+    wrapper.appendChild(link);
+    return wrapper;
+  };
+
+  const clusterIcon = function (quantidade) {
+    const size = quantidade < 10 ? 32 : quantidade < 100 ? 40 : 48;
+    return L.divIcon({
+      html: '<span>' + quantidade + '</span>',
+      className: 'badge rounded-pill bg-primary d-flex align-items-center justify-content-center',
+      iconSize: [size, size],
+    });
+  };
+
+  const render = function (data) {
+    layer.clearLayers();
+    (data.features || []).forEach(function (feature) {
+      const coords = feature.geometry.coordinates;
+      const props = feature.properties || {};
+      const latLng = [coords[1], coords[0]];
+      if (props.cluster) {
+        const marker = L.marker(latLng, { icon: clusterIcon(props.quantidade) });
+        marker.on('click', function () {
+          const b = props.bbox;
+          map.fitBounds([[b[1], b[0]], [b[3], b[2]]]);
+        });
+        layer.addLayer(marker);
+      } else {
+        layer.addLayer(L.marker(latLng).bindPopup(buildPopup(props)));
+      }
+    });
+  };
+
+  let controller = null;
+  let timer = null;
+
+  const load = function () {
+    if (!geojsonUrl || !window.fetch) return;
+    if (controller) controller.abort();
+    controller = window.AbortController ? new AbortController() : null;
+
+    const bounds = map.getBounds();
+    const params = new URLSearchParams({
+      bbox: [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()]
+        .map(function (value) { return value.toFixed(6); })
+        .join(','),
+      zoom: String(map.getZoom()),
+    });
+    fetch(geojsonUrl + '?' + params.toString(), {
+      credentials: 'same-origin',
+      signal: controller ? controller.signal : undefined,
+    })
+      .then(function (response) {
+        if (!response.ok) throw new Error('Falha ao carregar o mapa');
+        return response.json();
+      })
+      .then(render)
+      .catch(function () {});
+  };
+
+  map.on('moveend', function () {
+    clearTimeout(timer);
+    timer = setTimeout(load, 250);
   });
 
-  if (bounds.length > 1) {
-    map.fitBounds(bounds, {padding: [50, 50]});
-  } else if (bounds.length === 1) {
-    map.setView(bounds[0], 16);
+  if (extent) {
+    const sameCorner = extent[0][0] === extent[1][0] && extent[0][1] === extent[1][1];
+    if (sameCorner) {
+      map.setView(extent[0], 16);
+    } else {
+      map.fitBounds(extent, { padding: [50, 50], maxZoom: 16 });
+    }
   }
+  load();
 });
@@ -0,0 +1,399 @@
+// Fila offline de inspeções: grava no IndexedDB enquanto não há rede e
+// sincroniza em lote (POST /inspecoes/sync/) quando a conexão volta.
+(function () {
+  const DB_NAME = 'agir-inspecoes';
+  const STORE = 'fila';
+  const UPLOAD_MAX_RETRIES = 8;
+  // Abaixo de INSPECAO_SYNC_MAX_ENTRADAS (200): um lote grande nunca é recusado inteiro.
+  const SYNC_LOTE = 50;
+  // Reenvio automático de falhas transitórias: 30 s, 1 min, 2 min... até 30 min.
+  const backoffMs = (tentativas) => Math.min(30000 * 2 ** (tentativas - 1), 30 * 60000);
+  const PLACEHOLDER_TOKEN = '00000000-0000-0000-0000-000000000000';
+
+  const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+  const getCookie = (name) => {
+    const match = document.cookie.match(new RegExp(`(?:^|; )${name}=([^;]*)`));
+    return match ? decodeURIComponent(match[1]) : '';
+  };
+
+  const getCsrfToken = () => {
+    const input = document.querySelector('input[name="csrfmiddlewaretoken"]');
+    return input ? input.value : getCookie('csrftoken');
+  };
+
+  const newKey = () => {
+    if (window.crypto && window.crypto.randomUUID) return window.crypto.randomUUID();
+    return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, (char) => {
+      const rand = (Math.random() * 16) | 0;
+      return (char === 'x' ? rand : (rand & 0x3) | 0x8).toString(16);
+    });
+  };
+
+  const waitOnline = () => {
+    if (navigator.onLine !== false) return Promise.resolve();
+    return new Promise((resolve) => window.addEventListener('online', resolve, { once: true }));
+  };
+
+  class UploadFatalError extends Error {}
+
+  const requestJson = async (url, options) => {
+    const response = await fetch(url, Object.assign({ credentials: 'same-origin' }, options));
+    let data = {};
+    try {
+      data = await response.json();
+    } catch (e) {
+      data = {};
+    }
+    return { response, data };
+  };
+
+  // ---- Upload retomável (partes de tamanho fixo) ----
+  const uploadFileChunked = async (file, urls, onProgress) => {
+    const partUrl = (token) => urls.partUrl.replace(PLACEHOLDER_TOKEN, token);
+    const start = await requestJson(urls.startUrl, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': getCsrfToken() },
+      body: JSON.stringify({ nome: file.name, tamanho: file.size }),
+    });
+    if (!start.response.ok) {
+      throw new UploadFatalError(start.data.message || 'Não foi possível iniciar o envio.');
+    }
+
+    const token = start.data.token;
+    const chunkSize = start.data.chunk_size;
+    let offset = start.data.offset || 0;
+    let attempts = 0;
+
+    while (offset < file.size) {
+      try {
+        await waitOnline();
+        const chunk = file.slice(offset, offset + chunkSize);
+        const { response, data } = await requestJson(`${partUrl(token)}?offset=${offset}`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/octet-stream', 'X-CSRFToken': getCsrfToken() },
+          body: chunk,
+        });
+        if (response.status === 409) {
+          offset = data.offset;
+          continue;
+        }
+        if (response.status >= 400 && response.status < 500) {
+          throw new UploadFatalError(data.message || 'Envio recusado pelo servidor.');
+        }
+        if (!response.ok) throw new Error(data.message || 'Erro no servidor.');
+        offset = data.offset;
+        attempts = 0;
+        if (onProgress) onProgress(offset);
+      } catch (error) {
+        if (error instanceof UploadFatalError) throw error;
+        attempts += 1;
+        if (attempts > UPLOAD_MAX_RETRIES) throw error;
+        await sleep(Math.min(1000 * 2 ** (attempts - 1), 15000));
+        try {
+          // Retoma do offset confirmado pelo servidor.
+          const status = await requestJson(partUrl(token), { method: 'GET' });
+          if (status.response.ok) offset = status.data.offset;
+        } catch (e) {
+          // Continua com o offset local; o servidor responde 409 se divergir.
+        }
+      }
+    }
+    return token;
+  };
+
+  // ---- IndexedDB ----
+  let dbPromise = null;
+  const openDb = () => {
+    if (dbPromise) return dbPromise;
+    dbPromise = new Promise((resolve, reject) => {
+      const request = indexedDB.open(DB_NAME, 1);
+      request.onupgradeneeded = () => {
+        request.result.createObjectStore(STORE, { keyPath: 'chave' });
+      };
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => reject(request.error);
+    });
+    return dbPromise;
+  };
+
+  const withStore = async (mode, callback) => {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+      const tx = db.transaction(STORE, mode);
+      const result = callback(tx.objectStore(STORE));
+      tx.oncomplete = () => resolve(result && 'result' in result ? result.result : undefined);
+      tx.onerror = () => reject(tx.error);
+    });
+  };
+
+  const listEntries = () => withStore('readonly', (store) => store.getAll());
+  const getEntry = (chave) => withStore('readonly', (store) => store.get(chave));
+  const putEntry = (entry) => withStore('readwrite', (store) => store.put(entry));
+  const deleteEntry = (chave) => withStore('readwrite', (store) => store.delete(chave));
+
+  const dispatch = (name, detail) => {
+    document.dispatchEvent(new CustomEvent(`agir:inspecoes:${name}`, { detail }));
+  };
+
+  // Avisa a interface (lista da fila na barra de navegação) a cada mudança.
+  const notifyQueue = async () => {
+    try {
+      dispatch('fila', { entradas: await listEntries() });
+    } catch (e) {
+      // IndexedDB indisponível: não há fila para mostrar.
+    }
+  };
+
+  // entry: { obra_id, obra_nome, observacoes_gerais, latitude, longitude, tarefas: {id: pct},
+  //          fotos: [File], uploadStartUrl, uploadPartUrl }
+  // Estado na fila: erro (definitivo, espera ação do usuário) ou tentativas/proxima_tentativa/
+  // ultimo_erro (falha transitória, reenviada sozinha com backoff).
+  const enqueue = async (entry) => {
+    const record = Object.assign(
+      {
+        chave: newKey(),
+        capturada_em: new Date().toISOString(),
+        foto_tokens: [],
+        erro: null,
+        tentativas: 0,
+        proxima_tentativa: 0,
+        ultimo_erro: null,
+      },
+      entry
+    );
+    record.fotos = Array.from(entry.fotos || []);
+    await putEntry(record);
+    dispatch('enfileirada', { chave: record.chave });
+    notifyQueue();
+    return record.chave;
+  };
+
+  const uploadPendingPhotos = async (record) => {
+    while (record.fotos.length) {
+      const token = await uploadFileChunked(record.fotos[0], {
+        startUrl: record.uploadStartUrl,
+        partUrl: record.uploadPartUrl,
+      });
+      // Persiste o progresso foto a foto: uma nova tentativa não reenvia o que já subiu.
+      record.foto_tokens.push(token);
+      record.fotos.shift();
+      await putEntry(record);
+    }
+  };
+
+  const postpone = async (record, message) => {
+    record.tentativas = (record.tentativas || 0) + 1;
+    record.proxima_tentativa = Date.now() + backoffMs(record.tentativas);
+    record.ultimo_erro = message || 'Falha de conexão.';
+    await putEntry(record);
+  };
+
+  const markFailed = async (record, message) => {
+    record.erro = message || 'Envio recusado pelo servidor.';
+    await putEntry(record);
+  };
+
+  let retryTimer = null;
+  const scheduleRetry = async () => {
+    clearTimeout(retryTimer);
+    const proximas = (await listEntries())
+      .filter((record) => !record.erro && record.proxima_tentativa)
+      .map((record) => record.proxima_tentativa);
+    if (!proximas.length) return;
+    const espera = Math.max(Math.min(...proximas) - Date.now(), 1000);
+    retryTimer = setTimeout(flush, espera);
+  };
+
+  const sendBatch = async (syncUrl, lote) => {
+    let reply;
+    try {
+      reply = await requestJson(syncUrl, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': getCsrfToken() },
+        body: JSON.stringify({
+          inspecoes: lote.map((record) => ({
+            chave: record.chave,
+            obra_id: record.obra_id,
+            observacoes_gerais: record.observacoes_gerais,
+            latitude: record.latitude,
+            longitude: record.longitude,
+            tarefas: record.tarefas,
+            foto_tokens: record.foto_tokens,
+            capturada_em: record.capturada_em,
+          })),
+        }),
+      });
+    } catch (error) {
+      for (const record of lote) await postpone(record, 'Falha de conexão.');
+      return [];
+    }
+    const { response, data } = reply;
+    if (!response.ok) {
+      // 5xx é transitório; 4xx (sessão sem permissão, lote inválido) precisa de ação.
+      for (const record of lote) {
+        if (response.status >= 500) await postpone(record, data.message || 'Erro no servidor.');
+        else await markFailed(record, data.message);
+      }
+      return [];
+    }
+
+    const resultados = data.resultados || [];
+    for (const resultado of resultados) {
+      const record = lote.find((item) => item.chave === resultado.chave);
+      if (!record) continue;
+      if (resultado.status === 'erro') {
+        if (resultado.retentavel) await postpone(record, resultado.message);
+        else await markFailed(record, resultado.message);
+        continue;
+      }
+      // Inspeção gravada, mas fotos com falha transitória: o reenvio da mesma chave
+      // volta como 'duplicada' e anexa os tokens que ainda estão guardados no servidor.
+      const tokensPendentes = (resultado.falhas_fotos || [])
+        .filter((falha) => falha.retentavel && falha.token)
+        .map((falha) => falha.token);
+      if (tokensPendentes.length) {
+        record.foto_tokens = tokensPendentes;
+        await postpone(record, `${tokensPendentes.length} foto(s) ainda não anexada(s).`);
+        continue;
+      }
+      await deleteEntry(record.chave);
+    }
+    return resultados.filter((resultado) => resultado.status !== 'erro');
+  };
+
+  let flushing = null;
+  const flush = () => {
+    if (flushing) return flushing;
+    const syncUrl = document.body.dataset.inspecoesSyncUrl;
+    if (!syncUrl || !window.indexedDB || navigator.onLine === false) return Promise.resolve(0);
+
+    flushing = (async () => {
+      const agora = Date.now();
+      const ready = [];
+      for (const record of await listEntries()) {
+        if (record.erro || (record.proxima_tentativa || 0) > agora) continue;
+        try {
+          await uploadPendingPhotos(record);
+          ready.push(record);
+        } catch (error) {
+          if (error instanceof UploadFatalError) await markFailed(record, error.message);
+          else await postpone(record, error.message);
+        }
+      }
+
+      const sincronizadas = [];
+      for (let inicio = 0; inicio < ready.length; inicio += SYNC_LOTE) {
+        sincronizadas.push(...(await sendBatch(syncUrl, ready.slice(inicio, inicio + SYNC_LOTE))));
+      }
+      if (sincronizadas.length) {
+        dispatch('sincronizadas', { total: sincronizadas.length, resultados: sincronizadas });
+      }
+      return sincronizadas.length;
+    })()
+      .catch(() => 0)
+      .finally(() => {
+        flushing = null;
+        notifyQueue();
+        scheduleRetry();
+      });
+    return flushing;
+  };
+
+  // Ações da lista: reenviar agora (zera erro e backoff) ou descartar a inspeção do aparelho.
+  const retry = async (chave) => {
+    const record = await getEntry(chave);
+    if (!record) return 0;
+    Object.assign(record, { erro: null, tentativas: 0, proxima_tentativa: 0, ultimo_erro: null });
+    await putEntry(record);
+    return flush();
+  };
+
+  const discard = async (chave) => {
+    await deleteEntry(chave);
+    await notifyQueue();
+  };
+
+  // ---- Lista visível da fila (barra de navegação) ----
+  const formatDate = (iso) => {
+    const data = new Date(iso);
+    return Number.isNaN(data.getTime()) ? '' : data.toLocaleString('pt-BR', { dateStyle: 'short', timeStyle: 'short' });
+  };
+
+  const renderQueue = (entradas) => {
+    const nav = document.getElementById('fila-offline-nav');
+    const total = document.getElementById('fila-offline-total');
+    const lista = document.getElementById('fila-offline-lista');
+    if (!nav || !total || !lista) return;
+
+    const comErro = entradas.filter((record) => record.erro).length;
+    nav.classList.toggle('d-none', !entradas.length);
+    total.textContent = entradas.length;
+    total.className = `badge ms-1 ${comErro ? 'text-bg-danger' : 'text-bg-warning'}`;
+
+    lista.innerHTML = '';
+    if (!entradas.length) {
+      const vazio = document.createElement('div');
+      vazio.className = 'text-muted small';
+      vazio.textContent = 'Nenhuma inspeção aguardando envio.';
+      lista.appendChild(vazio);
+      return;
+    }
+    entradas
+      .sort((a, b) => (a.capturada_em < b.capturada_em ? -1 : 1))
+      .forEach((record) => {
+        const item = document.createElement('div');
+        item.className = 'list-group-item';
+
+        const titulo = document.createElement('div');
+        titulo.className = 'fw-semibold';
+        titulo.textContent = record.obra_nome || `Obra #${record.obra_id}`;
+        const quando = document.createElement('div');
+        quando.className = 'text-muted small';
+        quando.textContent = `Registrada em ${formatDate(record.capturada_em)}`;
+
+        const situacao = document.createElement('div');
+        situacao.className = 'small mt-1';
+        if (record.erro) {
+          situacao.classList.add('text-danger');
+          situacao.textContent = `Não enviada: ${record.erro}`;
+        } else if (record.proxima_tentativa) {
+          situacao.classList.add('text-warning-emphasis');
+          const proxima = new Date(record.proxima_tentativa).toLocaleTimeString('pt-BR', { timeStyle: 'short' });
+          situacao.textContent = `${record.ultimo_erro || 'Falha no envio'} Nova tentativa às ${proxima}.`;
+        } else {
+          situacao.classList.add('text-muted');
+          situacao.textContent = 'Aguardando conexão para enviar.';
+        }
+
+        const acoes = document.createElement('div');
+        acoes.className = 'd-flex gap-2 mt-2';
+        const reenviar = document.createElement('button');
+        reenviar.type = 'button';
+        reenviar.className = 'btn btn-sm btn-outline-primary';
+        reenviar.textContent = 'Tentar agora';
+        reenviar.addEventListener('click', () => retry(record.chave));
+        const descartar = document.createElement('button');
+        descartar.type = 'button';
+        descartar.className = 'btn btn-sm btn-outline-danger';
+        descartar.textContent = 'Descartar';
+        descartar.addEventListener('click', () => {
+          if (window.confirm('Descartar esta inspeção? Ela será apagada do aparelho.')) discard(record.chave);
+        });
+        acoes.append(reenviar, descartar);
+
+        item.append(titulo, quando, situacao, acoes);
+        lista.appendChild(item);
+      });
+  };
+
+  document.addEventListener('agir:inspecoes:fila', (event) => renderQueue(event.detail.entradas || []));
+
+  window.AgirInspecoes = { enqueue, flush, retry, discard, listEntries, uploadFileChunked, UploadFatalError };
+
+  window.addEventListener('online', flush);
+  document.addEventListener('DOMContentLoaded', () => {
+    notifyQueue();
+    flush();
+  });
+})();
@@ -0,0 +1,108 @@
+document.addEventListener('DOMContentLoaded', function () {
+  // Seletor de obras por busca: as opções vêm do servidor aos poucos, em vez de
+  // uma lista com todas as obras renderizada no formulário.
+  document.querySelectorAll('.js-obra-picker').forEach(function (picker) {
+    const url = picker.dataset.url;
+    const nomeCampo = picker.dataset.name;
+    // Com data-target, seleção única: o id vai para o campo oculto do formulário.
+    const alvo = picker.dataset.target ? document.getElementById(picker.dataset.target) : null;
+    const selecionadas = picker.querySelector('.js-obra-picker-selecionadas');
+    const busca = picker.querySelector('.js-obra-picker-busca');
+    const resultados = picker.querySelector('.js-obra-picker-resultados');
+    const status = picker.querySelector('.js-obra-picker-status');
+    let temporizador = null;
+    let ultimaBusca = null;
+
+    const jaSelecionada = (id) => !!selecionadas.querySelector(`[data-id="${id}"]`);
+
+    const adicionar = (obra) => {
+      if (jaSelecionada(obra.id)) return;
+      const chip = document.createElement('span');
+      chip.className = 'badge bg-light text-dark border d-inline-flex align-items-center';
+      chip.dataset.id = obra.id;
+      chip.appendChild(document.createTextNode(obra.nome));
+      if (alvo) {
+        selecionadas.innerHTML = '';
+        resultados.querySelectorAll('[data-id]').forEach((item) => { item.disabled = false; });
+        alvo.value = obra.id;
+      } else {
+        const input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = nomeCampo;
+        input.value = obra.id;
+        chip.appendChild(input);
+      }
+      const remover = document.createElement('button');
+      remover.type = 'button';
+      remover.className = 'btn-close ms-2 js-obra-picker-remover';
+      remover.style.fontSize = '.55rem';
+      remover.setAttribute('aria-label', 'Remover');
+      chip.appendChild(remover);
+      selecionadas.appendChild(chip);
+    };
+
+    const renderizar = (dados) => {
+      resultados.innerHTML = '';
+      dados.results.forEach(function (obra) {
+        const item = document.createElement('button');
+        item.type = 'button';
+        item.className = 'list-group-item list-group-item-action py-1';
+        item.dataset.id = obra.id;
+        item.textContent = obra.cliente ? `${obra.nome} — ${obra.cliente}` : obra.nome;
+        item.disabled = jaSelecionada(obra.id);
+        item.addEventListener('click', function () {
+          adicionar(obra);
+          item.disabled = true;
+        });
+        resultados.appendChild(item);
+      });
+      if (!dados.results.length) {
+        status.textContent = 'Nenhuma obra encontrada.';
+      } else {
+        status.textContent = dados.mais ? 'Mostrando as primeiras obras; refine a busca para ver outras.' : '';
+      }
+    };
+
+    const buscar = () => {
+      const termo = busca.value.trim();
+      if (termo === ultimaBusca) return;
+      ultimaBusca = termo;
+      fetch(`${url}?q=${encodeURIComponent(termo)}`, {
+        headers: { 'X-Requested-With': 'XMLHttpRequest' },
+        credentials: 'same-origin',
+      })
+        .then((resposta) => resposta.json())
+        .then(function (dados) {
+          // Respostas fora de ordem: vale só a do último termo digitado.
+          if (termo !== ultimaBusca) return;
+          if (dados.status !== 'ok') {
+            status.textContent = dados.message || 'Não foi possível buscar as obras.';
+            return;
+          }
+          renderizar(dados);
+        })
+        .catch(function () {
+          ultimaBusca = null;
+          status.textContent = 'Não foi possível buscar as obras.';
+        });
+    };
+
+    busca.addEventListener('focus', buscar);
+    busca.addEventListener('input', function () {
+      clearTimeout(temporizador);
+      temporizador = setTimeout(buscar, 250);
+    });
+    busca.addEventListener('keydown', function (event) {
+      if (event.key === 'Enter') event.preventDefault();
+    });
+    selecionadas.addEventListener('click', function (event) {
+      const botao = event.target.closest('.js-obra-picker-remover');
+      if (!botao) return;
+      const chip = botao.closest('[data-id]');
+      const item = resultados.querySelector(`[data-id="${chip.dataset.id}"]`);
+      if (item) item.disabled = false;
+      if (alvo) alvo.value = '';
+      chip.remove();
+    });
+  });
+});